@@ -1,9 +1,22 @@
-from typing import Annotated
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime
+from typing import Annotated, List, Optional, Tuple
 
 from fastapi import Depends
 
+from app.data.db.pool import ConnectionPool
+from app.data.repository.bloom_filter import BloomFilter
 from app.data.repository.repository import Repository
+from app.data.repository.sharded_repository import ShardedRepository, shard_names
+from app.data.repository.snapshot_repository import SnapshotRepository
+from app.services.cache import LRUCache
+from app.services.click_counter import ClickCounter
+from app.services.code_generator import CodeGenerator, CounterCodeGenerator, HashCodeGenerator
+from app.services.coherence import CacheCoherenceWatcher
+from app.services.single_flight import SingleFlight
 from app.services.url_service import URLService
+from app.services.write_queue import GroupCommitWriter
 from app.settings import app_settings
 
 
@@ -14,13 +27,158 @@ def provide_database_name() -> str:
     return app_settings.db_name
 
 
-def provide_repository():
+@lru_cache(maxsize=1)
+def provide_connection_pool() -> ConnectionPool:
     """
-    Возвращает репозиторий с подключением к базе данных
+    Возвращает общий для процесса пул подключений к базе данных.
+    Пул создается лениво при первом обращении
     """
-    with Repository(provide_database_name()) as repo:
-        repo.initialize_database()
-        yield repo
+    return ConnectionPool(
+        provide_database_name(),
+        max_size=app_settings.db_pool_size,
+        timeout=app_settings.db_pool_timeout,
+        pragmas=app_settings.sqlite_pragmas,
+    )
+
+
+@lru_cache(maxsize=1)
+def provide_connection_pools() -> List[ConnectionPool]:
+    """
+    Возвращает пулы подключений ко всем шардам базы, в порядке номеров шардов. Пул шарда 0 - `provide_connection_pool`
+    """
+    return [provide_connection_pool()] + [
+        ConnectionPool(
+            name,
+            max_size=app_settings.db_pool_size,
+            timeout=app_settings.db_pool_timeout,
+            pragmas=app_settings.sqlite_pragmas,
+        )
+        for name in shard_names(provide_database_name(), app_settings.db_shards)[1:]
+    ]
+
+
+@lru_cache(maxsize=1)
+def provide_db_executor() -> ThreadPoolExecutor:
+    """
+    Возвращает общий для процесса пул потоков для запросов к базе.
+    Размер совпадает с размером пула подключений, чтобы потоки не простаивали в ожидании подключения
+    """
+    return ThreadPoolExecutor(max_workers=app_settings.db_pool_size, thread_name_prefix="db")
+
+
+@lru_cache(maxsize=1)
+def provide_url_cache() -> Optional[LRUCache[str, Tuple[str, Optional[float]]]]:
+    """
+    Возвращает общий для процесса кэш редиректов или `None`, если кэш отключен в настройках
+    """
+    if not app_settings.cache_size:
+        return None
+    return LRUCache(max_size=app_settings.cache_size, ttl=app_settings.cache_ttl)
+
+
+@lru_cache(maxsize=1)
+def provide_bloom_filter() -> Optional[BloomFilter]:
+    """
+    Возвращает общий для процесса фильтр Блума существующих кодов или `None`, если фильтр отключен в настройках.
+    Фильтр строится по базе при старте приложения
+    """
+    if not app_settings.bloom_capacity:
+        return None
+    return BloomFilter(
+        capacity=app_settings.bloom_capacity,
+        error_rate=app_settings.bloom_error_rate,
+        max_bytes=app_settings.bloom_max_bytes,
+    )
+
+
+@lru_cache(maxsize=1)
+def provide_click_counter() -> ClickCounter:
+    """
+    Возвращает общий для процесса счетчик переходов по ссылкам
+    """
+    return ClickCounter()
+
+
+@lru_cache(maxsize=1)
+def provide_cache_coherence_watcher() -> Optional[CacheCoherenceWatcher]:
+    """
+    Возвращает общий для процесса наблюдатель за изменениями базы из других процессов
+    или `None`, если согласовывать нечего (один воркер или кэш и фильтр Блума отключены).
+    Наблюдатель работает через собственные подключения ко всем шардам базы и запускается при старте приложения
+    """
+    cache, bloom_filter = provide_url_cache(), provide_bloom_filter()
+    if app_settings.workers == 1 or (cache is None and bloom_filter is None):
+        return None
+    return CacheCoherenceWatcher(
+        [
+            Repository(name, pragmas=app_settings.sqlite_pragmas)
+            for name in shard_names(provide_database_name(), app_settings.db_shards)
+        ],
+        cache=cache,
+        bloom_filter=bloom_filter,
+    )
+
+
+@lru_cache(maxsize=1)
+def provide_code_generator() -> CodeGenerator:
+    """
+    Возвращает общий для процесса генератор сокращенных кодов, выбранный в настройках
+    """
+    if app_settings.code_generator == "counter":
+        return CounterCodeGenerator(length=app_settings.code_length, block_size=app_settings.code_block_size)
+    return HashCodeGenerator(length=app_settings.code_length)
+
+
+@lru_cache(maxsize=1)
+def provide_single_flight() -> SingleFlight:
+    """
+    Возвращает общий для процесса объединитель одновременных запросов на сокращение одного URL
+    """
+    return SingleFlight()
+
+
+async def _flush_write_batch(items: List[Tuple[str, Optional[datetime]]]) -> List[Optional[str]]:
+    urls, expires_at = [url for url, _ in items], [expiry for _, expiry in items]
+    return await provide_shared_url_service().acreate_url_pairs(urls, expires_at)
+
+
+@lru_cache(maxsize=1)
+def provide_write_queue() -> Optional[GroupCommitWriter]:
+    """
+    Возвращает общую для процесса очередь групповой записи новых пар или `None`, если она отключена в настройках.
+    Пачки сохраняются через общий сервис, каждая - одной транзакцией
+    """
+    if not app_settings.write_batch_size:
+        return None
+    return GroupCommitWriter(
+        _flush_write_batch, max_batch_size=app_settings.write_batch_size, max_delay=app_settings.write_batch_delay
+    )
+
+
+@lru_cache(maxsize=1)
+def provide_snapshot_repository() -> SnapshotRepository:
+    """
+    Возвращает общий для процесса репозиторий поверх снимка редиректов `snapshot_path`
+    """
+    assert app_settings.snapshot_path is not None
+    return SnapshotRepository(app_settings.snapshot_path, check_interval=app_settings.snapshot_check_interval)
+
+
+def provide_repository() -> Repository:
+    """
+    Возвращает репозиторий, работающий через пул подключений (при `db_shards` > 1 - через пулы всех шардов).
+    Подключение берется из пула только на время обращения сервиса к базе.
+    Если задан `snapshot_path`, возвращает репозиторий снимка редиректов только для чтения
+    """
+    if app_settings.snapshot_path:
+        return provide_snapshot_repository()
+    if app_settings.db_shards > 1:
+        names = shard_names(provide_database_name(), app_settings.db_shards)
+        return ShardedRepository(
+            [Repository(name, pool, provide_bloom_filter()) for name, pool in zip(names, provide_connection_pools())],
+            url_index=app_settings.code_generator == "counter",
+        )
+    return Repository(provide_database_name(), provide_connection_pool(), provide_bloom_filter())
 
 
 def provide_url_service(repository: Annotated[Repository, Depends(provide_repository)]):
@@ -30,5 +188,26 @@ def provide_url_service(repository: Annotated[Repository, Depends(provide_reposi
     Args:
         repository (Repository): Экземпляр репозитория. По умолчанию получает экземпляр из `provide_repository`
     """
+    if isinstance(repository, SnapshotRepository):
+        # Снимок и так в памяти, а переходы реплике записывать некуда
+        return URLService(repository)
+
+    return URLService(
+        repository,
+        executor=provide_db_executor(),
+        cache=provide_url_cache(),
+        click_counter=provide_click_counter(),
+        coherence=provide_cache_coherence_watcher(),
+        code_generator=provide_code_generator(),
+        single_flight=provide_single_flight(),
+        write_queue=provide_write_queue(),
+    )
 
-    return URLService(repository)
+
+@lru_cache(maxsize=1)
+def provide_shared_url_service() -> URLService:
+    """
+    Возвращает общий для процесса сервис для быстрых редиректов в обход внедрения зависимостей FastAPI.
+    Репозиторий сервиса не подключен: каждый вызов берет подключение из пула
+    """
+    return provide_url_service(provide_repository())
@@ -0,0 +1,91 @@
+import re
+import time
+from typing import Any, FrozenSet, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.exc.db_exceptions import URLExpiredError, URLNotFoundError
+from app.services.code_generator import SHORT_CODE_MAX_LENGTH
+from app.settings import app_settings
+
+from .deps.url_service_dependency import provide_shared_url_service
+from .redirect_policy import build_redirect
+
+# Коды, которые могут выдать генераторы кодов: алфавит base62 и ограничение длины
+SHORT_CODE_PATTERN = re.compile(rf"/([0-9A-Za-z]{{1,{SHORT_CODE_MAX_LENGTH}}})")
+REDIRECT_ROUTE_PATH = "/{code}"
+REDIRECT_METHODS = frozenset(("GET", "HEAD"))
+
+_EMPTY_BODY = {"type": "http.response.body", "body": b""}
+_EMPTY_LENGTH = (b"content-length", b"0")
+
+
+class FastRedirectMiddleware:
+    """
+    ASGI-middleware, которое отдает успешные редиректы `GET /{code}` и `HEAD /{code}` до маршрутизации FastAPI:
+    без разрешения зависимостей, создания сервиса и репозитория на каждый запрос и без `RedirectResponse`.
+
+    Путь сверяется с форматом кода регулярным выражением, поиск идет через общий для процесса `URLService`
+    (кэш, фильтр Блума, пул потоков), ответ с заголовками кэширования собирается сразу в сообщения ASGI.
+    `HEAD` не учитывается как переход по ссылке.
+    Все остальные запросы, а также ненайденные и истекшие коды, передаются в FastAPI,
+    поэтому ошибки формирует обычный маршрут
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._reserved: Optional[FrozenSet[str]] = None
+        self._route: Any = None
+
+    def _prepare(self, fastapi_app: Any):
+        """
+        Запоминает маршрут редиректа (для метрик) и статические пути вида `/all`, которые тоже подходят под формат кода
+        """
+        reserved = set()
+        for route in fastapi_app.routes:
+            path = getattr(route, "path", "")
+            if path == REDIRECT_ROUTE_PATH:
+                self._route = route
+            elif "{" not in path and SHORT_CODE_PATTERN.fullmatch(path):
+                reserved.add(path)
+        self._reserved = frozenset(reserved)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in REDIRECT_METHODS or not app_settings.fast_redirect:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        match = SHORT_CODE_PATTERN.fullmatch(path)
+        fastapi_app = scope.get("app")
+        if match is None or fastapi_app is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self._reserved is None:
+            self._prepare(fastapi_app)
+        if path in self._reserved:  # ty:ignore[unsupported-operator]
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            original_url, expires_at = await provide_shared_url_service().aget_redirect(
+                match.group(1), record_click=scope["method"] == "GET"
+            )
+        except (URLNotFoundError, URLExpiredError):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = next((value for name, value in scope["headers"] if name == b"if-none-match"), None)
+        status, headers = build_redirect(
+            original_url, expires_at, None if if_none_match is None else if_none_match.decode("latin-1"), time.time()
+        )
+        scope["route"] = self._route
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(name.encode(), value.encode("latin-1")) for name, value in headers] + [_EMPTY_LENGTH],
+            }
+        )
+        await send(_EMPTY_BODY)
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, List
+
+from fastapi import FastAPI
+from loguru import logger
+
+from app.data.repository.repository import Repository
+from app.services.url_service import URLService
+from app.settings import app_settings
+
+from .deps.url_service_dependency import (
+    provide_bloom_filter,
+    provide_cache_coherence_watcher,
+    provide_code_generator,
+    provide_shared_url_service,
+    provide_single_flight,
+    provide_write_queue,
+    provide_click_counter,
+    provide_connection_pool,
+    provide_connection_pools,
+    provide_database_name,
+    provide_db_executor,
+    provide_repository,
+    provide_snapshot_repository,
+    provide_url_cache,
+)
+
+
+def _open_repository() -> Repository:
+    return provide_repository()
+
+
+async def _run_periodically(job: Callable[[], None], interval: float):
+    """
+    Периодически выполняет синхронную задачу обслуживания в пуле потоков для базы.
+    Ошибки логируются и не останавливают цикл
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(provide_db_executor(), job)
+        except Exception as exc:
+            logger.exception(f"Background job {job.__name__} failed: {exc}")
+
+
+def _rebuild_bloom_filter_if_needed():
+    bloom_filter = provide_bloom_filter()
+    if bloom_filter is not None and bloom_filter.needs_rebuild:
+        with _open_repository() as repo:
+            repo.rebuild_bloom_filter()
+
+
+def _flush_clicks():
+    with _open_repository() as repo:
+        provide_click_counter().flush(repo)
+
+
+def _sweep_expired_links():
+    """
+    Удаляет истекшие ссылки небольшими транзакциями с паузами, чтобы не держать блокировку на запись
+    и не задерживать редиректы
+    """
+    total = 0
+    while True:
+        with _open_repository() as repo:
+            deleted = URLService(repo, cache=provide_url_cache()).delete_expired_url_pairs(
+                app_settings.expired_sweep_batch_size
+            )
+        total += deleted
+        if deleted < app_settings.expired_sweep_batch_size:
+            break
+        time.sleep(app_settings.expired_sweep_pause)
+
+    if total:
+        logger.info(f"Swept {total} expired links")
+
+    with _open_repository() as repo:
+        pruned = repo.prune_changes(time.time() - app_settings.change_log_retention)
+    if pruned:
+        logger.debug(f"Pruned {pruned} old change log entries")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Жизненный цикл приложения: один раз при старте приводит схему базы к актуальной версии и строит фильтр Блума,
+    запускает фоновые задачи обслуживания, при остановке записывает накопленные переходы, дожидается запросов к базе
+    и закрывает пул подключений.
+
+    При запуске нескольких воркеров lifespan выполняется в каждом из них: миграции безопасны для параллельного запуска,
+    а пулы, кэши и фильтр Блума создаются уже внутри процесса воркера.
+
+    Реплика, которая отдает редиректы из снимка (`snapshot_path`), базу не открывает и фоновых задач не запускает
+    """
+    if app_settings.snapshot_path:
+        snapshot = provide_snapshot_repository().snapshot
+        logger.info(f"Serving {len(snapshot)} redirects read-only from snapshot {app_settings.snapshot_path}")
+        yield
+        provide_shared_url_service.cache_clear()
+        provide_snapshot_repository.cache_clear()
+        return
+
+    coherence = provide_cache_coherence_watcher()
+    with _open_repository() as repo:
+        repo.initialize_database()
+        # Наблюдатель запускается до построения фильтра, чтобы не пропустить коды, созданные другими воркерами в промежутке
+        if coherence is not None:
+            coherence.start()
+        repo.rebuild_bloom_filter()
+    logger.info(f"Database {provide_database_name()} is ready")
+
+    tasks: List[asyncio.Task] = [
+        asyncio.create_task(_run_periodically(_flush_clicks, app_settings.click_flush_interval)),
+        asyncio.create_task(_run_periodically(_sweep_expired_links, app_settings.expired_sweep_interval)),
+    ]
+    if coherence is not None:
+        tasks.append(asyncio.create_task(_run_periodically(coherence.sync, app_settings.cache_coherence_interval)))
+    if provide_bloom_filter() is not None:
+        tasks.append(
+            asyncio.create_task(
+                _run_periodically(_rebuild_bloom_filter_if_needed, app_settings.bloom_rebuild_check_interval)
+            )
+        )
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    write_queue = provide_write_queue()
+    if write_queue is not None:
+        await write_queue.close()  # Дописывает принятые запросы, пока пул потоков и подключения еще открыты
+    provide_write_queue.cache_clear()
+    _flush_clicks()
+
+    provide_shared_url_service.cache_clear()
+    provide_db_executor().shutdown(wait=True)
+    provide_db_executor.cache_clear()
+    if coherence is not None:
+        coherence.close()
+    provide_cache_coherence_watcher.cache_clear()
+    for pool in provide_connection_pools():
+        pool.close()
+    provide_connection_pools.cache_clear()
+    provide_connection_pool.cache_clear()
+    provide_bloom_filter.cache_clear()
+    provide_click_counter.cache_clear()
+    provide_code_generator.cache_clear()
+    provide_single_flight.cache_clear()
+    provide_url_cache.cache_clear()
@@ -0,0 +1,48 @@
+import time
+from typing import Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import metrics_registry, request_phases
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware, замеряющее задержку каждого HTTP-запроса по шаблону маршрута
+    и добавляющее в ответ заголовок `Server-Timing` со временем этапов обработки (`db`, `hash`, ...) и общим временем (`app`)
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases: Dict[str, float] = {}
+        token = request_phases.set(phases)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings = [f"{phase};dur={duration * 1000:.3f}" for phase, duration in phases.items()]
+                timings.append(f"app;dur={(time.perf_counter() - started) * 1000:.3f}")
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"server-timing", ", ".join(timings).encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_phases.reset(token)
+            route = scope.get("route")
+            metrics_registry.observe_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started,
+            )
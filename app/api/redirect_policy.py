@@ -0,0 +1,63 @@
+import hashlib
+from email.utils import formatdate
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from app.settings import app_settings
+
+# Те же безопасные символы, что экранирует `RedirectResponse`
+LOCATION_SAFE_CHARS = ":/%#?=@[]!$&'()*+,;"
+NOT_MODIFIED = 304
+
+
+def redirect_etag(status: int, original_url: str) -> str:
+    """
+    ETag редиректа: зависит от кода ответа и адреса, поэтому смена политики или ссылки делает кэш клиента устаревшим
+    """
+    return f'"{hashlib.blake2b(f"{status} {original_url}".encode(), digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Проверяет заголовок `If-None-Match` (слабое сравнение, как требует RFC 9110 для этого заголовка)
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def build_redirect(
+    original_url: str, expires_at: Optional[float], if_none_match: Optional[str], now: float
+) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Собирает код ответа и заголовки редиректа по политике из настроек (`redirect_status`, `redirect_cache_max_age`).
+
+    Время кэширования ограничено сроком жизни ссылки, чтобы браузеры и CDN не отдавали редирект дольше, чем живет ссылка.
+    Без времени кэширования ответ разрешено хранить только с перепроверкой: клиент присылает `If-None-Match`
+    и получает пустой `304 Not Modified`, если ссылка не изменилась
+
+    Args:
+        original_url (str): Исходный URL
+        expires_at (Optional[float]): Срок жизни ссылки (unix time), `None` - бессрочная
+        if_none_match (Optional[str]): Заголовок `If-None-Match` запроса
+        now (float): Текущее время (unix time)
+
+    Returns:
+        Tuple[int, List[Tuple[str, str]]]: Код ответа и заголовки
+    """
+    status = app_settings.redirect_status
+    etag = redirect_etag(status, original_url)
+    max_age = app_settings.redirect_cache_max_age
+    if expires_at is not None:
+        max_age = min(max_age, max(int(expires_at - now), 0))
+
+    headers = [("location", quote(original_url, safe=LOCATION_SAFE_CHARS)), ("etag", etag)]
+    if max_age:
+        headers.append(("cache-control", f"public, max-age={max_age}"))
+        headers.append(("expires", formatdate(now + max_age, usegmt=True)))
+    else:
+        headers.append(("cache-control", "no-cache"))
+
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return NOT_MODIFIED, headers
+    return status, headers
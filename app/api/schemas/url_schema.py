@@ -1,4 +1,9 @@
-from pydantic import BaseModel, HttpUrl, field_validator
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+
+BATCH_MAX_SIZE = 50_000
 
 class URLShortenerRequestModel(BaseModel):
     """
@@ -6,9 +11,24 @@ class URLShortenerRequestModel(BaseModel):
 
     Attributes:
         url (HttpUrl): URL для сокращения
+        expires_at (Optional[datetime]): Когда истекает срок жизни ссылки. Время без часового пояса считается UTC
     """
 
     url: HttpUrl
+    expires_at: Optional[datetime] = None
+
+    @field_validator("expires_at")
+    @classmethod
+    def validate_expires_at(cls, value: Optional[datetime]) -> Optional[datetime]:
+        if value is None:
+            return value
+
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        if value <= datetime.now(timezone.utc):
+            raise ValueError("Срок жизни ссылки должен быть в будущем!")
+
+        return value
 
 class ShortenedUrlCodeResponseModel(BaseModel):
     """
@@ -37,4 +57,42 @@ class URLPairResponseModel(BaseModel):
         short_code (str): Его сокращенная версия
     """
     original_url: HttpUrl
-    short_code: str
\ No newline at end of file
+    short_code: str
+
+class URLBatchShortenerRequestModel(BaseModel):
+    """
+    Запрос на сокращение набора URL. URL валидируются по отдельности, чтобы ошибка в одном не ломала весь набор
+
+    Attributes:
+        urls (List[str]): URL для сокращения
+    """
+
+    urls: List[str] = Field(min_length=1, max_length=BATCH_MAX_SIZE)
+
+class BatchShortenItemResponseModel(BaseModel):
+    """
+    Результат сокращения одного URL из набора
+
+    Attributes:
+        url (str): URL из запроса
+        short_code (Optional[str]): Код для сокращенного URL, если сокращение удалось
+        error (Optional[str]): Описание ошибки, если сокращение не удалось
+    """
+
+    url: str
+    short_code: Optional[str] = None
+    error: Optional[str] = None
+
+class URLStatsResponseModel(BaseModel):
+    """
+    Статистика переходов по сокращенной ссылке
+
+    Attributes:
+        short_code (str): Сокращенный код
+        clicks (int): Количество переходов
+        last_access_at (Optional[datetime]): Время последнего перехода
+    """
+
+    short_code: str
+    clicks: int
+    last_access_at: Optional[datetime] = None
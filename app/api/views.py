@@ -1,21 +1,80 @@
-from typing import Annotated, List
+import json
+import time
+from datetime import datetime, timezone
+from itertools import batched
+from typing import Annotated, Iterator, List, Literal, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.responses import RedirectResponse
-from pydantic import ValidationError
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import HttpUrl, TypeAdapter, ValidationError
 
-from app.exc.db_exceptions import URLAlreadyExistsError, URLNotFoundError
+from app.data.db.models import URLPairRow
+from app.exc.db_exceptions import (
+    CodeSpaceExhaustedError,
+    ReadOnlyRepositoryError,
+    ShortCodeCollisionError,
+    URLAlreadyExistsError,
+    URLExpiredError,
+    URLNotFoundError,
+)
+from app.metrics import metrics_registry
 from app.services.url_service import URLService
 
-from .deps.url_service_dependency import provide_url_service
-from .schemas.url_schema import ShortenedUrlCodeResponseModel, URLShortenerRequestModel, URLPairResponseModel
+from .deps.url_service_dependency import (
+    provide_bloom_filter,
+    provide_click_counter,
+    provide_connection_pool,
+    provide_single_flight,
+    provide_url_cache,
+    provide_url_service,
+    provide_write_queue,
+)
+from .fast_redirect import FastRedirectMiddleware
+from .lifespan import lifespan
+from .middleware import MetricsMiddleware
+from .redirect_policy import build_redirect
+from .schemas.url_schema import (
+    BatchShortenItemResponseModel,
+    ShortenedUrlCodeResponseModel,
+    URLBatchShortenerRequestModel,
+    URLShortenerRequestModel,
+    URLPairResponseModel,
+    URLStatsResponseModel,
+)
 
 app = FastAPI(
     title="URL Shortener",
     summary="Сократитель ссылок на самописном алгоритме",
     version="1.0.0",
+    lifespan=lifespan,
 )
+app.add_middleware(FastRedirectMiddleware)
+app.add_middleware(MetricsMiddleware)
 type UrlService = Annotated[URLService, Depends(provide_url_service)]
+http_url_adapter = TypeAdapter(HttpUrl)
+ALL_PAGE_MAX_SIZE = 1000
+
+
+@app.exception_handler(ReadOnlyRepositoryError)
+async def read_only_replica_handler(request: Request, exc: ReadOnlyRepositoryError) -> JSONResponse:
+    """
+    Реплика со снимком редиректов отдает только редиректы и списки ссылок, изменения и статистика ей недоступны
+    """
+    return JSONResponse(
+        status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+        content={"detail": "Реплика только для чтения: операция недоступна"},
+    )
+
+
+@app.exception_handler(CodeSpaceExhaustedError)
+async def code_space_exhausted_handler(request: Request, exc: CodeSpaceExhaustedError) -> JSONResponse:
+    """
+    Генератор выдал все коды допустимой длины: новые ссылки нельзя создать, пока не увеличат `code_length`
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Свободные сокращенные коды закончились, попробуйте позже"},
+    )
 
 
 @app.post(
@@ -30,32 +89,164 @@ async def create_url_pair(
     """
     Создает в базе пару сокращенный URL - Оригинальный URL и возвращает код сокращенного URL
     """
-    shortened_url = url_service.create_url_pair(str(original_url.url))
+    try:
+        shortened_url = await url_service.acreate_url_pair(str(original_url.url), original_url.expires_at)
+    except ShortCodeCollisionError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Не удалось подобрать свободный сокращенный код, попробуйте еще раз",
+        )
     return ShortenedUrlCodeResponseModel(short_code=shortened_url)
 
+@app.post(
+    "/shorten/batch",
+    response_model=List[BatchShortenItemResponseModel],
+    summary="Создание набора сокращенных ссылок",
+    status_code=status.HTTP_200_OK,
+)
+async def create_url_pairs_batch(
+    batch: URLBatchShortenerRequestModel, url_service: UrlService
+) -> List[BatchShortenItemResponseModel]:
+    """
+    Сокращает набор URL одной транзакцией и возвращает коды в порядке запроса.
+    Ошибки валидации и сохранения возвращаются для каждого URL отдельно
+    """
+    results = [BatchShortenItemResponseModel(url=url) for url in batch.urls]
+    valid_urls: List[str] = []
+    valid_results: List[BatchShortenItemResponseModel] = []
+    for result in results:
+        try:
+            valid_urls.append(str(http_url_adapter.validate_python(result.url)))
+            valid_results.append(result)
+        except ValidationError:
+            result.error = "Некорректный URL"
+
+    codes = await url_service.acreate_url_pairs(valid_urls) if valid_urls else []
+    for result, code in zip(valid_results, codes):
+        if code is None:
+            result.error = "Не удалось сохранить сокращенную ссылку"
+        result.short_code = code
+
+    return results
+
+def _stream_url_pairs(pairs: Iterator[URLPairRow], ndjson: bool, chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Сериализует пары URL в JSON-массив или NDJSON кусками по `chunk_size` строк, не загружая таблицу в память
+    """
+    separator = "\n" if ndjson else ","
+    first_chunk = True
+    if not ndjson:
+        yield "["
+    for chunk in batched(pairs, chunk_size):
+        body = separator.join(
+            json.dumps({"original_url": original_url, "short_code": short_code}, ensure_ascii=False)
+            for _, original_url, short_code in chunk
+        )
+        if ndjson:
+            yield body + "\n"
+        else:
+            yield body if first_chunk else "," + body
+        first_chunk = False
+    if not ndjson:
+        yield "]"
+
 @app.get("/all", summary="Все сокращенные ссылки", status_code=status.HTTP_200_OK, response_model=List[URLPairResponseModel])
-async def get_all_url_pairs(url_service: UrlService) -> List[URLPairResponseModel]:
-    db_pairs = url_service.get_all_url_pairs_from_db()
-    pairs = [URLPairResponseModel(original_url=db_pair.original_url, short_code=db_pair.shortened_url_code) for db_pair in db_pairs]
-    return pairs
+async def get_all_url_pairs(
+    url_service: UrlService,
+    limit: Annotated[Optional[int], Query(ge=1, le=ALL_PAGE_MAX_SIZE, description="Размер страницы. Если не указан, отдается вся таблица потоком")] = None,
+    after: Annotated[int, Query(ge=0, description="Курсор: значение заголовка `X-Next-Cursor` с предыдущей страницы")] = 0,
+    output_format: Annotated[Literal["json", "ndjson"], Query(alias="format", description="Формат потоковой выдачи")] = "json",
+) -> Response:
+    """
+    Возвращает пары URL из базы.
+    С параметром `limit` - одну страницу (keyset-пагинация по курсору `after`, курсор следующей страницы - в заголовке `X-Next-Cursor`).
+    Без него - всю таблицу потоком в виде JSON-массива или NDJSON
+    """
+    if limit is not None:
+        rows = await url_service.aget_url_pairs_page(after, limit)
+        headers = {"X-Next-Cursor": str(rows[-1][0])} if len(rows) == limit else None
+        content = [{"original_url": original_url, "short_code": short_code} for _, original_url, short_code in rows]
+        return JSONResponse(content, headers=headers)
+
+    ndjson = output_format == "ndjson"
+    return StreamingResponse(
+        _stream_url_pairs(url_service.iter_url_pairs(after), ndjson),
+        media_type="application/x-ndjson" if ndjson else "application/json",
+    )
+
+@app.get("/metrics", summary="Метрики в формате Prometheus", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Возвращает гистограммы задержек запросов и этапов их обработки, а также статистику кэша, фильтра Блума,
+    пула подключений и счетчика переходов
+    """
+    gauges = {
+        "db_pool": provide_connection_pool().stats(),
+        "click_counter": provide_click_counter().stats(),
+        "shorten_single_flight": provide_single_flight().stats(),
+    }
+    cache = provide_url_cache()
+    if cache is not None:
+        gauges["redirect_cache"] = cache.stats()
+    bloom_filter = provide_bloom_filter()
+    if bloom_filter is not None:
+        gauges["bloom_filter"] = bloom_filter.stats()
+    write_queue = provide_write_queue()
+    if write_queue is not None:
+        gauges["shorten_write_queue"] = write_queue.stats()
+
+    return PlainTextResponse(
+        metrics_registry.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 @app.get(
+    "/stats/{code}",
+    response_model=URLStatsResponseModel,
+    summary="Статистика переходов по сокращенной ссылке",
+    status_code=status.HTTP_200_OK,
+)
+async def get_url_stats(code: str, url_service: UrlService) -> URLStatsResponseModel:
+    """
+    Возвращает количество переходов по сокращенной ссылке и время последнего перехода
+    """
+    try:
+        clicks, last_access_at = await url_service.aget_url_stats(code)
+    except URLNotFoundError:
+        raise HTTPException(status_code=404, detail="URL не найден в базе")
+
+    return URLStatsResponseModel(
+        short_code=code,
+        clicks=clicks,
+        last_access_at=datetime.fromtimestamp(last_access_at, tz=timezone.utc) if last_access_at else None,
+    )
+
+@app.api_route(
     "/{code}",
+    methods=["GET", "HEAD"],
     summary="Переход по сокращенной ссылке",
     status_code=status.HTTP_303_SEE_OTHER,
 )
-async def redirect_from_short_code(code: str, url_service: UrlService) -> RedirectResponse:
+async def redirect_from_short_code(code: str, request: Request, url_service: UrlService) -> Response:
     """
-    Ищет в базе оригинальный URL по сокращенному коду и делает ридерект на исходный ресурс
+    Ищет в базе оригинальный URL по сокращенному коду и делает ридерект на исходный ресурс.
+    Код редиректа и заголовки кэширования задаются настройками, на `If-None-Match` с тем же ETag отвечает `304`.
+    `HEAD` не учитывается как переход по ссылке
     """
     try:
-        original_url = url_service.get_original_url_from_short(code)
-        return RedirectResponse(original_url, status_code=303)
+        original_url, expires_at = await url_service.aget_redirect(code, record_click=request.method == "GET")
     except URLNotFoundError:
         raise HTTPException(
             status_code=404,
             detail="Не найдено оригинальной ссылки для данного сокращения!",
         )
+    except URLExpiredError:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Срок жизни сокращенной ссылки истек!",
+        )
+
+    status_code, headers = build_redirect(original_url, expires_at, request.headers.get("if-none-match"), time.time())
+    return Response(status_code=status_code, headers=dict(headers))
 
 
 @app.delete("/delete-pair/{shorten_url}", summary="Удаление сокращенной ссылки", status_code=status.HTTP_204_NO_CONTENT)
@@ -66,6 +257,6 @@ async def delete_url_pair(shorten_url: str, url_service: UrlService):
     """
 
     try:
-        url_service.delete_url_pair_from_shorten_url(shorten_url)
+        await url_service.adelete_url_pair_from_shorten_url(shorten_url)
     except URLNotFoundError:
         raise HTTPException(status_code=404, detail="URL не найден в базе")
\ No newline at end of file
@@ -1,17 +1,17 @@
 from app.bot.services import BotService
-import json
-from pydantic import ValidationError
-from aiogram import Bot
+from typing import Optional, Tuple
+
+from aiogram import Bot, F
 from aiogram.dispatcher.dispatcher import Dispatcher
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import Message
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, LinkPreviewOptions, Message
 from aiogram.enums import ParseMode
 
 from loguru import logger
 
-from app.api.schemas.url_schema import URLShortenerRequestModel
 from app.exc.bot_exceptions import (
     NoSiteHostProvidedError,
     TelegramAPIKeyNotProvidedError,
@@ -19,6 +19,7 @@ from app.exc.bot_exceptions import (
 from app.settings import app_settings
 
 from .states import ShorteningUrlState
+from .utils import ALL_PAGE_CALLBACK_PREFIX, extract_urls, format_links_page, links_page_keyboard, split_message
 
 if not app_settings.telegram_api_key:
     logger.error("Error! Telegram API Key Not Provided!")
@@ -38,49 +39,102 @@ async def start_command(msg: Message):
 
 @dp.message(Command("help"))
 async def help_message(msg: Message):
-    await msg.answer("/start - начало работы \n/all - все доступные сокращенные ссылки и их оригиналы \n/shorten - сгенерировать новую сокращенную ссылку", parse_mode=ParseMode.HTML)
+    await msg.answer("/start - начало работы \n/all - все сокращенные ссылки и их оригиналы, постранично \n/shorten - сократить ссылку или все ссылки из сообщения", parse_mode=ParseMode.HTML)
 
 
 @dp.message(Command("shorten"))
 async def start_generation(msg: Message, state: FSMContext):
     await state.set_state(ShorteningUrlState.enters_url)
-    await msg.answer("Введи сслылку для сокращения: ")
+    await msg.answer("Введи ссылку для сокращения (или пришли сообщение с несколькими ссылками): ")
 
 
 @dp.message(ShorteningUrlState.enters_url)
-async def generate_shorten_url(message: Message, state: FSMContext):
-    if not message.text:
+async def generate_shorten_url(message: Message, state: FSMContext, bot_service: BotService):
+    text = message.text or message.caption
+    if not text:
         await message.answer("Ошибка: Отсутствует текст для генерации ссылки!")
         await state.clear()
         return
-    
+
     try:
-        url = URLShortenerRequestModel(url=message.text)  # ty:ignore[invalid-argument-type]
-        short_code = BotService.call_api_for_short_link(url)
-        if not short_code:
+        urls = extract_urls(text, message.entities or message.caption_entities)
+        if not urls:
+            await message.answer("Ошибка: В сообщении нет ни одной ссылки! Пример URL - https://example.com")
+            return
+
+        # Все ссылки из сообщения сокращаются одним запросом к API и возвращаются одним ответом
+        results = await bot_service.call_api_for_short_links(urls)
+        if results is None:
             await message.answer("Произошла ошибка на стороне сервера! Попробуйте повторить попытку позже...")
-            return 
-        
-        await message.answer(f"Готово! Твоя сокращенная ссылка - {app_settings.api_link}/{short_code}")
-
-    except ValidationError:
-        await message.answer("Ошибка: Вы предоставили неверный URL! Пример URL - https://example.com")
+            return
+
+        if len(results) == 1 and results[0].short_code:
+            lines = [f"Готово! Твоя сокращенная ссылка - {app_settings.api_link}/{results[0].short_code}"]
+        else:
+            lines = [
+                f"{result.url} -> {app_settings.api_link}/{result.short_code}"
+                if result.short_code
+                else f"{result.url} -> ошибка: {result.error or 'не удалось сократить'}"
+                for result in results
+            ]
+        for chunk in split_message(lines):
+            await message.answer(chunk, link_preview_options=LinkPreviewOptions(is_disabled=True))
 
     finally:
         await state.clear()
 
+async def _render_links_page(bot_service: BotService, after: int) -> Optional[Tuple[str, Optional[InlineKeyboardMarkup]]]:
+    page = await bot_service.call_api_for_links_page(after)
+    if page is None:
+        return None
+    if not page.pairs:
+        return "Сокращенных ссылок пока нет", None
+
+    text = format_links_page(page.pairs, app_settings.api_link)  # ty:ignore[invalid-argument-type]
+    return text, links_page_keyboard(bot_service.previous_cursor(after), page.next_cursor)
+
 @dp.message(Command("all"))
-async def all_url_pairs(message: Message):
-    result = ""
-    pairs = BotService.call_api_for_all_links()
-    if not pairs:
+async def all_url_pairs(message: Message, bot_service: BotService):
+    # Одна страница на сообщение: дальше пользователь листает кнопками, а не выгружает всю таблицу
+    rendered = await _render_links_page(bot_service, 0)
+    if rendered is None:
         await message.answer("Произошла ошибка на сервере! Попробуйте повторить попытку позже...")
         return
 
-    for pair in pairs:
-        result += f"Оригинал: {pair.original_url} -> {app_settings.api_link}/{pair.shortened_url_code} \n"
+    text, keyboard = rendered
+    await message.answer(text, reply_markup=keyboard, link_preview_options=LinkPreviewOptions(is_disabled=True))
 
-    await message.answer(result, parse_mode=ParseMode.HTML)
+@dp.callback_query(F.data.startswith(ALL_PAGE_CALLBACK_PREFIX))
+async def all_url_pairs_page(callback: CallbackQuery, bot_service: BotService):
+    after = int(callback.data.removeprefix(ALL_PAGE_CALLBACK_PREFIX))  # ty:ignore[possibly-missing-attribute]
+    rendered = await _render_links_page(bot_service, after)
+    if rendered is None:
+        await callback.answer("Произошла ошибка на сервере! Попробуйте повторить попытку позже...", show_alert=True)
+        return
+
+    text, keyboard = rendered
+    if isinstance(callback.message, Message):
+        try:
+            await callback.message.edit_text(
+                text, reply_markup=keyboard, link_preview_options=LinkPreviewOptions(is_disabled=True)
+            )
+        except TelegramBadRequest as exc:  # Повторное нажатие на ту же кнопку: текст страницы не изменился
+            logger.debug(f"Page {after} was not edited: {exc.message}")
+    await callback.answer()
 
 async def run_bot():
-    await dp.start_polling(bot)
\ No newline at end of file
+    # Один HTTP-клиент на все чаты: соединения с API переиспользуются, хендлеры получают его как аргумент `bot_service`
+    bot_service = BotService(
+        app_settings.api_link,  # ty:ignore[invalid-argument-type]
+        timeout=app_settings.bot_api_timeout,
+        retries=app_settings.bot_api_retries,
+        backoff=app_settings.bot_api_retry_backoff,
+        pool_size=app_settings.bot_api_pool_size,
+        page_size=app_settings.bot_page_size,
+        page_cache_ttl=app_settings.bot_page_cache_ttl,
+    )
+    dp["bot_service"] = bot_service
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await bot_service.close()
\ No newline at end of file
@@ -1,32 +1,163 @@
-from typing import Optional, Dict, List
-import requests
-import json
+import asyncio
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional, Tuple
+
+import aiohttp
 from loguru import logger
-from app.api.schemas.url_schema import URLShortenerRequestModel
-from app.data.db.models import URLPairModel
-from app.settings import app_settings
+
+from app.api.schemas.url_schema import BatchShortenItemResponseModel
+from app.services.cache import LRUCache
+
+
+@dataclass(frozen=True)
+class LinksPage:
+    """
+    Страница списка сокращенных ссылок
+
+    Attributes:
+        pairs (List[Tuple[str, str]]): Пары (исходный URL, сокращенный код)
+        after (int): Курсор, с которого начинается страница
+        next_cursor (Optional[int]): Курсор следующей страницы. `None` - страница последняя
+    """
+
+    pairs: List[Tuple[str, str]]
+    after: int
+    next_cursor: Optional[int]
+
 
 class BotService:
     """
-    Бизнес-логика для бота
+    Бизнес-логика для бота.
+
+    Все запросы к API идут через одну сессию aiohttp: TCP-соединения переиспользуются (keep-alive),
+    а ожидание ответа не блокирует обработку сообщений из других чатов.
+    Сетевые ошибки, таймауты и ответы 5xx повторяются с экспоненциальной задержкой
+
+    Attributes:
+        api_link (str): Адрес API сократителя
+        timeout (float): Таймаут одного запроса, в секундах
+        retries (int): Сколько раз повторять неудачный запрос
+        backoff (float): Задержка перед первым повтором, в секундах. Каждый следующий повтор ждет вдвое дольше
+        pool_size (int): Максимальное количество одновременных соединений с API
+        page_size (int): Сколько ссылок показывать на одной странице `/all`
+        pages (LRUCache[int, LinksPage]): Недавно запрошенные страницы `/all` по курсору. Листание туда-обратно
+            и одновременные просмотры из разных чатов не обращаются к API, пока страница не устарела
     """
 
-    @staticmethod
-    def call_api_for_short_link(url: URLShortenerRequestModel) -> Optional[str]:
-        resp = requests.post(f"{app_settings.api_link}/shorten", json={"url": str(url.url)})
-        if resp.status_code > 500:
-            logger.error(f"Server error: \nStatus Code: {resp.status_code}\nText: {resp.text}")
-            return
-        
-        data: Dict[str, str] = json.loads(resp.text)
-        return data.get("short_code")
-
-    @staticmethod
-    def call_api_for_all_links() -> List[URLPairModel]:
-        resp = requests.get(f"{app_settings.api_link}/all")
-        if resp.status_code > 500:
-            logger.error(f"Server error: \nStatus Code: {resp.status_code}\nText: {resp.text}")
-            return 
-
-        data = json.loads(resp.text)
-        return [URLPairModel(original_url=pair.get("original_url"), shortened_url_code=pair.get("short_code")) for pair in data]
\ No newline at end of file
+    def __init__(
+        self,
+        api_link: str,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 20,
+        page_size: int = 10,
+        page_cache_size: int = 256,
+        page_cache_ttl: float = 30.0,
+    ):
+        self.api_link = api_link
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.page_size = page_size
+        self.pages: LRUCache[int, LinksPage] = LRUCache(max_size=page_cache_size, ttl=page_cache_ttl)
+        self._previous: LRUCache[int, int] = LRUCache(max_size=page_cache_size, ttl=page_cache_ttl)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Общая сессия с пулом соединений. Создается при первом обращении, внутри работающего event loop'а
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Закрывает сессию и ее соединения
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(self, method: str, path: str, **kwargs: Any) -> Optional[Tuple[Any, Mapping[str, str]]]:
+        """
+        Выполняет запрос к API с повторами и возвращает разобранный JSON и заголовки ответа
+        или `None`, если API так и не ответило без ошибки сервера
+        ! Только для внутреннего использования
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                async with self.session.request(method, f"{self.api_link}{path}", **kwargs) as resp:
+                    if resp.status < 500:
+                        return await resp.json(), resp.headers
+                    logger.error(f"Server error: \nStatus Code: {resp.status}\nText: {await resp.text()}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                logger.warning(f"Request {method} {path} failed (attempt {attempt + 1}): {exc!r}")
+        return None
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Optional[Any]:
+        """
+        То же, что `_send`, но возвращает только JSON ответа
+        ! Только для внутреннего использования
+        """
+        response = await self._send(method, path, **kwargs)
+        return None if response is None else response[0]
+
+    async def call_api_for_short_links(self, urls: List[str]) -> Optional[List[BatchShortenItemResponseModel]]:
+        """
+        Сокращает набор URL одним запросом к `/shorten/batch`. Результаты - в порядке `urls`
+        """
+        data = await self._request("POST", "/shorten/batch", json={"urls": urls})
+        if not isinstance(data, list):
+            return None
+        return [BatchShortenItemResponseModel.model_validate(item) for item in data]
+
+    async def call_api_for_links_page(self, after: int = 0) -> Optional[LinksPage]:
+        """
+        Возвращает страницу списка ссылок, начиная с курсора `after`: из кэша или одним запросом `GET /all?limit=&after=`
+
+        Args:
+            after (int): Курсор страницы. 0 - первая страница
+
+        Returns:
+            Optional[LinksPage]: Страница или `None`, если API недоступно
+        """
+        page = self.pages.get(after)
+        if page is not None:
+            return page
+
+        response = await self._send("GET", "/all", params={"limit": self.page_size, "after": after})
+        if response is None or not isinstance(response[0], list):
+            return None
+
+        data, headers = response
+        next_cursor = headers.get("X-Next-Cursor")
+        page = LinksPage(
+            pairs=[(pair["original_url"], pair["short_code"]) for pair in data],
+            after=after,
+            next_cursor=int(next_cursor) if next_cursor is not None else None,
+        )
+        self.pages.set(after, page)
+        if page.next_cursor is not None:
+            self._previous.set(page.next_cursor, after)
+        return page
+
+    def previous_cursor(self, after: int) -> Optional[int]:
+        """
+        Курсор страницы перед страницей `after`. Если он забыт, назад можно вернуться только к первой странице
+
+        Returns:
+            Optional[int]: Курсор предыдущей страницы или `None`, если `after` - первая страница
+        """
+        if after == 0:
+            return None
+        previous = self._previous.get(after)
+        return 0 if previous is None else previous
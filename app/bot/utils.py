@@ -0,0 +1,107 @@
+"""
+Вспомогательные функции бота: разбор ссылок из сообщений и разбиение длинных ответов
+"""
+
+import re
+from typing import Iterable, List, Optional
+
+from aiogram.enums import MessageEntityType
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity
+
+MESSAGE_MAX_LENGTH = 4096  # Ограничение Telegram на длину текста одного сообщения
+_URL_PATTERN = re.compile(r"https?://[^\s<>\"']+", re.IGNORECASE)
+_SCHEME_PATTERN = re.compile(r"^[a-z][a-z0-9+.-]*://", re.IGNORECASE)
+DISPLAY_URL_MAX_LENGTH = 200  # Длиннее исходные URL в списке обрезаются, чтобы страница помещалась в одно сообщение
+ALL_PAGE_CALLBACK_PREFIX = "all:"  # Префикс данных кнопок листания `/all`, за ним - курсор страницы
+
+
+def extract_urls(text: Optional[str], entities: Optional[List[MessageEntity]] = None) -> List[str]:
+    """
+    Достает из текста сообщения все ссылки без повторов, в порядке появления.
+    Ссылки берутся из разметки Telegram (в том числе скрытые под текстом), а если разметки нет - ищутся в тексте.
+    Ссылкам без схемы (`example.com`) Telegram подставляет http://, так же делает и бот
+
+    Args:
+        text (Optional[str]): Текст или подпись сообщения
+        entities (Optional[List[MessageEntity]]): Разметка текста
+
+    Returns:
+        List[str]: Найденные ссылки
+    """
+    if not text:
+        return []
+
+    urls: List[str] = []
+    if entities:
+        for entity in entities:
+            if entity.type == MessageEntityType.URL:
+                urls.append(entity.extract_from(text))
+            elif entity.type == MessageEntityType.TEXT_LINK and entity.url:
+                urls.append(entity.url)
+    else:
+        urls = [url.rstrip(".,;:!?)") for url in _URL_PATTERN.findall(text)]
+
+    return list(dict.fromkeys(url if _SCHEME_PATTERN.match(url) else f"http://{url}" for url in urls))
+
+
+def split_message(lines: Iterable[str], limit: int = MESSAGE_MAX_LENGTH) -> List[str]:
+    """
+    Склеивает строки ответа в как можно меньшее количество сообщений не длиннее `limit`.
+    Строка длиннее `limit` разрезается
+
+    Args:
+        lines (Iterable[str]): Строки ответа
+        limit (int): Максимальная длина одного сообщения
+
+    Returns:
+        List[str]: Тексты сообщений
+    """
+    messages: List[str] = []
+    current: List[str] = []
+    length = 0
+    for line in lines:
+        if current and length + 1 + len(line) > limit:
+            messages.append("\n".join(current))
+            current, length = [], 0
+        while len(line) > limit:
+            messages.append(line[:limit])
+            line = line[limit:]
+        length += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        messages.append("\n".join(current))
+    return messages
+
+
+def format_links_page(pairs: Iterable[tuple[str, str]], api_link: str) -> str:
+    """
+    Текст страницы списка ссылок
+
+    Args:
+        pairs (Iterable[tuple[str, str]]): Пары (исходный URL, сокращенный код)
+        api_link (str): Адрес API, на который ведут сокращенные ссылки
+
+    Returns:
+        str: Текст сообщения
+    """
+    lines = []
+    for original_url, short_code in pairs:
+        if len(original_url) > DISPLAY_URL_MAX_LENGTH:
+            original_url = original_url[: DISPLAY_URL_MAX_LENGTH - 1] + "…"
+        lines.append(f"Оригинал: {original_url} -> {api_link}/{short_code}")
+    return "\n".join(lines)
+
+
+def links_page_keyboard(previous_cursor: Optional[int], next_cursor: Optional[int]) -> Optional[InlineKeyboardMarkup]:
+    """
+    Кнопки листания списка ссылок. Курсор страницы передается в данных кнопки
+
+    Returns:
+        Optional[InlineKeyboardMarkup]: Клавиатура или `None`, если листать некуда
+    """
+    buttons = []
+    if previous_cursor is not None:
+        buttons.append(InlineKeyboardButton(text="« Назад", callback_data=f"{ALL_PAGE_CALLBACK_PREFIX}{previous_cursor}"))
+    if next_cursor is not None:
+        buttons.append(InlineKeyboardButton(text="Далее »", callback_data=f"{ALL_PAGE_CALLBACK_PREFIX}{next_cursor}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
@@ -0,0 +1,63 @@
+"""
+Представление сокращенных кодов и исходных URL в базе в виде целых чисел.
+
+Код хранится как целочисленный первичный ключ `62 ** len(code) + decode(code)`: слагаемое со степенью сохраняет длину,
+поэтому коды с ведущими нулями (`0a` и `a`) получают разные ключи, а ключ кода длиной до 10 символов помещается в INTEGER.
+Исходный URL ищется по 64-битному хэшу, а не по уникальному индексу на всю строку
+"""
+
+import bisect
+from hashlib import blake2b
+from typing import Optional
+
+from base62 import CHARSET_DEFAULT
+
+CODE_KEY_MAX_LENGTH = 10  # Самый длинный код, ключ которого помещается в 64-битный INTEGER SQLite
+_POWERS = [62**length for length in range(CODE_KEY_MAX_LENGTH + 1)]
+# Ключ считается на каждый редирект, а код - на каждую строку выдачи, поэтому перевод идет по таблице алфавита base62,
+# без посимвольных проверок `base62.decode`/`base62.encode`
+_DIGITS = {char: value for value, char in enumerate(CHARSET_DEFAULT)}
+
+
+def code_to_key(code: str) -> Optional[int]:
+    """
+    Возвращает ключ сокращенного кода или `None`, если строка не может быть кодом (пустая, слишком длинная, не base62)
+    """
+    if not 0 < len(code) <= CODE_KEY_MAX_LENGTH:
+        return None
+    value = 0
+    try:
+        for char in code:
+            value = value * 62 + _DIGITS[char]
+    except KeyError:
+        return None
+    return _POWERS[len(code)] + value
+
+
+def key_to_code(key: int) -> str:
+    """
+    Восстанавливает сокращенный код по ключу из базы
+    """
+    length = bisect.bisect_right(_POWERS, key) - 1
+    value = key - _POWERS[length]
+    chars = ["0"] * length
+    for position in range(length - 1, -1, -1):
+        value, digit = divmod(value, 62)
+        chars[position] = CHARSET_DEFAULT[digit]
+    return "".join(chars)
+
+
+def url_hash(url: str) -> int:
+    """
+    64-битный хэш исходного URL (со знаком, как INTEGER в SQLite) для поиска по индексу вместо сравнения полных строк
+    """
+    return int.from_bytes(blake2b(url.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def shard_for_code(code: str, shards: int) -> int:
+    """
+    Номер шарда базы, в котором хранится сокращенный код. Зависит только от кода и количества шардов.
+    Некорректные коды (которых точно нет в базе) относятся к шарду 0
+    """
+    key = code_to_key(code)
+    return 0 if key is None else key % shards
@@ -0,0 +1,286 @@
+"""
+Версионированные миграции схемы базы данных.
+
+Текущая версия схемы хранится в `PRAGMA user_version`. Каждая миграция - функция, которая получает курсор
+и выполняет свои запросы внутри уже открытой транзакции. Новые миграции добавляются только в конец списка `MIGRATIONS`
+"""
+
+import sqlite3
+from typing import Callable, List
+
+from loguru import logger
+
+from app.data.db.keys import CODE_KEY_MAX_LENGTH, code_to_key, url_hash
+
+type Migration = Callable[[sqlite3.Cursor], None]
+
+
+def _create_urls_table(cursor: sqlite3.Cursor):
+    """
+    Исходная схема таблицы `urls`. Для баз, созданных до появления миграций, ничего не делает
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS urls
+        (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_url TEXT UNIQUE,
+            shortened_url VARCHAR(5) UNIQUE
+        );
+        """
+    )
+
+
+def _widen_shortened_url(cursor: sqlite3.Cursor):
+    """
+    Расширяет колонку `shortened_url` до длины кодов, которые генерирует `URLService`.
+    SQLite не умеет менять тип колонки, поэтому таблица пересоздается с копированием данных
+    """
+    cursor.execute(
+        """
+        CREATE TABLE urls_new
+        (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_url TEXT UNIQUE,
+            shortened_url VARCHAR(10) UNIQUE
+        );
+        """
+    )
+    cursor.execute(
+        "INSERT INTO urls_new (id, original_url, shortened_url) SELECT id, original_url, shortened_url FROM urls"
+    )
+    cursor.execute("DROP TABLE urls")
+    cursor.execute("ALTER TABLE urls_new RENAME TO urls")
+
+
+def _add_click_stats(cursor: sqlite3.Cursor):
+    """
+    Добавляет счетчик переходов и время последнего перехода по ссылке
+    """
+    cursor.execute("ALTER TABLE urls ADD COLUMN clicks INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE urls ADD COLUMN last_access_at REAL")
+
+
+def _add_expiration(cursor: sqlite3.Cursor):
+    """
+    Добавляет срок жизни ссылки и частичный индекс по нему для фоновой очистки истекших ссылок
+    """
+    cursor.execute("ALTER TABLE urls ADD COLUMN expires_at REAL")
+    cursor.execute("CREATE INDEX idx_urls_expires_at ON urls (expires_at) WHERE expires_at IS NOT NULL")
+
+
+def _add_change_log(cursor: sqlite3.Cursor):
+    """
+    Добавляет журнал изменений таблицы `urls`, который заполняется триггерами.
+    По нему процессы API узнают о ссылках, созданных и удаленных другими процессами,
+    и обновляют свои кэши и фильтры Блума
+    """
+    cursor.execute(
+        """
+        CREATE TABLE url_changes
+        (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shortened_url TEXT NOT NULL,
+            change TEXT NOT NULL CHECK (change IN ('insert', 'delete')),
+            changed_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+        );
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER urls_after_insert AFTER INSERT ON urls
+        BEGIN
+            INSERT INTO url_changes (shortened_url, change) VALUES (NEW.shortened_url, 'insert');
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER urls_after_delete AFTER DELETE ON urls
+        BEGIN
+            INSERT INTO url_changes (shortened_url, change) VALUES (OLD.shortened_url, 'delete');
+        END;
+        """
+    )
+
+
+def _add_code_sequence(cursor: sqlite3.Cursor):
+    """
+    Добавляет последовательность номеров для генератора кодов на счетчике.
+    Процессы резервируют в ней номера блоками
+    """
+    cursor.execute(
+        """
+        CREATE TABLE code_sequence
+        (
+            name TEXT PRIMARY KEY,
+            next_id INTEGER NOT NULL
+        );
+        """
+    )
+    cursor.execute("INSERT INTO code_sequence (name, next_id) VALUES ('urls', 1)")
+
+
+def _use_integer_code_keys(cursor: sqlite3.Cursor):
+    """
+    Переводит таблицу `urls` на целочисленные ключи: сокращенный код хранится как первичный ключ (см. `app.data.db.keys`),
+    а уникальный индекс по полному исходному URL заменяется неуникальным индексом по его 64-битному хэшу.
+    Журнал изменений тоже переходит на ключи, номера его записей и последовательность сохраняются.
+    Если в базе есть коды, которые нельзя перевести в ключ, миграция прерывается: иначе такие ссылки
+    получили бы произвольные ключи и вели бы не туда
+
+    Raises:
+        ValueError: Если в базе есть коды не из base62 или длиннее `CODE_KEY_MAX_LENGTH`
+    """
+    cursor.connection.create_function("code_key", 1, code_to_key, deterministic=True)
+    cursor.connection.create_function("url_hash", 1, url_hash, deterministic=True)
+
+    invalid = [code for (code,) in cursor.execute("SELECT shortened_url FROM urls WHERE code_key(shortened_url) IS NULL")]
+    if invalid:
+        raise ValueError(
+            f"Коды {', '.join(map(repr, invalid[:10]))}{' и другие' if len(invalid) > 10 else ''} ({len(invalid)} шт.) "
+            f"нельзя перевести в целочисленные ключи: они не из base62 или длиннее {CODE_KEY_MAX_LENGTH} символов. "
+            "Исправьте или удалите эти ссылки и запустите миграцию заново"
+        )
+
+    cursor.execute(
+        """
+        CREATE TABLE urls_new
+        (
+            id INTEGER PRIMARY KEY,
+            original_url TEXT NOT NULL,
+            url_hash INTEGER NOT NULL,
+            clicks INTEGER NOT NULL DEFAULT 0,
+            last_access_at REAL,
+            expires_at REAL
+        );
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO urls_new (id, original_url, url_hash, clicks, last_access_at, expires_at)
+        SELECT code_key(shortened_url), original_url, url_hash(original_url), clicks, last_access_at, expires_at FROM urls
+        """
+    )
+    cursor.execute("DROP TABLE urls")
+    cursor.execute("ALTER TABLE urls_new RENAME TO urls")
+    cursor.execute("CREATE INDEX idx_urls_url_hash ON urls (url_hash)")
+    cursor.execute("CREATE INDEX idx_urls_expires_at ON urls (expires_at) WHERE expires_at IS NOT NULL")
+
+    last_change = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'url_changes'").fetchone()
+    cursor.execute(
+        """
+        CREATE TABLE url_changes_new
+        (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code_key INTEGER NOT NULL,
+            change TEXT NOT NULL CHECK (change IN ('insert', 'delete')),
+            changed_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+        );
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO url_changes_new (id, code_key, change, changed_at)
+        SELECT id, code_key(shortened_url), change, changed_at FROM url_changes WHERE code_key(shortened_url) IS NOT NULL
+        """
+    )
+    cursor.execute("DROP TABLE url_changes")
+    cursor.execute("ALTER TABLE url_changes_new RENAME TO url_changes")
+    if last_change is not None:
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'url_changes'")
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('url_changes', ?)", last_change)
+
+    cursor.execute(
+        """
+        CREATE TRIGGER urls_after_insert AFTER INSERT ON urls
+        BEGIN
+            INSERT INTO url_changes (code_key, change) VALUES (NEW.id, 'insert');
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER urls_after_delete AFTER DELETE ON urls
+        BEGIN
+            INSERT INTO url_changes (code_key, change) VALUES (OLD.id, 'delete');
+        END;
+        """
+    )
+
+
+
+def _add_url_index(cursor: sqlite3.Cursor):
+    """
+    Добавляет индекс исходных URL для базы из нескольких шардов с генератором-счетчиком: запись об URL хранится в шарде,
+    номер которого вычисляется по хэшу URL, и указывает на ключ кода, под которым URL сохранен (возможно, в другом шарде).
+    В базе из одного файла и с генератором-хэшем таблица остается пустой
+    """
+    cursor.execute(
+        """
+        CREATE TABLE url_index
+        (
+            url_hash INTEGER NOT NULL,
+            original_url TEXT NOT NULL,
+            code_key INTEGER NOT NULL
+        );
+        """
+    )
+    cursor.execute("CREATE INDEX idx_url_index_url_hash ON url_index (url_hash)")
+
+
+MIGRATIONS: List[Migration] = [
+    _create_urls_table,
+    _widen_shortened_url,
+    _add_click_stats,
+    _add_expiration,
+    _add_change_log,
+    _add_code_sequence,
+    _use_integer_code_keys,
+    _add_url_index,
+]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """
+    Возвращает текущую версию схемы базы
+    """
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(connection: sqlite3.Connection) -> int:
+    """
+    Применяет к базе все миграции, которые еще не были применены.
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением `user_version`,
+    поэтому несколько процессов могут запускать этот метод одновременно
+
+    Args:
+        connection (sqlite3.Connection): Подключение к базе
+
+    Returns:
+        int: Версия схемы после применения миграций
+    """
+    target_version = len(MIGRATIONS)
+    if get_schema_version(connection) >= target_version:
+        return target_version
+
+    if connection.in_transaction:
+        connection.commit()
+
+    while True:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(connection)
+            if version >= target_version:
+                connection.rollback()
+                return version
+
+            cursor = connection.cursor()
+            MIGRATIONS[version](cursor)
+            cursor.execute(f"PRAGMA user_version = {version + 1}")
+            cursor.close()
+            connection.commit()
+            logger.info(f"Applied database migration {version + 1}: {MIGRATIONS[version].__name__}")
+        except Exception:
+            connection.rollback()
+            raise
@@ -3,8 +3,14 @@
 
 """
 
+from datetime import datetime
+from typing import Optional, Tuple
+
 from pydantic import BaseModel, HttpUrl, field_validator
 
+type URLPairRow = Tuple[int, str, str]
+"""Сырая строка таблицы `urls` без валидации: id, оригинальный URL, сокращенный код"""
+
 class URLPairModel(BaseModel):
     """
     Пара связанных URL: Оригинальный и сокращенный
@@ -12,10 +18,12 @@ class URLPairModel(BaseModel):
     Attributes:
         original_url (HttpUrl): Оригинальный URL
         shortened_url_code (str): Сокращенный URL
+        expires_at (Optional[datetime]): Когда истекает срок жизни ссылки. `None` - ссылка бессрочная
     """
 
     original_url: HttpUrl
     shortened_url_code: str
+    expires_at: Optional[datetime] = None
 
     @field_validator("shortened_url_code", mode="before")
     def validated_shortened_code(cls, code: str) -> str:
@@ -0,0 +1,177 @@
+"""
+Пул подключений к SQLite, общий для всего процесса
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import Empty, Full, LifoQueue
+from typing import Dict, Iterator, Optional
+
+from loguru import logger
+
+from app.data.db.pragmas import PragmaValue, connect
+from app.exc.db_exceptions import ConnectionPoolExhaustedError
+
+
+class ConnectionPool:
+    """
+    Ограниченный пул подключений к базе данных с выдачей/возвратом (checkout/checkin)
+
+    Подключения создаются лениво, но не более `max_size` штук. При выдаче подключение проверяется
+    на работоспособность, сломанные подключения закрываются и заменяются новыми.
+
+    Attributes:
+        conn_str (str): Строка для подключения к базе
+        max_size (int): Максимальное количество подключений в пуле
+        timeout (float): Сколько секунд ждать свободное подключение
+        pragmas (Dict[str, PragmaValue]): Профиль PRAGMA, применяемый к каждому новому подключению
+    """
+
+    def __init__(
+        self,
+        conn_str: str,
+        max_size: int = 5,
+        timeout: float = 5.0,
+        pragmas: Optional[Dict[str, PragmaValue]] = None,
+    ):
+        """
+        Конструктор пула
+
+        Args:
+            conn_str (str): Строка для подключения к базе
+            max_size (int): Максимальное количество подключений в пуле
+            timeout (float): Сколько секунд ждать свободное подключение
+            pragmas (Dict[str, PragmaValue]): Профиль PRAGMA для новых подключений
+        """
+        self.conn_str = conn_str
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._checked_out = 0
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = connect(self.conn_str, self.pragmas)
+        logger.debug(f"Created a new pooled connection with database {self.conn_str}")
+        return connection
+
+    @staticmethod
+    def _is_healthy(connection: sqlite3.Connection) -> bool:
+        """
+        Проверяет, что подключение живое и не осталось с незавершенной транзакцией
+        """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, connection: sqlite3.Connection):
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Выдает подключение из пула
+
+        Raises:
+            `ConnectionPoolExhaustedError`: Если за `timeout` секунд не освободилось ни одного подключения
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                with self._lock:
+                    can_create = self._created < self.max_size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        connection = self._connect()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    try:
+                        connection = self._idle.get(timeout=self.timeout)
+                    except Empty:
+                        raise ConnectionPoolExhaustedError() from None
+
+            if self._is_healthy(connection):
+                with self._lock:
+                    self._checked_out += 1
+                return connection
+
+            logger.warning(f"Dropping broken pooled connection with database {self.conn_str}")
+            self._discard(connection)
+
+    def release(self, connection: sqlite3.Connection):
+        """
+        Возвращает подключение в пул
+        """
+        with self._lock:
+            self._checked_out -= 1
+            closed = self._closed
+        if closed:
+            self._discard(connection)
+            return
+
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            self._discard(connection)
+            return
+
+        try:
+            self._idle.put_nowait(connection)
+        except Full:
+            self._discard(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Контекстный менеджер, выдающий подключение на время блока `with`
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """
+        Закрывает все свободные подключения. Выданные подключения закроются при возврате
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(connection)
+        logger.debug(f"Closed connection pool for database {self.conn_str}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику пула: размер, количество созданных, выданных и свободных подключений
+        """
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "created": self._created,
+                "checked_out": self._checked_out,
+                "idle": self._idle.qsize(),
+            }
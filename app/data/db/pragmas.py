@@ -0,0 +1,49 @@
+"""
+Настройка подключений к SQLite через PRAGMA
+"""
+
+import sqlite3
+from typing import Dict, Optional, Union
+
+from loguru import logger
+
+type PragmaValue = Union[str, int]
+
+# journal_mode должен идти первым: остальные настройки применяются уже к выбранному режиму журнала
+PRAGMA_ORDER = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store")
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: Dict[str, PragmaValue]):
+    """
+    Применяет профиль PRAGMA к подключению
+
+    Args:
+        connection (sqlite3.Connection): Подключение к базе
+        pragmas (Dict[str, PragmaValue]): Название PRAGMA -> значение
+    """
+    for name in sorted(pragmas, key=lambda name: PRAGMA_ORDER.index(name) if name in PRAGMA_ORDER else len(PRAGMA_ORDER)):
+        if not name.isidentifier():
+            raise ValueError(f"Некорректное название PRAGMA: {name}")
+        value = pragmas[name]
+        if isinstance(value, str) and not value.isidentifier():
+            raise ValueError(f"Некорректное значение PRAGMA {name}: {value}")
+        connection.execute(f"PRAGMA {name} = {value}").fetchall()
+    logger.debug(f"Applied SQLite pragmas: {pragmas}")
+
+
+def connect(conn_str: str, pragmas: Optional[Dict[str, PragmaValue]] = None) -> sqlite3.Connection:
+    """
+    Открывает подключение к базе и применяет к нему профиль PRAGMA
+
+    Args:
+        conn_str (str): Строка для подключения к базе
+        pragmas (Dict[str, PragmaValue]): Профиль PRAGMA. Если не задан, используются настройки SQLite по умолчанию
+    """
+    connection = sqlite3.connect(conn_str, check_same_thread=False)
+    if pragmas:
+        try:
+            apply_pragmas(connection, pragmas)
+        except Exception:
+            connection.close()
+            raise
+    return connection
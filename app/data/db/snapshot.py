@@ -0,0 +1,160 @@
+"""
+Неизменяемый снимок редиректов для реплик, которые только отдают редиректы: отсортированный бинарный индекс
+"ключ кода -> исходный URL", который читается через mmap без SQLite.
+
+Формат файла (числа - в порядке байт платформы, снимок переносится только между машинами одной архитектуры):
+
+- заголовок: `SNAPSHOT_MAGIC` (8 байт) и количество ссылок `n` (uint64);
+- `n` ключей кодов (int64) по возрастанию - по ним идет бинарный поиск;
+- `n + 1` смещений исходных URL (uint64) относительно начала блока URL: URL номер `i` - байты `[offsets[i], offsets[i + 1])`;
+- `n` сроков жизни ссылок (float64, unix time, NaN - бессрочная);
+- исходные URL в UTF-8 подряд
+"""
+
+import bisect
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from app.data.db.keys import key_to_code
+from app.data.db.models import URLPairRow
+
+SNAPSHOT_MAGIC = b"URLSNAP1"
+_HEADER = struct.Struct("=8sQ")
+_WRITE_CHUNK = 8192  # Сколько элементов массивов копить в памяти перед записью во временный файл
+
+
+class Snapshot:
+    """
+    Открытый через mmap файл снимка. Индекс не копируется и не разбирается при загрузке: бинарный поиск читает ключи
+    прямо из отображенного файла через `memoryview`, без системных вызовов и без промежуточных объектов, кроме чисел
+    при сравнении и найденной строки URL. Страницы файла общие для всех процессов, которые его открыли
+
+    Attributes:
+        path (str): Путь к файлу снимка
+    """
+
+    def __init__(self, path: str):
+        """
+        Открывает файл снимка
+
+        Raises:
+            ValueError: Если файл не является снимком или поврежден
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = memoryview(self._mmap)
+        if len(buffer) < _HEADER.size:
+            raise ValueError(f"Файл {path} слишком короткий для снимка")
+        magic, count = _HEADER.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Файл {path} не является снимком редиректов")
+
+        keys_start = _HEADER.size
+        offsets_start = keys_start + 8 * count
+        expires_start = offsets_start + 8 * (count + 1)
+        self._data_start = expires_start + 8 * count
+        if len(buffer) < self._data_start:
+            raise ValueError(f"Снимок {path} поврежден: файл обрезан")
+
+        self._keys = buffer[keys_start:offsets_start].cast("q")
+        self._offsets = buffer[offsets_start:expires_start].cast("Q")
+        self._expires = buffer[expires_start : self._data_start].cast("d")
+        self._buffer = buffer
+        if len(buffer) != self._data_start + self._offsets[count]:
+            raise ValueError(f"Снимок {path} поврежден: размер блока URL не совпадает с заголовком")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _url(self, index: int) -> str:
+        start = self._data_start + self._offsets[index]
+        return str(self._buffer[start : self._data_start + self._offsets[index + 1]], "utf-8")
+
+    def find(self, key: int) -> Optional[Tuple[str, Optional[float]]]:
+        """
+        Ищет ссылку по ключу сокращенного кода
+
+        Returns:
+            Optional[Tuple[str, Optional[float]]]: Исходный URL и срок жизни ссылки или `None`, если ключа нет
+        """
+        index = bisect.bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            return None
+        expires_at = self._expires[index]
+        return self._url(index), None if math.isnan(expires_at) else expires_at
+
+    def page(self, after_id: int, limit: int) -> List[URLPairRow]:
+        """
+        Страница ссылок с ключами больше `after_id`, по возрастанию ключа
+        """
+        start = bisect.bisect_right(self._keys, after_id)
+        return [
+            (self._keys[index], self._url(index), key_to_code(self._keys[index]))
+            for index in range(start, min(start + limit, len(self._keys)))
+        ]
+
+
+def write_snapshot(rows: Iterable[Tuple[int, str, Optional[float]]], path: str) -> int:
+    """
+    Записывает снимок из строк (ключ кода, исходный URL, срок жизни) и атомарно подменяет им файл `path`
+    (`os.replace`), поэтому читатели видят либо старый снимок, либо новый целиком.
+    Строки не загружаются в память целиком: массивы снимка пишутся во временные файлы и склеиваются в конце
+
+    Args:
+        rows (Iterable[Tuple[int, str, Optional[float]]]): Строки по строго возрастающему ключу
+        path (str): Куда записать снимок
+
+    Returns:
+        int: Количество ссылок в снимке
+
+    Raises:
+        ValueError: Если ключи не возрастают
+    """
+    directory = Path(path).parent
+    with ExitStack() as stack:
+        keys_file, offsets_file, expires_file, data_file = (
+            stack.enter_context(tempfile.TemporaryFile(dir=directory)) for _ in range(4)
+        )
+        keys, offsets, expires = array("q"), array("Q", [0]), array("d")
+        count, offset, previous_key = 0, 0, None
+        for key, original_url, expires_at in rows:
+            if previous_key is not None and key <= previous_key:
+                raise ValueError("Строки снимка должны идти по строго возрастающему ключу")
+            previous_key = key
+            encoded = original_url.encode("utf-8")
+            data_file.write(encoded)
+            offset += len(encoded)
+            keys.append(key)
+            offsets.append(offset)
+            expires.append(math.nan if expires_at is None else expires_at)
+            count += 1
+            if len(keys) >= _WRITE_CHUNK:
+                for target, values in ((keys_file, keys), (offsets_file, offsets), (expires_file, expires)):
+                    values.tofile(target)
+                    del values[:]
+        for target, values in ((keys_file, keys), (offsets_file, offsets), (expires_file, expires)):
+            values.tofile(target)
+
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=f".{Path(path).name}.", delete=False) as output:
+            try:
+                output.write(_HEADER.pack(SNAPSHOT_MAGIC, count))
+                for part in (keys_file, offsets_file, expires_file, data_file):
+                    part.seek(0)
+                    shutil.copyfileobj(part, output)
+                output.flush()
+                os.fsync(output.fileno())
+            except BaseException:
+                os.unlink(output.name)
+                raise
+        os.replace(output.name, path)
+    return count
@@ -0,0 +1,151 @@
+"""
+Фильтр Блума для быстрого отсеивания заведомо несуществующих сокращенных кодов
+"""
+
+import math
+import threading
+from hashlib import blake2b
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class BloomFilter:
+    """
+    Вероятностное множество сокращенных кодов.
+
+    Если код не содержится в фильтре, его точно нет в базе. Если содержится - код есть в базе с вероятностью
+    `1 - error_rate`. Удалить код из фильтра Блума нельзя, поэтому удаления только учитываются, и после того,
+    как удаленных кодов накопится слишком много, фильтр перестраивается по таблице заново
+
+    Attributes:
+        capacity (int): Ожидаемое количество кодов
+        error_rate (float): Допустимая доля ложноположительных срабатываний
+        max_bytes (int): Ограничение на размер битового массива в байтах
+        ready (bool): Построен ли фильтр. Пока фильтр не построен, он считает, что содержит любой код
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, max_bytes: int = 8 * 1024 * 1024):
+        """
+        Конструктор фильтра
+
+        Args:
+            capacity (int): Ожидаемое количество кодов
+            error_rate (float): Допустимая доля ложноположительных срабатываний
+            max_bytes (int): Ограничение на размер битового массива в байтах
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.ready = False
+        self._lock = threading.Lock()
+        size, hash_count = self._optimal_parameters(capacity)
+        self._state: Tuple[bytearray, int, int] = (bytearray(size // 8), size, hash_count)
+        self._count = 0
+        self._removed = 0
+        self._pending: Optional[List[str]] = None
+
+    def _optimal_parameters(self, capacity: int) -> Tuple[int, int]:
+        """
+        Считает размер битового массива и количество хэш-функций под заданное количество элементов
+        """
+        capacity = max(capacity, 1)
+        size = math.ceil(-capacity * math.log(self.error_rate) / (math.log(2) ** 2))
+        size = min(max(size, 64), self.max_bytes * 8)
+        size += -size % 8
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return size, hash_count
+
+    @staticmethod
+    def _positions(code: str, size: int, hash_count: int) -> Iterable[int]:
+        digest = blake2b(code.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % size for i in range(hash_count))
+
+    @classmethod
+    def _set(cls, bits: bytearray, code: str, size: int, hash_count: int):
+        for position in cls._positions(code, size, hash_count):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, code: str) -> bool:
+        if not self.ready:
+            return True
+
+        bits, size, hash_count = self._state
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(code, size, hash_count))
+
+    def add(self, code: str):
+        """
+        Добавляет код в фильтр
+        """
+        with self._lock:
+            bits, size, hash_count = self._state
+            self._set(bits, code, size, hash_count)
+            self._count += 1
+            if self._pending is not None:
+                self._pending.append(code)
+
+    def note_removal(self):
+        """
+        Учитывает удаление кода из базы. Сам код остается в фильтре до следующего перестроения
+        """
+        with self._lock:
+            self._removed += 1
+
+    def invalidate(self):
+        """
+        Помечает фильтр как неактуальный: до следующего перестроения он считает, что содержит любой код
+        """
+        self.ready = False
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """
+        Нужно ли перестроить фильтр: он помечен неактуальным, удаленных кодов стало слишком много
+        или кодов больше, чем рассчитан фильтр
+        """
+        return not self.ready or self._removed > self._count // 10 or self._count > self.capacity
+
+    def rebuild(self, codes: Iterable[str], total: int = 0):
+        """
+        Перестраивает фильтр по актуальному набору кодов и атомарно подменяет битовый массив.
+        Коды, добавленные во время перестроения, переносятся в новый массив
+
+        Args:
+            codes (Iterable[str]): Все коды из базы
+            total (int): Количество кодов в базе, чтобы подобрать размер фильтра
+        """
+        with self._lock:
+            self._pending = []
+
+        try:
+            size, hash_count = self._optimal_parameters(max(self.capacity, total * 2))
+            bits = bytearray(size // 8)
+            count = 0
+            for code in codes:
+                self._set(bits, code, size, hash_count)
+                count += 1
+
+            with self._lock:
+                for code in self._pending or []:
+                    self._set(bits, code, size, hash_count)
+                    count += 1
+                self._state = (bits, size, hash_count)
+                self.capacity = max(self.capacity, total * 2)
+                self._count = count
+                self._removed = 0
+                self.ready = True
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику фильтра: размер в байтах, количество хэш-функций, добавленные и удаленные коды
+        """
+        bits, _, hash_count = self._state
+        return {
+            "bytes": len(bits),
+            "hash_count": hash_count,
+            "items": self._count,
+            "removed": self._removed,
+        }
@@ -1,12 +1,35 @@
 import sqlite3
-from typing import List, Optional, Self
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Self, Tuple
 from loguru import logger
 
-from app.data.db.models import URLPairModel
+from app.data.db.keys import code_to_key, key_to_code, url_hash
+from app.data.db.migrations import apply_migrations
+from app.data.db.models import URLPairModel, URLPairRow
+from app.data.db.pool import ConnectionPool
+from app.data.db.pragmas import PragmaValue, connect
+from app.data.repository.bloom_filter import BloomFilter
 from app.exc.db_exceptions import (
+    URLExpiredError,
     URLNotFoundError,
     ConnectionNotEstablishedError,
+    ShortCodeCollisionError,
 )
+from app.metrics import timed
+
+SQLITE_MAX_PARAMS = 500  # Сколько параметров подставлять в один запрос `IN (...)`
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _pair_key(pair: URLPairModel) -> int:
+    key = code_to_key(pair.shortened_url_code)
+    if key is None:
+        raise ValueError(f"Сокращенный код должен состоять из символов base62: {pair.shortened_url_code}")
+    return key
 
 
 class Repository:
@@ -16,113 +39,299 @@ class Repository:
     Attributes:
         db: Подключение к базе
         cursor: Курсор для работы с запросами
+        pool: Пул подключений, из которого репозиторий берет подключение (если задан)
+        bloom_filter: Фильтр Блума существующих кодов для отсеивания несуществующих без запроса к базе (если задан)
+        pragmas: Профиль PRAGMA для собственного подключения репозитория (подключения из пула настраивает пул)
+        blocking: Блокируют ли методы репозитория поток (ходят в базу). Неблокирующие репозитории сервис вызывает
+            прямо в event loop, без пула потоков
     """
 
-    def __init__(self, conn_str: str):
+    blocking = True
+
+    def __init__(
+        self,
+        conn_str: str,
+        pool: Optional[ConnectionPool] = None,
+        bloom_filter: Optional[BloomFilter] = None,
+        pragmas: Optional[Dict[str, PragmaValue]] = None,
+    ):
         """
         Конструктор репозитория
 
         Args:
             conn_str: Строка для подключения к базе
+            pool: Пул подключений. Если не задан, репозиторий открывает собственное подключение
+            bloom_filter: Фильтр Блума существующих кодов
+            pragmas: Профиль PRAGMA для собственного подключения
         """
         self.conn_str = conn_str
+        self.pool = pool
+        self.bloom_filter = bloom_filter
+        self.pragmas = pragmas
         self.connection = None
 
+    def copy(self) -> Self:
+        """
+        Возвращает неподключенную копию репозитория с тем же пулом, фильтром Блума и профилем PRAGMA
+        """
+        return Repository(self.conn_str, self.pool, self.bloom_filter, self.pragmas)
+
     def __enter__(self) -> Self:  # ty:ignore[invalid-return-type]
         try:
-            self.connection = sqlite3.connect(self.conn_str, check_same_thread=False)
-            logger.debug(f"Created a new connection with database {self.conn_str}")
+            if self.pool is not None:
+                self.connection = self.pool.acquire()
+            else:
+                self.connection = connect(self.conn_str, self.pragmas)
+                logger.debug(f"Created a new connection with database {self.conn_str}")
             return self
         except sqlite3.OperationalError as exc:
             logger.error(f"Error occured while working with DB: {str(exc)}")
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
         if self.connection:
-            logger.debug(f"Closing connection with database {self.conn_str}")
-            self.connection.close()
+            if self.pool is not None:
+                self.pool.release(self.connection)
+            else:
+                logger.debug(f"Closing connection with database {self.conn_str}")
+                self.connection.close()
+            self.connection = None
 
+    @timed("db")
     def initialize_database(self):
         """
-        Создает в базе необходимую таблицу для работы с парами URL
+        Приводит схему базы к актуальной версии, применяя недостающие миграции
 
         Raises:
             `ConnectionNotEstablishedError`: Если не установлено соединение с базой
         """
         if self.connection:
-            with self.connection as db:
-                cursor = db.cursor()
-                cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS urls 
-                    (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        original_url TEXT UNIQUE,
-                        shortened_url VARCHAR(5) UNIQUE
-                    );
-                    """
-                )
-                db.commit()
-                cursor.close()
+            apply_migrations(self.connection)
         else:
             raise ConnectionNotEstablishedError()
 
+    @timed("db")
     def insert_new_url_pair(self, pair: URLPairModel) -> Optional[str]:
         """
         Вставляет в базу данных новую пару связанных URL
 
         Args:
             pair (`URLPairModel`): Пара связанных URL
+
+        Returns:
+            Optional[str]: Уже существующий код, если исходный URL уже есть в базе. `None` - если пара вставлена
+
+        Raises:
+            `ShortCodeCollisionError`: Если сокращенный код уже занят другим URL
+            `ConnectionNotEstablishedError`: Если соединение с базой не установлено
+        """
+        if self.connection:
+            original_url, key, hash_ = str(pair.original_url), _pair_key(pair), url_hash(str(pair.original_url))
+            # Частый случай - URL уже сокращали: хватает одного чтения, без блокировки на запись
+            existing = self.connection.execute(
+                "SELECT id, expires_at FROM urls WHERE url_hash = ? AND original_url = ?", (hash_, original_url)
+            ).fetchone()
+            if existing is not None:
+                expires_at = _timestamp(pair.expires_at)
+                if existing[1] is not None and (expires_at is None or expires_at > existing[1]):
+                    with self.connection as db:
+                        self._extend_existing_pairs(db.cursor(), [pair])
+                return key_to_code(existing[0])
+
+            with self.connection as db:
+                db.execute("BEGIN IMMEDIATE")
+                # Вставка одним запросом: ничего не вставляет, если этот URL успел вставить другой процесс
+                # или если код уже занят (конфликт первичного ключа)
+                inserted = db.execute(
+                    """
+                    INSERT INTO urls (id, original_url, url_hash, expires_at)
+                    SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM urls WHERE url_hash = ? AND original_url = ?)
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING id
+                    """,
+                    (key, original_url, hash_, _timestamp(pair.expires_at), hash_, original_url),
+                ).fetchall()
+                if not inserted:
+                    existing_codes = self._find_codes_by_original_urls(db.cursor(), [original_url])
+                    if not existing_codes:
+                        raise ShortCodeCollisionError()
+                    self._extend_existing_pairs(db.cursor(), [pair])
+                    return existing_codes[original_url]
+
+            if self.bloom_filter is not None:
+                self.bloom_filter.add(pair.shortened_url_code)
+
+        else:
+            raise ConnectionNotEstablishedError()
+
+    @staticmethod
+    def _extend_existing_pairs(cursor: sqlite3.Cursor, pairs: List[URLPairModel]):
+        """
+        Согласует срок жизни уже существующих ссылок с повторным сокращением тех же URL: код переиспользуется,
+        поэтому ссылка должна жить не меньше, чем просили. Запрос без срока делает ссылку бессрочной,
+        иначе остается более поздний срок (истекшая, но еще не удаленная ссылка так продлевается)
+        ! Только для внутреннего использования
+        """
+        cursor.executemany(
+            """
+            UPDATE urls SET expires_at = :expires_at
+            WHERE url_hash = :url_hash AND original_url = :original_url
+                AND expires_at IS NOT NULL AND (:expires_at IS NULL OR expires_at < :expires_at)
+            """,
+            (
+                {"expires_at": _timestamp(pair.expires_at), "url_hash": url_hash(str(pair.original_url)), "original_url": str(pair.original_url)}
+                for pair in pairs
+            ),
+        )
+
+    def _find_codes_by_original_urls(self, cursor: sqlite3.Cursor, original_urls: List[str]) -> Dict[str, str]:
+        """
+        Ищет сокращенные коды для набора исходных URL по индексу хэшей запросами `IN` по `SQLITE_MAX_PARAMS` параметров.
+        Совпадения хэшей у разных URL отсеиваются сравнением строк
+        ! Только для внутреннего использования
+        """
+        wanted = set(original_urls)
+        found: Dict[str, str] = {}
+        for start in range(0, len(original_urls), SQLITE_MAX_PARAMS):
+            chunk = [url_hash(url) for url in original_urls[start : start + SQLITE_MAX_PARAMS]]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT original_url, id FROM urls WHERE url_hash IN ({placeholders})", chunk)
+            found.update((url, key_to_code(key)) for url, key in cursor.fetchall() if url in wanted)
+        return found
+
+    @timed("db")
+    def insert_new_url_pairs(self, pairs: List[URLPairModel]) -> Dict[str, str]:
+        """
+        Вставляет в базу набор пар связанных URL одной транзакцией.
+        Уже существующие URL не вставляются повторно
+
+        Args:
+            pairs (List[URLPairModel]): Пары связанных URL
+
+        Returns:
+            Dict[str, str]: Исходный URL -> сокращенный код из базы. Пары, которые не удалось вставить
+                из-за совпадения сокращенного кода с чужим, в результат не попадают
+
         Raises:
             `ConnectionNotEstablishedError`: Если соединение с базой не установлено
         """
         if self.connection:
+            by_url = {str(pair.original_url): pair for pair in pairs}
             with self.connection as db:
                 cursor = db.cursor()
-                try:
-                    cursor.execute(
-                        "INSERT INTO urls (original_url, shortened_url) VALUES (?, ?)",
-                        (str(pair.original_url), pair.shortened_url_code),
+                cursor.execute("BEGIN IMMEDIATE")
+                found = self._find_codes_by_original_urls(cursor, list(by_url))
+                self._extend_existing_pairs(cursor, [by_url[url] for url in found])
+                missing = [url for url in by_url if url not in found]
+                if missing:
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO urls (id, original_url, url_hash, expires_at) VALUES (?, ?, ?, ?)",
+                        (
+                            (_pair_key(by_url[url]), url, url_hash(url), _timestamp(by_url[url].expires_at))
+                            for url in missing
+                        ),
                     )
-                    db.commit()
+                db.commit()
+                if missing:
+                    inserted = self._find_codes_by_original_urls(cursor, missing)
+                    if self.bloom_filter is not None:
+                        for code in inserted.values():
+                            self.bloom_filter.add(code)
+                    found.update(inserted)
+                cursor.close()
+            return found
+        else:
+            raise ConnectionNotEstablishedError()
 
-                except sqlite3.IntegrityError:
-                    db.rollback()
-                    cursor.execute(
-                        "SELECT shortened_url FROM urls WHERE original_url = ?",
-                        (str(pair.original_url),),
-                    )
-                    return cursor.fetchone()[0]
+    def might_contain(self, short_url: str) -> bool:
+        """
+        Проверяет по фильтру Блума, может ли сокращенный код быть в базе. Не обращается к базе
+
+        Args:
+            short_url (str): Сокращенный URL
+
+        Returns:
+            bool: `False`, если кода точно нет в базе, иначе `True`
+        """
+        return self.bloom_filter is None or short_url in self.bloom_filter
+
+    def _iter_short_codes(self) -> Iterator[str]:
+        """
+        Отдает все сокращенные коды из базы короткими запросами, чтобы не держать долгую блокировку на чтение
+        ! Только для внутреннего использования
+        """
+        return (code for _, _, code in self.iter_pairs(batch_size=10000))
+
+    @timed("db")
+    def rebuild_bloom_filter(self):
+        """
+        Перестраивает фильтр Блума по всем кодам из базы
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.bloom_filter is None:
+            return
 
+        if self.connection:
+            total = self.connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            self.bloom_filter.rebuild(self._iter_short_codes(), total=total)
+            logger.debug(f"Rebuilt bloom filter with {total} codes: {self.bloom_filter.stats()}")
         else:
             raise ConnectionNotEstablishedError()
 
-    def get_original_url_from_shortened(self, short_url: str) -> str:
+    @timed("db")
+    def get_original_url_and_expiry(self, short_url: str) -> Tuple[str, Optional[float]]:
         """
-        Возвращает из базы оригинальный URL по его сокращенной версии
+        Возвращает из базы оригинальный URL по его сокращенной версии вместе со сроком жизни ссылки
 
         Args:
             short_url (str): Сокращенный URL
 
         Returns:
-            str: Оригинальный URL
+            Tuple[str, Optional[float]]: Оригинальный URL и время истечения ссылки (unix time) или `None`
+
+        Raises:
+            `URLNotFoundError`: Если URL не найден в базе
+            `URLExpiredError`: Если срок жизни ссылки истек
         """
+        key = code_to_key(short_url)
+        if key is None or not self.might_contain(short_url):
+            raise URLNotFoundError()
+
         if self.connection:
             with self.connection as db:
                 cursor = db.cursor()
 
-                cursor.execute(
-                    "SELECT original_url FROM urls WHERE shortened_url = ?",
-                    (short_url,),
-                )
+                cursor.execute("SELECT original_url, expires_at FROM urls WHERE id = ?", (key,))
                 url = cursor.fetchone()
                 if url is None:
                     raise URLNotFoundError()
 
-                return url[0]
+                if url[1] is not None and url[1] <= time.time():
+                    raise URLExpiredError()
+
+                return url[0], url[1]
 
         else:
             raise ConnectionNotEstablishedError()
 
+    def get_original_url_from_shortened(self, short_url: str) -> str:
+        """
+        Возвращает из базы оригинальный URL по его сокращенной версии
+
+        Args:
+            short_url (str): Сокращенный URL
+
+        Returns:
+            str: Оригинальный URL
+
+        Raises:
+            `URLNotFoundError`: Если URL не найден в базе
+            `URLExpiredError`: Если срок жизни ссылки истек
+        """
+        return self.get_original_url_and_expiry(short_url)[0]
+
+    @timed("db")
     def delete_url_pair(self, shorten_url: str):
         """
         Удаляет из базы связку URL
@@ -136,16 +345,17 @@ class Repository:
         if self.connection:
             with self.connection as db:
                 cursor = db.cursor()
-                cursor.execute(
-                    "DELETE FROM urls WHERE shortened_url = ?", (shorten_url,)
-                )
+                cursor.execute("DELETE FROM urls WHERE id = ?", (code_to_key(shorten_url),))
                 if cursor.rowcount == 0:
                     raise URLNotFoundError()
                     
                 db.commit()
+                if self.bloom_filter is not None:
+                    self.bloom_filter.note_removal()
         else:
             ConnectionNotEstablishedError()
 
+    @timed("db")
     def get_all_pairs(self) -> List[URLPairModel]:
         """
         Возвращает все пары URL из базы
@@ -159,11 +369,294 @@ class Repository:
         if self.connection:
             with self.connection as db:
                 cursor = db.cursor()
-                cursor.execute("SELECT * FROM urls")
+                cursor.execute("SELECT id, original_url FROM urls")
                 urls = cursor.fetchall()
                 return [
-                    URLPairModel(original_url=pair[1], shortened_url_code=pair[2])
+                    URLPairModel(original_url=pair[1], shortened_url_code=key_to_code(pair[0]))
                     for pair in urls
                 ]
         else:
-            raise ConnectionNotEstablishedError()
\ No newline at end of file
+            raise ConnectionNotEstablishedError()
+
+    @timed("db")
+    def get_pairs_page(self, after_id: int = 0, limit: int = 100) -> List[URLPairRow]:
+        """
+        Возвращает страницу пар URL, отсортированных по id - ключу сокращенного кода (keyset-пагинация)
+
+        Args:
+            after_id (int): id последней пары с предыдущей страницы. 0 - первая страница
+            limit (int): Размер страницы
+
+        Returns:
+            List[URLPairRow]: Строки (id, оригинальный URL, сокращенный код)
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            rows = self.connection.execute(
+                "SELECT id, original_url FROM urls WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+            return [(key, original_url, key_to_code(key)) for key, original_url in rows]
+        else:
+            raise ConnectionNotEstablishedError()
+
+    @timed("db")
+    def get_redirects_page(
+        self, after_id: int = 0, limit: int = 1000, include_expired: bool = False
+    ) -> List[Tuple[int, str, Optional[float]]]:
+        """
+        Возвращает страницу действующих (не истекших) ссылок, отсортированных по id, со сроками жизни.
+        Используется для выгрузки снимка редиректов и резервных копий
+
+        Args:
+            after_id (int): id последней ссылки с предыдущей страницы. 0 - первая страница
+            limit (int): Размер страницы
+            include_expired (bool): Выдавать ли и истекшие, но еще не удаленные ссылки
+
+        Returns:
+            List[Tuple[int, str, Optional[float]]]: Строки (id, оригинальный URL, срок жизни)
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            return self.connection.execute(
+                "SELECT id, original_url, expires_at FROM urls "
+                "WHERE id > ? AND (? OR expires_at IS NULL OR expires_at > ?) ORDER BY id LIMIT ?",
+                (after_id, include_expired, time.time(), limit),
+            ).fetchall()
+        else:
+            raise ConnectionNotEstablishedError()
+
+    def iter_pairs(self, after_id: int = 0, batch_size: int = 1000) -> Iterator[URLPairRow]:
+        """
+        Лениво отдает все пары URL, начиная после `after_id`, читая базу страницами по `batch_size` строк.
+        Таблица целиком в память не загружается
+
+        Args:
+            after_id (int): id, после которого начинать выдачу
+            batch_size (int): Сколько строк читать за один запрос
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        while True:
+            rows = self.get_pairs_page(after_id, batch_size)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    def iter_redirects(
+        self, after_id: int = 0, batch_size: int = 1000, include_expired: bool = False
+    ) -> Iterator[Tuple[int, str, Optional[float]]]:
+        """
+        Лениво отдает ссылки со сроками жизни, начиная после `after_id`, читая базу страницами по `batch_size` строк
+
+        Args:
+            after_id (int): id, после которого начинать выдачу
+            batch_size (int): Сколько строк читать за один запрос
+            include_expired (bool): Выдавать ли и истекшие, но еще не удаленные ссылки
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        while True:
+            rows = self.get_redirects_page(after_id, batch_size, include_expired)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    @timed("db")
+    def add_clicks(self, clicks: List[Tuple[str, int, float]]):
+        """
+        Прибавляет переходы к счетчикам ссылок одной транзакцией
+
+        Args:
+            clicks (List[Tuple[str, int, float]]): Сокращенный код, количество переходов, время последнего перехода
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            with self.connection as db:
+                db.executemany(
+                    """
+                    UPDATE urls
+                    SET clicks = clicks + ?, last_access_at = MAX(COALESCE(last_access_at, 0), ?)
+                    WHERE id = ?
+                    """,
+                    ((count, last_access_at, code_to_key(short_url)) for short_url, count, last_access_at in clicks),
+                )
+        else:
+            raise ConnectionNotEstablishedError()
+
+    @timed("db")
+    def get_click_stats(self, short_url: str) -> Tuple[int, Optional[float]]:
+        """
+        Возвращает статистику переходов по сокращенному коду
+
+        Args:
+            short_url (str): Сокращенный URL
+
+        Returns:
+            Tuple[int, Optional[float]]: Количество переходов и время последнего перехода (unix time)
+
+        Raises:
+            `URLNotFoundError`: Если URL не найден в базе
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            row = self.connection.execute(
+                "SELECT clicks, last_access_at FROM urls WHERE id = ?", (code_to_key(short_url),)
+            ).fetchone()
+            if row is None:
+                raise URLNotFoundError()
+            return row[0], row[1]
+        else:
+            raise ConnectionNotEstablishedError()
+
+    def delete_expired_pairs(self, limit: int = 500) -> List[str]:
+        """
+        Удаляет из базы не больше `limit` истекших ссылок одной короткой транзакцией
+
+        Args:
+            limit (int): Максимальное количество удаляемых ссылок
+
+        Returns:
+            List[str]: Сокращенные коды удаленных ссылок
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        return [key_to_code(key) for key, _ in self._delete_expired_rows(limit)]
+
+    @timed("db")
+    def _delete_expired_rows(self, limit: int) -> List[Tuple[int, str]]:
+        """
+        Удаляет не больше `limit` истекших ссылок и возвращает ключи кодов и исходные URL удаленных строк
+        ! Только для внутреннего использования
+        """
+        if self.connection:
+            with self.connection as db:
+                rows = db.execute(
+                    """
+                    DELETE FROM urls WHERE id IN
+                    (
+                        SELECT id FROM urls WHERE expires_at IS NOT NULL AND expires_at <= ? LIMIT ?
+                    )
+                    RETURNING id, original_url
+                    """,
+                    (time.time(), limit),
+                ).fetchall()
+            if self.bloom_filter is not None:
+                for _ in rows:
+                    self.bloom_filter.note_removal()
+            return rows
+        else:
+            raise ConnectionNotEstablishedError()
+
+    def get_data_version(self) -> int:
+        """
+        Возвращает `PRAGMA data_version` подключения: значение меняется, когда базу изменяет другое подключение
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+        else:
+            raise ConnectionNotEstablishedError()
+
+    def get_last_change_id(self) -> int:
+        """
+        Возвращает id последней записи, добавленной в журнал изменений таблицы `urls` (0, если записей еще не было)
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            row = self.connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'url_changes'").fetchone()
+            return row[0] if row else 0
+        else:
+            raise ConnectionNotEstablishedError()
+
+    @timed("db")
+    def get_changes_since(self, last_id: int) -> Tuple[List[Tuple[int, str, str]], bool]:
+        """
+        Возвращает изменения таблицы `urls` после записи журнала `last_id`
+
+        Args:
+            last_id (int): id последнего уже обработанного изменения
+
+        Returns:
+            Tuple[List[Tuple[int, str, str]], bool]: Изменения (id, сокращенный код, `insert` или `delete`)
+                и признак того, что часть изменений уже удалена из журнала и была пропущена
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            # Первый id, который еще можно прочитать: если журнал очищен целиком - следующий id последовательности
+            first_id = self.connection.execute(
+                """
+                SELECT COALESCE(
+                    (SELECT MIN(id) FROM url_changes),
+                    (SELECT seq + 1 FROM sqlite_sequence WHERE name = 'url_changes'),
+                    1
+                )
+                """
+            ).fetchone()[0]
+            changes = self.connection.execute(
+                "SELECT id, code_key, change FROM url_changes WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+            return [(change_id, key_to_code(key), change) for change_id, key, change in changes], first_id > last_id + 1
+        else:
+            raise ConnectionNotEstablishedError()
+
+    @timed("db")
+    def prune_changes(self, older_than: float) -> int:
+        """
+        Удаляет из журнала изменений записи старше `older_than`
+
+        Args:
+            older_than (float): Граница по времени (unix time)
+
+        Returns:
+            int: Количество удаленных записей
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если не установлено соединение с базой
+        """
+        if self.connection:
+            with self.connection as db:
+                return db.execute("DELETE FROM url_changes WHERE changed_at < ?", (older_than,)).rowcount
+        else:
+            raise ConnectionNotEstablishedError()
+
+    @timed("db")
+    def allocate_code_block(self, size: int) -> int:
+        """
+        Резервирует в последовательности номеров блок из `size` номеров для генератора кодов
+
+        Args:
+            size (int): Размер блока
+
+        Returns:
+            int: Первый номер блока. Блок - номера от него до `+ size` (не включительно)
+
+        Raises:
+            `ConnectionNotEstablishedError`: Если соединение с базой не установлено
+        """
+        if self.connection:
+            with self.connection as db:
+                ((next_id,),) = db.execute(
+                    "UPDATE code_sequence SET next_id = next_id + ? WHERE name = 'urls' RETURNING next_id",
+                    (size,),
+                ).fetchall()
+            return next_id - size
+        else:
+            raise ConnectionNotEstablishedError()
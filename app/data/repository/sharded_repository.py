@@ -0,0 +1,442 @@
+import heapq
+import sqlite3
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Self, Tuple
+
+from loguru import logger
+
+from app.data.db.keys import code_to_key, key_to_code, shard_for_code, url_hash
+from app.data.db.migrations import apply_migrations
+from app.data.db.models import URLPairModel, URLPairRow
+from app.data.db.pragmas import PragmaValue, connect
+from app.data.repository.repository import SQLITE_MAX_PARAMS, Repository, _pair_key
+from app.exc.db_exceptions import ShortCodeCollisionError, URLNotFoundError
+
+_RESHARD_COLUMNS = "id, original_url, url_hash, clicks, last_access_at, expires_at"
+
+
+def shard_names(conn_str: str, shards: int) -> List[str]:
+    """
+    Имена файлов шардов базы. Шард 0 - сам файл `conn_str`, поэтому база из одного шарда - обычная база,
+    остальные лежат рядом: `links.sqlite3` -> `links.shard1.sqlite3`, `links.shard2.sqlite3`, ...
+
+    Args:
+        conn_str (str): Имя файла базы
+        shards (int): Количество шардов
+
+    Returns:
+        List[str]: Имена файлов в порядке номеров шардов
+    """
+    path = Path(conn_str)
+    return [conn_str] + [str(path.with_name(f"{path.stem}.shard{index}{path.suffix}")) for index in range(1, shards)]
+
+
+def _index_urls(connections: List[sqlite3.Connection], batch_size: int = 5000) -> int:
+    """
+    Заносит пары всех шардов в индекс URL их шардов-владельцев (`url_hash % шардов`). Уже проиндексированные URL
+    пропускаются, поэтому прерванное построение можно запустить заново
+    ! Только для внутреннего использования
+
+    Returns:
+        int: Количество просмотренных пар
+    """
+    total = 0
+    for connection in connections:
+        after_id = 0
+        while True:
+            rows = connection.execute(
+                "SELECT id, original_url, url_hash FROM urls WHERE id > ? ORDER BY id LIMIT ?", (after_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+            by_owner: Dict[int, List[Tuple]] = defaultdict(list)
+            for key, original_url, hash_ in rows:
+                by_owner[hash_ % len(connections)].append((hash_, original_url, key, hash_, original_url))
+            for owner, entries in by_owner.items():
+                with connections[owner] as target:
+                    target.executemany(
+                        """
+                        INSERT INTO url_index (url_hash, original_url, code_key)
+                        SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM url_index WHERE url_hash = ? AND original_url = ?)
+                        """,
+                        entries,
+                    )
+            total += len(rows)
+    return total
+
+
+class ShardedRepository(Repository):
+    """
+    Репозиторий поверх нескольких файлов SQLite (шардов). У каждого шарда своя блокировка на запись,
+    поэтому вставки в разные шарды идут параллельно.
+
+    Пара хранится в шарде, номер которого вычисляется по сокращенному коду (`shard_for_code`), поэтому редирект,
+    удаление и статистика обращаются ровно к одному шарду. Выдача всех пар - слияние отсортированных по ключу
+    страниц шардов. Последовательность номеров для генератора-счетчика хранится в шарде 0.
+
+    Генератор-хэш выводит код из самого URL, поэтому уже сокращенный URL ищется только в шарде своего кода:
+    проверка и вставка - одна транзакция в одном шарде. Коды генератора-счетчика от URL не зависят, для него
+    (`url_index=True`) уже сокращенный URL ищется в индексе URL (`url_index`) одного шарда-владельца, номер которого
+    вычисляется по хэшу URL, поэтому вставка обращается не больше чем к двум шардам. URL сначала закрепляется за кодом
+    в индексе владельца (под блокировкой на запись владельца, так что два процесса не закрепят один URL за разными
+    кодами), затем пара вставляется в шард кода. Запись индекса удаляется вместе с парой, в том числе при удалении
+    истекших ссылок. Запись, оставшаяся после сбоя между шардами, безвредна: повторное сокращение такого URL
+    восстанавливает ссылку со старым кодом, а если код уже занят другим URL, запись снимается и код подбирается заново.
+    `reshard` перестраивает индекс целиком, в том числе после смены генератора
+
+    Подключение к шарду берется только на время операции (из пула шарда, если он задан),
+    либо используется подключение, открытое входом в контекстный менеджер репозитория
+
+    Attributes:
+        shards (List[Repository]): Репозитории шардов, в порядке номеров
+        url_index (bool): Искать уже сокращенные URL через индекс URL (для кодов, не зависящих от URL)
+    """
+
+    def __init__(self, shards: List[Repository], url_index: bool = False):
+        """
+        Конструктор репозитория
+
+        Args:
+            shards (List[Repository]): Неподключенные репозитории шардов с общим фильтром Блума
+            url_index (bool): Искать уже сокращенные URL через индекс URL. Нужен генератору-счетчику
+        """
+        super().__init__(shards[0].conn_str, bloom_filter=shards[0].bloom_filter, pragmas=shards[0].pragmas)
+        self.shards = shards
+        self.url_index = url_index and len(shards) > 1
+
+    def copy(self) -> Self:
+        return ShardedRepository([shard.copy() for shard in self.shards], self.url_index)  # ty:ignore[invalid-return-type]
+
+    def __enter__(self) -> Self:
+        for shard in self.shards:
+            shard.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        for shard in self.shards:
+            shard.__exit__(exc_type, exc_value, exc_traceback)
+
+    @contextmanager
+    def _shard(self, index: int) -> Iterator[Repository]:
+        """
+        Подключенный репозиторий шарда на время операции
+        ! Только для внутреннего использования
+        """
+        shard = self.shards[index]
+        if shard.connection is not None:
+            yield shard
+        else:
+            with shard.copy() as connected:
+                yield connected
+
+    def _shard_for(self, short_url: str) -> int:
+        return shard_for_code(short_url, len(self.shards))
+
+    def _owner_for(self, original_url: str) -> int:
+        return url_hash(original_url) % len(self.shards)
+
+    def initialize_database(self):
+        with ExitStack() as stack:
+            shards = [stack.enter_context(self._shard(index)) for index in range(len(self.shards))]
+            for shard in shards:
+                shard.initialize_database()
+            connections = [shard.connection for shard in shards]
+            # База шардов, созданная до появления индекса URL: индекс строится один раз
+            if self.url_index and not any(
+                connection.execute("SELECT 1 FROM url_index LIMIT 1").fetchone() for connection in connections
+            ):
+                indexed = _index_urls(connections)  # ty:ignore[invalid-argument-type]
+                if indexed:
+                    logger.info(f"Built url index for {indexed} pairs in {len(shards)} shards")
+
+    @staticmethod
+    def _find_claims(cursor: sqlite3.Cursor, original_urls: List[str]) -> Dict[str, int]:
+        """
+        Ищет исходные URL в индексе URL шарда запросами `IN` по `SQLITE_MAX_PARAMS` параметров
+        ! Только для внутреннего использования
+        """
+        wanted = set(original_urls)
+        found: Dict[str, int] = {}
+        for start in range(0, len(original_urls), SQLITE_MAX_PARAMS):
+            chunk = [url_hash(url) for url in original_urls[start : start + SQLITE_MAX_PARAMS]]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT original_url, code_key FROM url_index WHERE url_hash IN ({placeholders})", chunk)
+            found.update((url, key) for url, key in cursor.fetchall() if url in wanted)
+        return found
+
+    @staticmethod
+    def _claim_urls(shard: Repository, pairs: List[URLPairModel]) -> Dict[str, int]:
+        """
+        Закрепляет исходные URL за кодами пар в индексе URL шарда-владельца.
+        Уже закрепленные URL остаются за своими кодами
+        ! Только для внутреннего использования
+
+        Returns:
+            Dict[str, int]: Исходный URL -> ключ кода, за которым он закреплен
+        """
+        assert shard.connection is not None
+        by_url = {str(pair.original_url): pair for pair in pairs}
+        with shard.connection as db:
+            cursor = db.cursor()
+            # Частый случай - URL уже сокращали: хватает одного чтения, без блокировки на запись
+            claimed = ShardedRepository._find_claims(cursor, list(by_url))
+            missing = [url for url in by_url if url not in claimed]
+            if missing:
+                cursor.execute("BEGIN IMMEDIATE")
+                claimed.update(ShardedRepository._find_claims(cursor, missing))
+                missing = [url for url in missing if url not in claimed]
+                new_claims = {url: _pair_key(by_url[url]) for url in missing}
+                cursor.executemany(
+                    "INSERT INTO url_index (url_hash, original_url, code_key) VALUES (?, ?, ?)",
+                    ((url_hash(url), url, key) for url, key in new_claims.items()),
+                )
+                claimed.update(new_claims)
+            cursor.close()
+        return claimed
+
+    @staticmethod
+    def _release_urls(shard: Repository, claims: Dict[str, int]):
+        """
+        Снимает закрепление URL за кодами: удаленных пар и кодов, которые оказались заняты другими URL
+        ! Только для внутреннего использования
+        """
+        assert shard.connection is not None
+        with shard.connection as db:
+            db.executemany(
+                "DELETE FROM url_index WHERE url_hash = ? AND original_url = ? AND code_key = ?",
+                ((url_hash(url), url, key) for url, key in claims.items()),
+            )
+
+    def insert_new_url_pair(self, pair: URLPairModel) -> Optional[str]:
+        if not self.url_index:
+            with self._shard(self._shard_for(pair.shortened_url_code)) as shard:
+                return shard.insert_new_url_pair(pair)
+
+        original_url = str(pair.original_url)
+        owner = self._owner_for(original_url)
+        with self._shard(owner) as shard:
+            key = self._claim_urls(shard, [pair])[original_url]
+        code = key_to_code(key)
+
+        try:
+            with self._shard(self._shard_for(code)) as shard:
+                # Пара вставляется под закрепленным кодом. Если URL уже сохранен, срок жизни согласуется
+                # так же, как при повторном сокращении в одном шарде
+                existing = shard.insert_new_url_pair(
+                    pair.model_copy(update={"shortened_url_code": code}) if code != pair.shortened_url_code else pair
+                )
+        except ShortCodeCollisionError:
+            with self._shard(owner) as shard:
+                self._release_urls(shard, {original_url: key})
+            raise
+        if existing is None and code != pair.shortened_url_code:
+            return code
+        return existing
+
+    def insert_new_url_pairs(self, pairs: List[URLPairModel]) -> Dict[str, str]:
+        by_shard: Dict[int, List[URLPairModel]] = defaultdict(list)
+        found: Dict[str, str] = {}
+        if not self.url_index:
+            for pair in pairs:
+                by_shard[self._shard_for(pair.shortened_url_code)].append(pair)
+            for index, shard_pairs in by_shard.items():
+                with self._shard(index) as shard:
+                    found.update(shard.insert_new_url_pairs(shard_pairs))
+            return found
+
+        by_owner: Dict[int, List[URLPairModel]] = defaultdict(list)
+        for pair in {str(pair.original_url): pair for pair in pairs}.values():
+            by_owner[self._owner_for(str(pair.original_url))].append(pair)
+        claims: Dict[str, int] = {}
+        for owner, owner_pairs in by_owner.items():
+            with self._shard(owner) as shard:
+                claims.update(self._claim_urls(shard, owner_pairs))
+
+        for owner_pairs in by_owner.values():
+            for pair in owner_pairs:
+                code = key_to_code(claims[str(pair.original_url)])
+                if code != pair.shortened_url_code:
+                    pair = pair.model_copy(update={"shortened_url_code": code})
+                by_shard[self._shard_for(code)].append(pair)
+
+        for index, shard_pairs in by_shard.items():
+            with self._shard(index) as shard:
+                found.update(shard.insert_new_url_pairs(shard_pairs))
+
+        # Пары, код которых оказался занят другим URL, не вставлены: их закрепление снимается
+        for owner, owner_pairs in by_owner.items():
+            urls = [str(pair.original_url) for pair in owner_pairs]
+            collided = {url: claims[url] for url in urls if url not in found}
+            if collided:
+                with self._shard(owner) as shard:
+                    self._release_urls(shard, collided)
+        return found
+
+    def rebuild_bloom_filter(self):
+        if self.bloom_filter is None:
+            return
+
+        total = 0
+        for index in range(len(self.shards)):
+            with self._shard(index) as shard:
+                assert shard.connection is not None
+                total += shard.connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        self.bloom_filter.rebuild(self._iter_short_codes(), total=total)
+        logger.debug(f"Rebuilt bloom filter with {total} codes from {len(self.shards)} shards: {self.bloom_filter.stats()}")
+
+    def get_original_url_and_expiry(self, short_url: str) -> Tuple[str, Optional[float]]:
+        if not self.might_contain(short_url):
+            raise URLNotFoundError()
+        with self._shard(self._shard_for(short_url)) as shard:
+            return shard.get_original_url_and_expiry(short_url)
+
+    def delete_url_pair(self, shorten_url: str):
+        key = code_to_key(shorten_url)
+        row = None
+        with self._shard(self._shard_for(shorten_url)) as shard:
+            if self.url_index:
+                assert shard.connection is not None
+                row = shard.connection.execute("SELECT original_url FROM urls WHERE id = ?", (key,)).fetchone()
+            shard.delete_url_pair(shorten_url)
+        if row is not None and key is not None:
+            with self._shard(self._owner_for(row[0])) as owner:
+                self._release_urls(owner, {row[0]: key})
+
+    def get_all_pairs(self) -> List[URLPairModel]:
+        return [URLPairModel(original_url=url, shortened_url_code=code) for _, url, code in self.iter_pairs()]
+
+    def get_pairs_page(self, after_id: int = 0, limit: int = 100) -> List[URLPairRow]:
+        # Ключи кодов не пересекаются между шардами: первые `limit` ключей после `after_id` среди
+        # первых `limit` ключей каждого шарда - та же страница, что и в одной базе
+        pages = []
+        for index in range(len(self.shards)):
+            with self._shard(index) as shard:
+                pages.append(shard.get_pairs_page(after_id, limit))
+        return list(heapq.merge(*pages))[:limit]
+
+    def get_redirects_page(
+        self, after_id: int = 0, limit: int = 1000, include_expired: bool = False
+    ) -> List[Tuple[int, str, Optional[float]]]:
+        pages = []
+        for index in range(len(self.shards)):
+            with self._shard(index) as shard:
+                pages.append(shard.get_redirects_page(after_id, limit, include_expired))
+        return list(heapq.merge(*pages))[:limit]
+
+    def add_clicks(self, clicks: List[Tuple[str, int, float]]):
+        by_shard: Dict[int, List[Tuple[str, int, float]]] = defaultdict(list)
+        for click in clicks:
+            by_shard[self._shard_for(click[0])].append(click)
+        for index, shard_clicks in by_shard.items():
+            with self._shard(index) as shard:
+                shard.add_clicks(shard_clicks)
+
+    def get_click_stats(self, short_url: str) -> Tuple[int, Optional[float]]:
+        with self._shard(self._shard_for(short_url)) as shard:
+            return shard.get_click_stats(short_url)
+
+    def delete_expired_pairs(self, limit: int = 500) -> List[str]:
+        deleted: List[str] = []
+        released: Dict[int, Dict[str, int]] = defaultdict(dict)
+        for index in range(len(self.shards)):
+            if len(deleted) >= limit:
+                break
+            with self._shard(index) as shard:
+                rows = shard._delete_expired_rows(limit - len(deleted))
+            deleted.extend(key_to_code(key) for key, _ in rows)
+            if self.url_index:
+                for key, original_url in rows:
+                    released[self._owner_for(original_url)][original_url] = key
+
+        # Записи индекса удаленных пар снимаются в шардах-владельцах
+        for owner, claims in released.items():
+            with self._shard(owner) as shard:
+                self._release_urls(shard, claims)
+        return deleted
+
+    def prune_changes(self, older_than: float) -> int:
+        pruned = 0
+        for index in range(len(self.shards)):
+            with self._shard(index) as shard:
+                pruned += shard.prune_changes(older_than)
+        return pruned
+
+    def allocate_code_block(self, size: int) -> int:
+        with self._shard(0) as shard:
+            return shard.allocate_code_block(size)
+
+
+def reshard(
+    conn_str: str,
+    from_shards: int,
+    to_shards: int,
+    batch_size: int = 5000,
+    pragmas: Optional[Dict[str, PragmaValue]] = None,
+    url_index: bool = False,
+) -> int:
+    """
+    Переносит пары в шарды, которые им положены при `to_shards` шардах. Выполняется при остановленном API.
+
+    Каждая пачка сначала вставляется в целевой шард (повторная вставка игнорируется), и только потом удаляется
+    из исходного, поэтому прерванный перенос можно просто запустить заново. После переноса индекс URL очищается
+    и, если он нужен генератору, строится заново. Лишние файлы при уменьшении количества шардов остаются пустыми, последовательность номеров
+    для генератора-счетчика остается в шарде 0
+
+    Args:
+        conn_str (str): Имя файла базы (шард 0)
+        from_shards (int): Текущее количество шардов
+        to_shards (int): Новое количество шардов
+        batch_size (int): Сколько строк переносить одной транзакцией
+        pragmas (Optional[Dict[str, PragmaValue]]): Профиль PRAGMA для подключений
+        url_index (bool): Построить индекс URL (см. `ShardedRepository`)
+
+    Returns:
+        int: Количество перенесенных пар
+    """
+    names = shard_names(conn_str, max(from_shards, to_shards))
+    connections = [connect(name, pragmas) for name in names]
+    try:
+        for connection in connections:
+            apply_migrations(connection)
+
+        moved = 0
+        for source_index in range(from_shards):
+            source = connections[source_index]
+            after_id = 0
+            while True:
+                rows = source.execute(
+                    f"SELECT {_RESHARD_COLUMNS} FROM urls WHERE id > ? ORDER BY id LIMIT ?", (after_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+
+                by_target: Dict[int, List[Tuple]] = defaultdict(list)
+                for row in rows:
+                    if row[0] % to_shards != source_index:
+                        by_target[row[0] % to_shards].append(row)
+                for target_index, target_rows in by_target.items():
+                    with connections[target_index] as target:
+                        target.executemany(
+                            f"INSERT OR IGNORE INTO urls ({_RESHARD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", target_rows
+                        )
+                    with source:
+                        source.executemany("DELETE FROM urls WHERE id = ?", ((row[0],) for row in target_rows))
+                    moved += len(target_rows)
+
+            logger.info(f"Shard {source_index} ({names[source_index]}) rebalanced, {moved} pairs moved so far")
+
+        # Владельцы записей индекса URL зависят от количества шардов, поэтому индекс строится заново
+        for connection in connections:
+            with connection:
+                connection.execute("DELETE FROM url_index")
+        if url_index and to_shards > 1:
+            _index_urls(connections[:to_shards], batch_size)
+        return moved
+    finally:
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Self, Tuple
+
+from loguru import logger
+
+from app.data.db.keys import code_to_key
+from app.data.db.models import URLPairModel, URLPairRow
+from app.data.db.snapshot import Snapshot, write_snapshot
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import ReadOnlyRepositoryError, URLExpiredError, URLNotFoundError
+
+
+class SnapshotRepository(Repository):
+    """
+    Репозиторий только для чтения поверх файла снимка редиректов (`app/data/db/snapshot.py`), без SQLite.
+
+    Раз в `check_interval` секунд репозиторий сверяет файл снимка на диске с открытым и, если экспортер подменил его
+    новым, открывает новый и атомарно переключается на него. Поиски, которые уже идут, дочитывают старый снимок.
+    Любые изменения данных вызывают `ReadOnlyRepositoryError`
+
+    Attributes:
+        snapshot_path (str): Путь к файлу снимка
+        check_interval (float): Как часто проверять, не появился ли новый снимок, в секундах
+    """
+
+    blocking = False
+
+    def __init__(self, snapshot_path: str, check_interval: float = 1.0):
+        """
+        Конструктор репозитория. Снимок открывается сразу
+
+        Args:
+            snapshot_path (str): Путь к файлу снимка
+            check_interval (float): Как часто проверять, не появился ли новый снимок, в секундах
+        """
+        super().__init__(snapshot_path)
+        self.snapshot_path = snapshot_path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._snapshot, self._signature = self._open()
+        self._checked_at = time.monotonic()
+
+    def _open(self) -> Tuple[Snapshot, Tuple[int, int, int]]:
+        """
+        Открывает текущий файл снимка и запоминает его "подпись", по которой заметна подмена файла
+        ! Только для внутреннего использования
+        """
+        with open(self.snapshot_path, "rb") as file:
+            stat = os.fstat(file.fileno())
+        snapshot = Snapshot(self.snapshot_path)
+        logger.info(f"Loaded redirect snapshot {self.snapshot_path} with {len(snapshot)} links")
+        return snapshot, (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Переключается на новый снимок, если файл на диске подменили
+
+        Returns:
+            bool: `True`, если снимок был перезагружен
+        """
+        with self._reload_lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.snapshot_path)
+            except FileNotFoundError:
+                logger.warning(f"Redirect snapshot {self.snapshot_path} disappeared, serving the loaded one")
+                return False
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._signature:
+                return False
+            try:
+                self._snapshot, self._signature = self._open()
+            except (OSError, ValueError) as exc:
+                logger.error(f"Failed to load redirect snapshot {self.snapshot_path}: {exc}")
+                return False
+            return True
+
+    @property
+    def snapshot(self) -> Snapshot:
+        """
+        Актуальный снимок. Проверка файла на диске - не чаще раза в `check_interval` секунд
+        """
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload_if_changed()
+        return self._snapshot
+
+    def copy(self) -> Self:
+        return self
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        pass
+
+    def initialize_database(self):
+        pass
+
+    def rebuild_bloom_filter(self):
+        pass
+
+    def might_contain(self, short_url: str) -> bool:
+        return True
+
+    def get_original_url_and_expiry(self, short_url: str) -> Tuple[str, Optional[float]]:
+        key = code_to_key(short_url)
+        found = None if key is None else self.snapshot.find(key)
+        if found is None:
+            raise URLNotFoundError()
+        if found[1] is not None and found[1] <= time.time():
+            raise URLExpiredError()
+        return found
+
+    def get_all_pairs(self) -> List[URLPairModel]:
+        return [URLPairModel(original_url=url, shortened_url_code=code) for _, url, code in self.iter_pairs()]
+
+    def get_pairs_page(self, after_id: int = 0, limit: int = 100) -> List[URLPairRow]:
+        return self.snapshot.page(after_id, limit)
+
+    def insert_new_url_pair(self, pair: URLPairModel) -> Optional[str]:
+        raise ReadOnlyRepositoryError()
+
+    def insert_new_url_pairs(self, pairs: List[URLPairModel]) -> Dict[str, str]:
+        raise ReadOnlyRepositoryError()
+
+    def delete_url_pair(self, shorten_url: str):
+        raise ReadOnlyRepositoryError()
+
+    def add_clicks(self, clicks: List[Tuple[str, int, float]]):
+        raise ReadOnlyRepositoryError()
+
+    def get_click_stats(self, short_url: str) -> Tuple[int, Optional[float]]:
+        raise ReadOnlyRepositoryError()
+
+    def delete_expired_pairs(self, limit: int = 500) -> List[str]:
+        raise ReadOnlyRepositoryError()
+
+    def allocate_code_block(self, size: int) -> int:
+        raise ReadOnlyRepositoryError()
+
+
+def export_snapshot(repository: Repository, path: str, batch_size: int = 5000) -> int:
+    """
+    Выгружает действующие ссылки из базы в снимок редиректов `path`. Файл подменяется атомарно, поэтому реплики,
+    которые раздают снимок, подхватывают его без остановки. Истекшие ссылки в снимок не попадают
+
+    Args:
+        repository (Repository): Неподключенный репозиторий базы (или шардов)
+        path (str): Куда записать снимок
+        batch_size (int): Сколько строк читать из базы за один запрос
+
+    Returns:
+        int: Количество ссылок в снимке
+    """
+    with repository:
+        return write_snapshot(repository.iter_redirects(batch_size=batch_size), path)
@@ -10,8 +10,39 @@ class URLNotFoundError(Exception):
     """
     ...
 
+class URLExpiredError(Exception):
+    """
+    Возникает, когда срок жизни сокращенной ссылки истек
+    """
+    ...
+
+class ShortCodeCollisionError(Exception):
+    """
+    Возникает, когда сокращенный код уже занят другим URL
+    """
+    ...
+
+class CodeSpaceExhaustedError(Exception):
+    """
+    Возникает, когда генератор выдал все сокращенные коды допустимой длины
+    """
+    ...
+
 class ConnectionNotEstablishedError(Exception):
     """
     Возникает, если кто-то пытается использовать методы репозитория без контекстного менеджера
     """
-    ...
\ No newline at end of file
+    ...
+
+class ConnectionPoolExhaustedError(Exception):
+    """
+    Возникает, если за отведенное время в пуле не освободилось ни одного подключения к базе
+    """
+    ...
+
+
+class ReadOnlyRepositoryError(Exception):
+    """
+    Возникает при попытке изменить данные на реплике, которая отдает редиректы из снимка только для чтения
+    """
+    ...
@@ -0,0 +1,167 @@
+"""
+Метрики приложения: гистограммы задержек HTTP-запросов и отдельных этапов их обработки (запросы к базе, хэширование)
+и вывод в текстовом формате Prometheus
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Время этапов текущего HTTP-запроса: этап -> суммарная длительность в секундах.
+# Словарь создает middleware, поэтому этапы, выполненные в пуле потоков с копией контекста, тоже в него попадают
+request_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_phases", default=None)
+
+
+class Histogram:
+    """
+    Потокобезопасная гистограмма с фиксированными границами корзин, как `histogram` в Prometheus
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Учитывает одно наблюдение
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """
+        Возвращает накопленные значения: количество наблюдений по корзинам (нарастающим итогом), сумму и общее количество
+        """
+        with self._lock:
+            counts, total_sum = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total_sum, running
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса: задержки HTTP-запросов по маршрутам и задержки этапов обработки
+    """
+
+    def __init__(self):
+        self._requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self._phases: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_or_create(storage: Dict, key) -> Histogram:
+        histogram = storage.get(key)
+        if histogram is None:
+            histogram = storage.setdefault(key, Histogram())
+        return histogram
+
+    def observe_request(self, method: str, route: str, status: int, duration: float):
+        """
+        Учитывает обработанный HTTP-запрос
+        """
+        with self._lock:
+            histogram = self._get_or_create(self._requests, (method, route, str(status)))
+        histogram.observe(duration)
+
+    def observe_phase(self, phase: str, duration: float):
+        """
+        Учитывает выполненный этап обработки запроса
+        """
+        with self._lock:
+            histogram = self._get_or_create(self._phases, phase)
+        histogram.observe(duration)
+
+    def render(self, gauges: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """
+        Выводит все метрики в текстовом формате Prometheus
+
+        Args:
+            gauges (Dict[str, Dict[str, int]]): Дополнительные метрики-значения: группа -> название -> значение.
+                Например, статистика кэша или пула подключений
+        """
+        lines: List[str] = []
+        with self._lock:
+            requests = sorted(self._requests.items())
+            phases = sorted(self._phases.items())
+
+        lines.append("# HELP http_request_duration_seconds HTTP request latency by route")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route, status), histogram in requests:
+            labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+            lines.extend(_render_histogram("http_request_duration_seconds", labels, histogram))
+
+        lines.append("# HELP phase_duration_seconds Latency of request processing phases")
+        lines.append("# TYPE phase_duration_seconds histogram")
+        for phase, histogram in phases:
+            lines.extend(_render_histogram("phase_duration_seconds", f'phase="{_escape(phase)}"', histogram))
+
+        for group, values in (gauges or {}).items():
+            for name, value in values.items():
+                metric = f"{group}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histogram(name: str, labels: str, histogram: Histogram) -> Iterator[str]:
+    cumulative, total_sum, count = histogram.snapshot()
+    for bound, bucket_count in zip(histogram.buckets, cumulative):
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {bucket_count}'
+    yield f'{name}_bucket{{{labels},le="+Inf"}} {count}'
+    yield f"{name}_sum{{{labels}}} {total_sum}"
+    yield f"{name}_count{{{labels}}} {count}"
+
+
+metrics_registry = MetricsRegistry()
+
+
+@contextmanager
+def timed_phase(phase: str) -> Iterator[None]:
+    """
+    Замеряет длительность этапа обработки: учитывает ее в общей гистограмме и во времени этапов текущего запроса
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        metrics_registry.observe_phase(phase, duration)
+        phases = request_phases.get()
+        if phases is not None:
+            phases[phase] = phases.get(phase, 0.0) + duration
+
+
+def timed(phase: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Декоратор, замеряющий каждый вызов функции как этап `phase`
+    """
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            with timed_phase(phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,229 @@
+"""
+Потоковая выгрузка ссылок из базы в NDJSON/CSV и загрузка больших файлов пачками с возобновлением после сбоя
+"""
+
+import csv
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, TextIO, Tuple
+
+from loguru import logger
+from pydantic import ValidationError
+
+from app.api.schemas.url_schema import URLShortenerRequestModel
+from app.data.db.keys import code_to_key, key_to_code
+from app.data.db.models import URLPairModel
+from app.data.repository.repository import Repository
+from app.services.url_service import URLService
+
+type BulkFormat = Literal["ndjson", "csv"]
+
+EXPORT_FIELDS = ("short_code", "original_url", "expires_at")
+
+
+@dataclass
+class ImportProgress:
+    """
+    Состояние загрузки файла, которое сохраняется в файл контрольной точки после каждой пачки
+
+    Attributes:
+        input_path (str): Загружаемый файл
+        input_size (int): Размер файла. Контрольная точка от файла другого размера не используется
+        offset (int): Смещение в файле, до которого все строки уже сохранены в базе
+        imported (int): Сколько строк сохранено
+        failed (int): Сколько строк пропущено из-за ошибок
+    """
+
+    input_path: str
+    input_size: int
+    offset: int = 0
+    imported: int = 0
+    failed: int = 0
+
+
+def _format_expiry(expires_at: Optional[float]) -> Optional[str]:
+    return None if expires_at is None else datetime.fromtimestamp(expires_at, tz=timezone.utc).isoformat()
+
+
+def export_pairs(
+    repository: Repository,
+    output: TextIO,
+    output_format: BulkFormat = "ndjson",
+    after_id: int = 0,
+    batch_size: int = 5000,
+    include_expired: bool = False,
+    progress_every: int = 100_000,
+) -> int:
+    """
+    Выгружает ссылки в NDJSON или CSV (поля `EXPORT_FIELDS`), читая базу страницами: память не зависит от размера базы
+
+    Args:
+        repository (Repository): Подключенный репозиторий
+        output (TextIO): Куда писать
+        output_format (BulkFormat): Формат выгрузки
+        after_id (int): Ключ, после которого начинать выгрузку (его пишет отчет о прогрессе)
+        batch_size (int): Сколько строк читать из базы за один запрос
+        include_expired (bool): Выгружать ли истекшие, но еще не удаленные ссылки
+        progress_every (int): Как часто сообщать о прогрессе, в строках
+
+    Returns:
+        int: Количество выгруженных ссылок
+    """
+    writer = csv.writer(output) if output_format == "csv" else None
+    if writer is not None and not after_id:
+        writer.writerow(EXPORT_FIELDS)
+
+    exported = 0
+    for key, original_url, expires_at in repository.iter_redirects(after_id, batch_size, include_expired):
+        row = (key_to_code(key), original_url, _format_expiry(expires_at))
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            output.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n")
+        exported += 1
+        if exported % progress_every == 0:
+            logger.info(f"Exported {exported} links, resume with --after {key}")
+    return exported
+
+
+def _load_checkpoint(checkpoint_path: Optional[str], input_path: str, input_size: int) -> ImportProgress:
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as file:
+            progress = ImportProgress(**json.load(file))
+        if progress.input_path == input_path and progress.input_size == input_size:
+            logger.info(f"Resuming import of {input_path} from byte {progress.offset}, {progress.imported} rows already imported")
+            return progress
+        logger.warning(f"Checkpoint {checkpoint_path} belongs to another file, starting from the beginning")
+    return ImportProgress(input_path, input_size)
+
+
+def _save_checkpoint(checkpoint_path: str, progress: ImportProgress):
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(asdict(progress), file)
+    os.replace(temp_path, checkpoint_path)
+
+
+def _parse_row(line: bytes, input_format: BulkFormat, header: List[str]) -> Dict[str, Any]:
+    text = line.decode("utf-8")
+    if input_format == "csv":
+        return dict(zip(header, next(csv.reader([text]))))
+    row = json.loads(text)
+    return row if isinstance(row, dict) else {"original_url": row}
+
+
+def _validate_row(row: Dict[str, Any], keep_codes: bool) -> Tuple[str, Optional[datetime], Optional[str]]:
+    """
+    Проверяет строку файла по тем же правилам, что и запрос к API (`URLShortenerRequestModel`: время без часового пояса
+    считается UTC, срок жизни должен быть в будущем), и возвращает исходный URL, срок жизни и сокращенный код
+    (только с `keep_codes` и если он есть)
+    ! Только для внутреннего использования
+
+    Raises:
+        ValueError: Если URL, срок жизни или сокращенный код некорректны
+    """
+    request = URLShortenerRequestModel(url=row.get("original_url") or row.get("url"), expires_at=row.get("expires_at") or None)  # ty:ignore[invalid-argument-type]
+    short_code = row.get("short_code") or None if keep_codes else None
+    if short_code is not None and (not isinstance(short_code, str) or code_to_key(short_code) is None):
+        raise ValueError(f"Некорректный сокращенный код: {short_code}")
+    return str(request.url), request.expires_at, short_code
+
+
+def _store_chunk(service: URLService, rows: List[Tuple[str, Optional[datetime], Optional[str]]], keep_codes: bool) -> int:
+    """
+    Сохраняет пачку строк и возвращает количество сохраненных
+    ! Только для внутреннего использования
+    """
+    with_codes = [row for row in rows if keep_codes and row[2]]
+    generated = [row for row in rows if not (keep_codes and row[2])]
+
+    stored = 0
+    if with_codes:
+        pairs = [
+            URLPairModel(original_url=url, shortened_url_code=code, expires_at=expires_at)  # ty:ignore[invalid-argument-type]
+            for url, expires_at, code in with_codes
+        ]
+        codes = service.repository.insert_new_url_pairs(pairs)
+        stored += sum(1 for url, _, _ in with_codes if url in codes)
+    if generated:
+        codes = service.create_url_pairs([url for url, _, _ in generated], [expires_at for _, expires_at, _ in generated])
+        stored += sum(1 for code in codes if code is not None)
+    return stored
+
+
+def import_pairs(
+    service: URLService,
+    input_path: str,
+    input_format: BulkFormat = "ndjson",
+    chunk_size: int = 1000,
+    checkpoint_path: Optional[str] = None,
+    keep_codes: bool = False,
+) -> ImportProgress:
+    """
+    Загружает ссылки из NDJSON или CSV пачками по `chunk_size` строк, каждая пачка - одной транзакцией.
+
+    Коды генерируются тем же генератором, что и при сокращении через API (`URLService.create_url_pairs`),
+    с `keep_codes` сохраняются коды из файла (восстановление резервной копии). Строки NDJSON - объекты с полями
+    `EXPORT_FIELDS` (достаточно `original_url` или `url`) или просто строки с URL, CSV - с заголовком из тех же полей.
+    После каждой пачки позиция в файле записывается в `checkpoint_path`, и прерванную загрузку можно запустить
+    заново: она продолжится с последней сохраненной пачки. Повторная загрузка уже сохраненных URL ничего не меняет
+
+    Args:
+        service (URLService): Сервис с подключенным репозиторием
+        input_path (str): Загружаемый файл
+        input_format (BulkFormat): Формат файла
+        chunk_size (int): Сколько строк сохранять одной транзакцией
+        checkpoint_path (Optional[str]): Файл контрольной точки. `None` - без возобновления
+        keep_codes (bool): Сохранять ли коды из файла вместо генерации новых
+
+    Returns:
+        ImportProgress: Итог загрузки
+    """
+    input_size = Path(input_path).stat().st_size
+    progress = _load_checkpoint(checkpoint_path, input_path, input_size)
+    started_at, started_offset = time.monotonic(), progress.offset
+
+    with open(input_path, "rb") as file:
+        header: List[str] = []
+        if input_format == "csv":
+            header_line = file.readline()
+            header = next(csv.reader([header_line.decode("utf-8-sig")]))
+            progress.offset = max(progress.offset, len(header_line))
+        file.seek(progress.offset)
+
+        chunk: List[Tuple[str, Optional[datetime], Optional[str]]] = []
+        invalid, offset, at_end = 0, progress.offset, False
+        while not at_end:
+            line = file.readline()
+            at_end = not line
+            offset += len(line)
+            if line.strip():
+                try:
+                    chunk.append(_validate_row(_parse_row(line, input_format, header), keep_codes))
+                except (ValueError, ValidationError, KeyError) as exc:
+                    invalid += 1
+                    logger.warning(f"Skipping invalid row at byte {offset - len(line)}: {exc}")
+            if len(chunk) < chunk_size and not at_end:
+                continue
+
+            stored = _store_chunk(service, chunk, keep_codes) if chunk else 0
+            progress.imported += stored
+            progress.failed += len(chunk) - stored + invalid
+            progress.offset = offset
+            chunk, invalid = [], 0
+            if checkpoint_path:
+                _save_checkpoint(checkpoint_path, progress)
+            rate = (offset - started_offset) / max(time.monotonic() - started_at, 1e-9)
+            logger.info(
+                f"Imported {progress.imported} links, {progress.failed} failed "
+                f"({offset / max(input_size, 1):.0%} of file, {rate / 1024:.0f} KiB/s)"
+            )
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.unlink(checkpoint_path)
+    logger.info(f"Import of {input_path} finished: {progress.imported} links imported, {progress.failed} failed")
+    return progress
@@ -0,0 +1,104 @@
+"""
+Ограниченный in-memory кэш с вытеснением по LRU и временем жизни записей
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Потокобезопасный LRU-кэш с TTL и счетчиками попаданий, промахов и вытеснений
+
+    Attributes:
+        max_size (int): Максимальное количество записей
+        ttl (float): Время жизни записи в секундах
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        Конструктор кэша
+
+        Args:
+            max_size (int): Максимальное количество записей
+            ttl (float): Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[K, Tuple[V, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Возвращает значение из кэша или `None`, если записи нет или она устарела
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None):
+        """
+        Кладет значение в кэш, вытесняя самые давно использованные записи при переполнении
+
+        Args:
+            key: Ключ
+            value: Значение
+            ttl (float): Время жизни этой записи. По умолчанию используется `self.ttl`
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: K):
+        """
+        Удаляет запись из кэша, если она там есть
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Очищает кэш
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику кэша: размер, попадания, промахи и вытеснения
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
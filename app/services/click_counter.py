@@ -0,0 +1,87 @@
+"""
+Счетчик переходов по сокращенным ссылкам с отложенной записью в базу
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.data.repository.repository import Repository
+
+
+class ClickCounter:
+    """
+    Накапливает переходы по кодам в памяти, чтобы редиректы не писали в базу.
+    Накопленные переходы сбрасываются в базу одной транзакцией методом `flush`
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, short_url: str, timestamp: Optional[float] = None):
+        """
+        Учитывает переход по коду
+
+        Args:
+            short_url (str): Сокращенный код
+            timestamp (float): Время перехода (unix time). По умолчанию - текущее
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            clicks, last_access_at = self._pending.get(short_url, (0, 0.0))
+            self._pending[short_url] = (clicks + 1, max(last_access_at, timestamp))
+
+    def pending(self, short_url: str) -> Tuple[int, Optional[float]]:
+        """
+        Возвращает еще не записанные в базу переходы по коду: количество и время последнего перехода
+        """
+        with self._lock:
+            clicks, last_access_at = self._pending.get(short_url, (0, None))
+            return clicks, last_access_at
+
+    def _drain(self) -> Dict[str, Tuple[int, float]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def _restore(self, pending: Dict[str, Tuple[int, float]]):
+        with self._lock:
+            for short_url, (clicks, last_access_at) in pending.items():
+                current_clicks, current_last_access_at = self._pending.get(short_url, (0, 0.0))
+                self._pending[short_url] = (current_clicks + clicks, max(current_last_access_at, last_access_at))
+
+    def flush(self, repository: Repository) -> int:
+        """
+        Записывает накопленные переходы в базу одной транзакцией. При ошибке переходы возвращаются в очередь
+
+        Args:
+            repository (Repository): Репозиторий с открытым подключением
+
+        Returns:
+            int: Количество кодов, по которым были записаны переходы
+        """
+        pending = self._drain()
+        if not pending:
+            return 0
+
+        clicks: List[Tuple[str, int, float]] = [
+            (short_url, count, last_access_at) for short_url, (count, last_access_at) in pending.items()
+        ]
+        try:
+            repository.add_clicks(clicks)
+        except Exception:
+            self._restore(pending)
+            raise
+
+        logger.debug(f"Flushed clicks for {len(clicks)} codes")
+        return len(clicks)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику счетчика: количество кодов с еще не записанными в базу переходами
+        """
+        with self._lock:
+            return {"pending_codes": len(self._pending)}
@@ -0,0 +1,90 @@
+"""
+Генераторы сокращенных кодов
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from hashlib import sha384
+
+from base62 import encode, encodebytes
+
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import CodeSpaceExhaustedError
+
+SHORT_CODE_MAX_LENGTH = 10  # Максимальная длина кода: столько символов допускает `URLPairModel`
+# Первые сегменты путей API: такие коды нельзя выдавать, по ним не получится перейти
+RESERVED_CODES = frozenset({"all", "delete-pair", "docs", "metrics", "openapi.json", "redoc", "shorten", "stats"})
+
+
+class CodeGenerator(ABC):
+    """
+    Стратегия выдачи сокращенных кодов
+
+    Attributes:
+        length (int): Максимальная длина кода
+    """
+
+    def __init__(self, length: int = SHORT_CODE_MAX_LENGTH):
+        self.length = length
+
+    @abstractmethod
+    def generate(self, original_url: str, repository: Repository, attempt: int = 0) -> str:
+        """
+        Выдает код для исходного URL
+
+        Args:
+            original_url (str): Исходный URL
+            repository (Repository): Репозиторий с открытым подключением, если генератору нужна база
+            attempt (int): Номер попытки. Больше нуля, если предыдущий код оказался занят другим URL
+
+        Returns:
+            str: Сокращенный код не длиннее `length`
+
+        Raises:
+            CodeSpaceExhaustedError: Если коды длины `length` закончились
+        """
+        ...
+
+
+class HashCodeGenerator(CodeGenerator):
+    """
+    Код - хэш исходного URL в base62, поэтому один и тот же URL всегда получает один и тот же код.
+    При коллизии с чужим кодом URL детерминированно "солится" номером попытки
+    """
+
+    def generate(self, original_url: str, repository: Repository, attempt: int = 0) -> str:
+        salted_url = original_url if attempt == 0 else f"{original_url}\x00{attempt}"
+        digest = sha384(salted_url.encode("utf-8")).digest()[:10]
+        result: str = encodebytes(digest)
+        return result[: self.length]
+
+
+class CounterCodeGenerator(CodeGenerator):
+    """
+    Код - номер из общей для всех процессов последовательности в base62: без хэширования и без коллизий между собой.
+    Номера берутся из базы блоками по `block_size`, поэтому обращение к базе нужно только раз на блок,
+    а каждый процесс выдает номера из своего блока
+
+    Attributes:
+        block_size (int): Сколько номеров резервировать в базе за раз
+    """
+
+    def __init__(self, length: int = SHORT_CODE_MAX_LENGTH, block_size: int = 1000):
+        super().__init__(length)
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._block_end = 0
+
+    def generate(self, original_url: str, repository: Repository, attempt: int = 0) -> str:
+        with self._lock:
+            if self._next_id >= self._block_end:
+                self._next_id = repository.allocate_code_block(self.block_size)
+                self._block_end = self._next_id + self.block_size
+            code_id = self._next_id
+            self._next_id += 1
+
+        code: str = encode(code_id)
+        if len(code) > self.length:
+            raise CodeSpaceExhaustedError(f"Коды длины {self.length} закончились, увеличьте code_length")
+        return code
@@ -0,0 +1,112 @@
+"""
+Согласование кэшей процессов API, работающих с одной базой
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.data.repository.bloom_filter import BloomFilter
+from app.data.repository.repository import Repository
+from app.services.cache import LRUCache
+
+
+class CacheCoherenceWatcher:
+    """
+    Следит за изменениями базы, сделанными другими процессами (другими воркерами API, импортом из CLI),
+    и применяет их к кэшу редиректов и фильтру Блума этого процесса.
+
+    Проверка дешевая: `PRAGMA data_version` на отдельном подключении меняется только после чужих коммитов.
+    Если база менялась, из журнала `url_changes` читаются новые изменения: удаленные коды убираются из кэша,
+    созданные - добавляются в фильтр Блума. У каждого шарда базы свой журнал, поэтому наблюдатель следит
+    за всеми файлами шардов.
+
+    Проверки выполняет фоновая задача приложения в пуле потоков для базы, а не обработчики запросов:
+    чужие изменения видны процессу с задержкой не больше интервала проверки
+    """
+
+    def __init__(
+        self,
+        repositories: List[Repository],
+        cache: Optional[LRUCache[str, Tuple[str, Optional[float]]]] = None,
+        bloom_filter: Optional[BloomFilter] = None,
+    ):
+        """
+        Конструктор наблюдателя
+
+        Args:
+            repositories (List[Repository]): Репозитории файлов базы (шардов) с собственными подключениями (не из пула):
+                `data_version` считается для подключения
+            cache (LRUCache): Кэш редиректов этого процесса
+            bloom_filter (BloomFilter): Фильтр Блума этого процесса
+        """
+        self.repositories = repositories
+        self.cache = cache
+        self.bloom_filter = bloom_filter
+        self._lock = threading.Lock()
+        self._data_versions: List[Optional[int]] = [None] * len(repositories)
+        self._last_change_ids = [0] * len(repositories)
+
+    def start(self):
+        """
+        Открывает подключения и запоминает текущее состояние журналов изменений
+        """
+        with self._lock:
+            for index, repository in enumerate(self.repositories):
+                repository.__enter__()
+                self._data_versions[index] = repository.get_data_version()
+                self._last_change_ids[index] = repository.get_last_change_id()
+
+    def close(self):
+        """
+        Закрывает подключения наблюдателя
+        """
+        with self._lock:
+            for repository in self.repositories:
+                repository.__exit__(None, None, None)
+
+    def sync(self):
+        """
+        Применяет к кэшу и фильтру Блума изменения базы, сделанные после прошлой проверки
+        """
+        with self._lock:
+            for index, repository in enumerate(self.repositories):
+                if repository.connection is not None:
+                    self._sync_repository(index, repository)
+
+    def _sync_repository(self, index: int, repository: Repository):
+        """
+        Применяет изменения одного файла базы. Вызывается под блокировкой наблюдателя
+        ! Только для внутреннего использования
+        """
+        data_version = repository.get_data_version()
+        if data_version == self._data_versions[index]:
+            return
+        self._data_versions[index] = data_version
+
+        changes, missed = repository.get_changes_since(self._last_change_ids[index])
+        if missed:
+            logger.warning(f"Change log of {repository.conn_str} was pruned past this worker's position, resetting local caches")
+            if self.cache is not None:
+                self.cache.clear()
+            if self.bloom_filter is not None:
+                self.bloom_filter.invalidate()
+
+        for change_id, short_url, change in changes:
+            if change == "delete":
+                if self.cache is not None:
+                    self.cache.invalidate(short_url)
+            elif self.bloom_filter is not None and short_url not in self.bloom_filter:
+                self.bloom_filter.add(short_url)
+            self._last_change_ids[index] = change_id
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику наблюдателя: id последнего примененного изменения в каждом шарде
+        (`last_change_id` - в шарде 0, то есть в единственном файле несегментированной базы)
+        """
+        return {
+            "last_change_id" if index == 0 else f"shard{index}_last_change_id": change_id
+            for index, change_id in enumerate(self._last_change_ids)
+        }
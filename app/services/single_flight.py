@@ -0,0 +1,55 @@
+"""
+Объединение одновременных одинаковых асинхронных вызовов (single flight)
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[K, T]):
+    """
+    Пока вызов с ключом выполняется, остальные вызовы с тем же ключом не запускаются заново,
+    а дожидаются его результата (или его ошибки).
+
+    Вызов выполняется отдельной задачей, поэтому отмена одного из ожидающих (например, клиент разорвал соединение)
+    не отменяет его для остальных. Работает в пределах одного event loop'а
+    """
+
+    def __init__(self):
+        self._calls: Dict[K, asyncio.Task[T]] = {}
+        self._shared = 0
+
+    async def do(self, key: K, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет `func` или присоединяется к уже выполняющемуся вызову с тем же ключом
+
+        Args:
+            key (K): Ключ вызова
+            func (Callable[[], Awaitable[T]]): Фабрика корутины, которая выполняется, если вызова с ключом еще нет
+
+        Returns:
+            T: Результат вызова
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: K, task: "asyncio.Task[T]"):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Ошибку получают ожидающие; здесь она помечается полученной, если все они уже отменены
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику: количество выполняющихся вызовов и вызовов, которые присоединились к чужому
+        """
+        return {"in_flight": len(self._calls), "shared": self._shared}
@@ -1,33 +1,109 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from functools import partial
+from typing import Any, Iterator, List, Optional, Tuple
 
-from dataclasses import dataclass
-from hashlib import sha384
-from typing import List, Optional
-
-from base62 import encodebytes
 from loguru import logger
 
-from app.data.db.models import URLPairModel
+from app.data.db.models import URLPairModel, URLPairRow
 from app.data.repository.repository import Repository
+from app.exc.db_exceptions import ShortCodeCollisionError, URLNotFoundError
+from app.metrics import timed
+from app.services.cache import LRUCache
+from app.services.click_counter import ClickCounter
+from app.services.code_generator import RESERVED_CODES, CodeGenerator, HashCodeGenerator
+from app.services.coherence import CacheCoherenceWatcher
+from app.services.single_flight import SingleFlight
+from app.services.write_queue import GroupCommitWriter
+
+ITER_PAGE_SIZE = 1000  # Сколько пар URL читать за один запрос при потоковой выдаче
+CODE_GENERATION_ATTEMPTS = 5  # Сколько раз подбирать новый код, если предыдущий занят другим URL
 
 
 @dataclass
 class URLService:
+    """
+    Бизнес-логика для работы с парами URL
+
+    Attributes:
+        repository (Repository): Репозиторий для работы с базой
+        executor (Executor): Пул потоков, в котором выполняются асинхронные методы сервиса.
+            Если не задан, используется пул потоков event loop'а по умолчанию
+        cache (LRUCache): Кэш сокращенный код -> (исходный URL, срок жизни ссылки) для горячих редиректов (если задан)
+        click_counter (ClickCounter): Счетчик переходов по ссылкам (если задан)
+        coherence (CacheCoherenceWatcher): Наблюдатель за изменениями базы из других процессов (если задан).
+            Если фильтр Блума не знает код, сервис сначала применяет чужие изменения: код мог только что создать
+            другой воркер, а фоновая проверка еще не успела добавить его в фильтр
+        code_generator (CodeGenerator): Генератор сокращенных кодов. По умолчанию - хэш исходного URL
+        single_flight (SingleFlight): Объединяет одновременные запросы на сокращение одного и того же URL (если задан)
+        write_queue (GroupCommitWriter): Очередь групповой записи (если задана). Одиночные запросы на сокращение
+            сохраняются пачками, одной транзакцией на пачку
+    """
+
     repository: Repository
+    executor: Optional[Executor] = None
+    cache: Optional[LRUCache[str, Tuple[str, Optional[float]]]] = None
+    click_counter: Optional[ClickCounter] = None
+    coherence: Optional[CacheCoherenceWatcher] = None
+    code_generator: CodeGenerator = field(default_factory=HashCodeGenerator)
+    single_flight: Optional[SingleFlight[Tuple[str, Optional[datetime]], str]] = None
+    write_queue: Optional[GroupCommitWriter] = None
+
+    async def _run_in_executor(self, method: str, *args: Any) -> Any:
+        """
+        Выполняет синхронный метод сервиса с именем `method` в пуле потоков, чтобы запросы к базе не блокировали
+        event loop. Методы неблокирующего репозитория (например, снимка в памяти) выполняются сразу, без пула
+        ! Только для внутреннего использования
+        """
+        if not self.repository.blocking:
+            return self._call_with_connection(method, *args)
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, partial(context.run, self._call_with_connection, method, *args))
 
-    def _create_short_url(self, origin_url: str) -> str:
+    @contextmanager
+    def _connection_scope(self) -> Iterator[None]:
+        """
+        Берет подключение из пула на время блока, если репозиторий еще не подключен к базе.
+        Так подключение занято только на время запросов, а не на все время обработки HTTP-запроса
+        ! Только для внутреннего использования
+        """
+        if self.repository.connection is None and self.repository.pool is not None:
+            with self.repository:
+                yield
+        else:
+            yield
+
+    def _call_with_connection(self, method: str, *args: Any) -> Any:
+        """
+        Выполняет метод сервиса с именем `method` с подключением из пула. Один экземпляр сервиса может выполнять
+        несколько вызовов параллельно, поэтому каждый вызов получает свою копию репозитория
+        ! Только для внутреннего использования
+        """
+        if self.repository.connection is None and self.repository.pool is not None:
+            with self.repository.copy() as repository:
+                return getattr(replace(self, repository=repository), method)(*args)
+        return getattr(self, method)(*args)
+
+    @timed("hash")
+    def _create_short_url(self, origin_url: str, attempt: int = 0) -> str:
         """
         Создает сокращенную ссылку из длинной
         ! Только для внутренного использования
 
         Args:
             original_url (str): Исходный URL
+            attempt (int): Номер попытки, если предыдущий код оказался занят другим URL
 
         Returns:
             str: Сокращенный URL
         """
-        hash = sha384(origin_url.encode("utf-8")).digest()[:10]
-        result: str = encodebytes(hash)
-        return result[:10]
+        return self.code_generator.generate(origin_url, self.repository, attempt)
 
     def _insert_url_pair_in_database(self, pair: URLPairModel) -> Optional[str]:
         """
@@ -37,42 +113,130 @@ class URLService:
         Args:
             pair (URLPairModel): Пара для записи
 
+        Returns:
+            Optional[str]: Уже существующий код, если исходный URL уже есть в базе
+
         Raises:
-            URLAlreadyExistsError: Если оригинальный или сокращенный URL уже существует в базе
+            ShortCodeCollisionError: Если сокращенный код уже занят другим URL
         """
         return self.repository.insert_new_url_pair(pair)
 
-    def _initialize_url_pair_model(self, origin_url: str) -> URLPairModel:
+    def _initialize_url_pair_model(
+        self, origin_url: str, expires_at: Optional[datetime] = None, attempt: int = 0
+    ) -> URLPairModel:
         """
         Фабрика для создания `URLPairModel` для дальнейшего использования в функции `__insert_url_pair_in_database`
         ! Только для внутреннего использования
 
         """
-        short_url = self._create_short_url(origin_url)
-        pair = URLPairModel(original_url=origin_url, shortened_url_code=short_url)  # ty:ignore[invalid-argument-type]
+        short_url = self._create_short_url(origin_url, attempt)
+        while short_url in RESERVED_CODES:
+            attempt += 1
+            short_url = self._create_short_url(origin_url, attempt)
+        pair = URLPairModel(original_url=origin_url, shortened_url_code=short_url, expires_at=expires_at)  # ty:ignore[invalid-argument-type]
         return pair
 
-    def create_url_pair(self, origin_url: str) -> str:
+    def create_url_pair(self, origin_url: str, expires_at: Optional[datetime] = None) -> str:
         """
         Создает в базе пару оригинальный/сокращенный URL и возвращает сокращенный URL
 
         Args:
             original_url (str): Исходный URL для сокращения
+            expires_at (Optional[datetime]): Когда истекает срок жизни ссылки. `None` - ссылка бессрочная
 
         Returns:
             str: Сокращенный URL
 
         Raises:
-            URLAlreadyExistsError: Если оригинальный или сокращенный URL уже существует в базе
+            ShortCodeCollisionError: Если за `CODE_GENERATION_ATTEMPTS` попыток не удалось подобрать свободный код
         """
-        pair = self._initialize_url_pair_model(origin_url)
-        code_from_db = self._insert_url_pair_in_database(pair)
+        for attempt in range(CODE_GENERATION_ATTEMPTS):
+            pair = self._initialize_url_pair_model(origin_url, expires_at, attempt)
+            try:
+                code_from_db = self._insert_url_pair_in_database(pair)
+                break
+            except ShortCodeCollisionError:
+                logger.warning(f"Short code {pair.shortened_url_code} is taken by another URL, retrying")
+        else:
+            raise ShortCodeCollisionError()
+
         if code_from_db is None:
             logger.info(f"New pair created in database: {pair.original_url} -> {pair.shortened_url_code}")
         else:
             logger.info(f"Using existing code for {pair.original_url} -> {pair.shortened_url_code}")
         return code_from_db or pair.shortened_url_code # Либо уже существуюший сокращенный код, либо новый созданный
 
+    def create_url_pairs(
+        self, origin_urls: List[str], expires_at: Optional[List[Optional[datetime]]] = None
+    ) -> List[Optional[str]]:
+        """
+        Создает в базе пары для набора URL одной транзакцией и возвращает сокращенные коды в порядке входного списка
+
+        Args:
+            origin_urls (List[str]): Исходные URL для сокращения
+            expires_at (Optional[List[Optional[datetime]]]): Сроки жизни ссылок в том же порядке. `None` - все ссылки бессрочные
+
+        Returns:
+            List[Optional[str]]: Сокращенные коды. `None` - для URL, которые не удалось сохранить
+        """
+        expiry = dict(zip(origin_urls, expires_at or []))
+        pairs = {url: self._initialize_url_pair_model(url, expiry.get(url)) for url in origin_urls}
+        codes = self.repository.insert_new_url_pairs(list(pairs.values()))
+        for attempt in range(1, CODE_GENERATION_ATTEMPTS):
+            collided = [url for url, pair in pairs.items() if str(pair.original_url) not in codes]
+            if not collided:
+                break
+            logger.warning(f"{len(collided)} short codes in batch are taken by other URLs, retrying")
+            for url in collided:
+                pairs[url] = self._initialize_url_pair_model(url, expiry.get(url), attempt)
+            codes.update(self.repository.insert_new_url_pairs([pairs[url] for url in collided]))
+
+        logger.info(f"Batch of {len(origin_urls)} URLs shortened, {len(codes)} unique pairs resolved")
+        return [codes.get(str(pairs[url].original_url)) for url in origin_urls]
+
+    def _load_redirect(self, short_url: str) -> Tuple[str, Optional[float]]:
+        """
+        Достает исходный URL и срок жизни ссылки из базы и кладет их в кэш
+        ! Только для внутреннего использования
+        """
+        if self.coherence is not None and not self.repository.might_contain(short_url):
+            self.coherence.sync()
+        original_url, expires_at = self.repository.get_original_url_and_expiry(short_url)
+        if self.cache is not None:
+            ttl = None if expires_at is None else min(self.cache.ttl, expires_at - time.time())
+            self.cache.set(short_url, (original_url, expires_at), ttl=ttl)
+        return original_url, expires_at
+
+    def _record_click(self, short_url: str):
+        """
+        Учитывает переход по ссылке в памяти, без записи в базу
+        ! Только для внутреннего использования
+        """
+        if self.click_counter is not None:
+            self.click_counter.record(short_url)
+
+    def get_redirect(self, short_url: str, record_click: bool = True) -> Tuple[str, Optional[float]]:
+        """
+        Ищет в базе исходный URL по его сокращенной версии и возвращает его вместе со сроком жизни ссылки
+
+        Args:
+            short_url (str): Сокращенный URL
+            record_click (bool): Учитывать ли обращение как переход по ссылке
+
+        Returns:
+            Tuple[str, Optional[float]]: Исходный URL и срок жизни ссылки (unix time, `None` - бессрочная)
+
+        Raises:
+            URLDoesNotExistsError: Если URL не найден в базе
+            URLExpiredError: Если срок жизни ссылки истек
+        """
+        redirect = self.cache.get(short_url) if self.cache is not None else None
+        if redirect is None:
+            redirect = self._load_redirect(short_url)
+        if record_click:
+            self._record_click(short_url)
+        return redirect
+
     def get_original_url_from_short(self, short_url: str) -> str:
         """
         Ищет в базе исходный URL по его сокращенной версии и возвращает его
@@ -85,8 +249,9 @@ class URLService:
 
         Raises:
             URLDoesNotExistsError: Если URL не найден в базе
+            URLExpiredError: Если срок жизни ссылки истек
         """
-        return self.repository.get_original_url_from_shortened(short_url)
+        return self.get_redirect(short_url)[0]
 
     def delete_url_pair_from_shorten_url(self, short_url: str):
         """
@@ -98,7 +263,11 @@ class URLService:
         Raises:
             `URLNotFoundError`: Если указанного URL нет в базе
         """
-        self.repository.delete_url_pair(short_url)
+        try:
+            self.repository.delete_url_pair(short_url)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(short_url)
 
     def get_all_url_pairs_from_db(self) -> List[URLPairModel]:
         """
@@ -108,3 +277,143 @@ class URLService:
             List[URLPairModel]: Все пары связанных URL
         """
         return self.repository.get_all_pairs()
+
+
+    def get_url_pairs_page(self, after_id: int, limit: int) -> List[URLPairRow]:
+        """
+        Возвращает страницу пар URL после курсора `after_id`
+
+        Args:
+            after_id (int): Курсор - id последней пары с предыдущей страницы
+            limit (int): Размер страницы
+
+        Returns:
+            List[URLPairRow]: Строки (id, оригинальный URL, сокращенный код)
+        """
+        return self.repository.get_pairs_page(after_id, limit)
+
+    def iter_url_pairs(self, after_id: int = 0) -> Iterator[URLPairRow]:
+        """
+        Лениво отдает все пары URL из базы, не загружая таблицу в память
+
+        Args:
+            after_id (int): Курсор, после которого начинать выдачу
+        """
+        while True:
+            with self._connection_scope():
+                rows = self.repository.get_pairs_page(after_id, ITER_PAGE_SIZE)
+            yield from rows
+            if len(rows) < ITER_PAGE_SIZE:
+                return
+            after_id = rows[-1][0]
+
+    def get_url_stats(self, short_url: str) -> Tuple[int, Optional[float]]:
+        """
+        Возвращает статистику переходов по ссылке с учетом еще не записанных в базу переходов
+
+        Args:
+            short_url (str): Сокращенный URL
+
+        Returns:
+            Tuple[int, Optional[float]]: Количество переходов и время последнего перехода (unix time)
+
+        Raises:
+            `URLNotFoundError`: Если указанного URL нет в базе
+        """
+        clicks, last_access_at = self.repository.get_click_stats(short_url)
+        if self.click_counter is not None:
+            pending_clicks, pending_last_access_at = self.click_counter.pending(short_url)
+            clicks += pending_clicks
+            if pending_last_access_at is not None:
+                last_access_at = max(last_access_at or 0.0, pending_last_access_at)
+        return clicks, last_access_at
+
+    async def acreate_url_pair(self, origin_url: str, expires_at: Optional[datetime] = None) -> str:
+        """
+        Асинхронная версия `create_url_pair`. Одновременные запросы на один и тот же URL (уже нормализованный
+        валидацией API) с тем же сроком жизни выполняют одну вставку на всех
+        """
+        if self.single_flight is None:
+            return await self._create_url_pair(origin_url, expires_at)
+        return await self.single_flight.do((origin_url, expires_at), lambda: self._create_url_pair(origin_url, expires_at))
+
+    async def _create_url_pair(self, origin_url: str, expires_at: Optional[datetime]) -> str:
+        """
+        Сохраняет пару через очередь групповой записи, если она задана, иначе - отдельной транзакцией
+        ! Только для внутреннего использования
+        """
+        if self.write_queue is None:
+            return await self._run_in_executor("create_url_pair", origin_url, expires_at)
+        code = await self.write_queue.submit(origin_url, expires_at)
+        if code is None:
+            raise ShortCodeCollisionError()
+        return code
+
+    async def acreate_url_pairs(
+        self, origin_urls: List[str], expires_at: Optional[List[Optional[datetime]]] = None
+    ) -> List[Optional[str]]:
+        """
+        Асинхронная версия `create_url_pairs`
+        """
+        return await self._run_in_executor("create_url_pairs", origin_urls, expires_at)
+
+    async def aget_redirect(self, short_url: str, record_click: bool = True) -> Tuple[str, Optional[float]]:
+        """
+        Асинхронная версия `get_redirect`. Попадания в кэш и заведомо несуществующие коды
+        обслуживаются без обращения к пулу потоков. С наблюдателем (несколько воркеров) промах фильтра Блума
+        проверяется в пуле потоков: сначала применяются чужие изменения
+        """
+        redirect = self.cache.get(short_url) if self.cache is not None else None
+        if redirect is None:
+            if self.coherence is None and not self.repository.might_contain(short_url):
+                raise URLNotFoundError()
+            redirect = await self._run_in_executor("_load_redirect", short_url)
+        if record_click:
+            self._record_click(short_url)
+        return redirect
+
+    async def aget_original_url_from_short(self, short_url: str) -> str:
+        """
+        Асинхронная версия `get_original_url_from_short`
+        """
+        return (await self.aget_redirect(short_url))[0]
+
+    async def adelete_url_pair_from_shorten_url(self, short_url: str):
+        """
+        Асинхронная версия `delete_url_pair_from_shorten_url`
+        """
+        await self._run_in_executor("delete_url_pair_from_shorten_url", short_url)
+
+    async def aget_all_url_pairs_from_db(self) -> List[URLPairModel]:
+        """
+        Асинхронная версия `get_all_url_pairs_from_db`
+        """
+        return await self._run_in_executor("get_all_url_pairs_from_db")
+
+    async def aget_url_pairs_page(self, after_id: int, limit: int) -> List[URLPairRow]:
+        """
+        Асинхронная версия `get_url_pairs_page`
+        """
+        return await self._run_in_executor("get_url_pairs_page", after_id, limit)
+
+    async def aget_url_stats(self, short_url: str) -> Tuple[int, Optional[float]]:
+        """
+        Асинхронная версия `get_url_stats`
+        """
+        return await self._run_in_executor("get_url_stats", short_url)
+
+    def delete_expired_url_pairs(self, batch_size: int = 500) -> int:
+        """
+        Удаляет из базы одну пачку истекших ссылок и убирает их из кэша
+
+        Args:
+            batch_size (int): Максимальное количество ссылок в пачке
+
+        Returns:
+            int: Количество удаленных ссылок
+        """
+        deleted = self.repository.delete_expired_pairs(batch_size)
+        if self.cache is not None:
+            for short_url in deleted:
+                self.cache.invalidate(short_url)
+        return len(deleted)
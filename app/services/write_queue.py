@@ -0,0 +1,129 @@
+"""
+Групповая запись новых ссылок: одна транзакция (и один fsync) на пачку запросов на сокращение
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+type WriteItem = Tuple[str, Optional[datetime]]
+type FlushFunc = Callable[[List[WriteItem]], Awaitable[List[Optional[str]]]]
+type QueueEntry = Tuple[WriteItem, "asyncio.Future[Optional[str]]"]
+
+
+class GroupCommitWriter:
+    """
+    Очередь запросов на сокращение с единственной задачей-писателем.
+
+    Писатель забирает из очереди все накопившиеся запросы - как только их набралось `max_batch_size`
+    или через `max_delay` секунд после первого - и сохраняет их одной транзакцией через `flush`.
+    Пока пачка пишется, следующая копится в очереди, поэтому под нагрузкой пачки растут сами
+
+    Attributes:
+        max_batch_size (int): Максимальный размер пачки
+        max_delay (float): Сколько секунд ждать пополнения пачки после первого запроса
+    """
+
+    def __init__(self, flush: FlushFunc, max_batch_size: int = 500, max_delay: float = 0.002):
+        """
+        Конструктор писателя
+
+        Args:
+            flush (FlushFunc): Сохраняет пачку (исходный URL, срок жизни) и возвращает коды в том же порядке
+            max_batch_size (int): Максимальный размер пачки
+            max_delay (float): Сколько секунд ждать пополнения пачки после первого запроса
+        """
+        self.flush = flush
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue[Optional[QueueEntry]] = asyncio.Queue()  # `None` - сигнал остановки от `close`
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._batches = 0
+        self._items = 0
+
+    async def submit(self, origin_url: str, expires_at: Optional[datetime] = None) -> Optional[str]:
+        """
+        Ставит URL в очередь на запись и дожидается записи его пачки
+
+        Returns:
+            Optional[str]: Сокращенный код. `None` - если URL не удалось сохранить
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+        future: asyncio.Future[Optional[str]] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((origin_url, expires_at), future))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            entry = await self._queue.get()
+            if entry is None:
+                return
+            batch, stop = [entry], False
+            try:
+                await asyncio.wait_for(self._full.wait(), self.max_delay)
+            except TimeoutError:
+                pass
+            self._full.clear()
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                entry = self._queue.get_nowait()
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+            await self._write(batch)
+            if stop:
+                return
+
+    async def _write(self, batch: List[QueueEntry]):
+        try:
+            codes = await self.flush([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as exc:
+            logger.exception(f"Group commit of {len(batch)} URLs failed: {exc}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        self._batches += 1
+        self._items += len(batch)
+        for (_, future), code in zip(batch, codes):
+            if not future.done():
+                future.set_result(code)
+
+    async def close(self):
+        """
+        Записывает все, что уже стоит в очереди, и останавливает писателя. Пачка, которая пишется в момент вызова,
+        дописывается: писатель получает сигнал остановки в конце очереди, а не отменяется
+        """
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        self._full.set()
+        await self._task
+        self._task = None
+
+        # Запросы, поставленные в очередь уже после сигнала остановки
+        pending: List[QueueEntry] = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not None:
+                pending.append(entry)
+        for start in range(0, len(pending), self.max_batch_size):
+            await self._write(pending[start : start + self.max_batch_size])
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику писателя: длину очереди, количество записанных пачек и URL в них
+        """
+        return {"queued": self._queue.qsize(), "batches": self._batches, "items": self._items}
@@ -1,7 +1,7 @@
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Literal, Optional, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, field_validator, PositiveInt
+from pydantic import Field, field_validator, NonNegativeInt, PositiveFloat, PositiveInt
 
 
 class ApplicationSettings(BaseSettings):
@@ -10,6 +10,44 @@ class ApplicationSettings(BaseSettings):
     host: str = Field(description="Хост, на котором запускается приложение")
     telegram_api_key: Optional[str] = Field(description="Ключ для работы бота сократителя ссылок")
     api_link: Optional[str] = Field(description="API, куда надо отправлять запрос на сокращение ссылки (по логике, это наш APi :) ")
+    db_pool_size: PositiveInt = Field(default=5, description="Максимальное количество подключений к базе в пуле")
+    db_pool_timeout: PositiveFloat = Field(default=5.0, description="Сколько секунд ждать свободное подключение из пула")
+    cache_size: NonNegativeInt = Field(default=10000, description="Максимальное количество редиректов в in-memory кэше (0 - кэш отключен)")
+    cache_ttl: PositiveFloat = Field(default=300.0, description="Время жизни записи в кэше редиректов, в секундах")
+    bloom_capacity: NonNegativeInt = Field(default=1_000_000, description="Ожидаемое количество ссылок для фильтра Блума (0 - фильтр отключен)")
+    bloom_error_rate: float = Field(default=0.01, gt=0, lt=1, description="Допустимая доля ложноположительных срабатываний фильтра Блума")
+    bloom_max_bytes: PositiveInt = Field(default=8 * 1024 * 1024, description="Ограничение памяти под фильтр Блума, в байтах")
+    bloom_rebuild_check_interval: PositiveFloat = Field(default=60.0, description="Как часто проверять, не пора ли перестроить фильтр Блума, в секундах")
+    click_flush_interval: PositiveFloat = Field(default=5.0, description="Как часто записывать накопленные переходы по ссылкам в базу, в секундах")
+    expired_sweep_interval: PositiveFloat = Field(default=60.0, description="Как часто удалять из базы истекшие ссылки, в секундах")
+    expired_sweep_batch_size: PositiveInt = Field(default=500, description="Сколько истекших ссылок удалять одной транзакцией")
+    expired_sweep_pause: float = Field(default=0.05, ge=0, description="Пауза между транзакциями очистки, чтобы не задерживать редиректы, в секундах")
+    db_journal_mode: Literal["delete", "truncate", "persist", "memory", "wal", "off"] = Field(default="wal", description="Режим журнала SQLite (PRAGMA journal_mode)")
+    db_synchronous: Literal["off", "normal", "full", "extra"] = Field(default="normal", description="Режим синхронизации с диском (PRAGMA synchronous)")
+    db_cache_size: int = Field(default=-16384, description="Размер кэша страниц на подключение: > 0 - в страницах, < 0 - в КиБ (PRAGMA cache_size)")
+    db_mmap_size: NonNegativeInt = Field(default=256 * 1024 * 1024, description="Сколько байт базы читать через mmap (PRAGMA mmap_size)")
+    db_busy_timeout: NonNegativeInt = Field(default=5000, description="Сколько миллисекунд ждать снятия блокировки (PRAGMA busy_timeout)")
+    db_temp_store: Literal["default", "file", "memory"] = Field(default="memory", description="Где хранить временные таблицы и индексы (PRAGMA temp_store)")
+    db_shards: PositiveInt = Field(default=1, description="На сколько файлов SQLite (шардов) делить ссылки: у каждого шарда своя блокировка на запись")
+    snapshot_path: Optional[str] = Field(default=None, description="Файл снимка редиректов. Если задан, API работает как реплика только для чтения и отдает редиректы из снимка, без базы")
+    snapshot_check_interval: float = Field(default=1.0, ge=0, description="Как часто реплика проверяет, не появился ли новый снимок редиректов, в секундах")
+    code_generator: Literal["hash", "counter"] = Field(default="hash", description="Генератор сокращенных кодов: хэш исходного URL или общий счетчик")
+    code_length: int = Field(default=10, ge=4, le=10, description="Максимальная длина сокращенного кода")
+    code_block_size: PositiveInt = Field(default=1000, description="Сколько номеров счетчика резервировать процессу за одно обращение к базе")
+    redirect_status: Literal[301, 302, 303, 307, 308] = Field(default=303, description="Код ответа для редиректа по сокращенной ссылке")
+    redirect_cache_max_age: NonNegativeInt = Field(default=0, description="Сколько секунд браузеры и CDN могут кэшировать редирект (Cache-Control: max-age), 0 - только с перепроверкой через ETag")
+    fast_redirect: bool = Field(default=True, description="Отдавать редиректы GET /{code} в обход маршрутизации и внедрения зависимостей FastAPI")
+    workers: PositiveInt = Field(default=1, description="Количество процессов API (воркеров uvicorn)")
+    cache_coherence_interval: PositiveFloat = Field(default=1.0, description="Как часто каждый воркер проверяет изменения базы, сделанные другими процессами, в секундах (только при workers > 1)")
+    change_log_retention: PositiveFloat = Field(default=3600.0, description="Сколько секунд хранить записи журнала изменений ссылок для согласования кэшей процессов")
+    write_batch_size: NonNegativeInt = Field(default=0, description="Сколько запросов на сокращение сохранять одной транзакцией (0 - очередь групповой записи отключена, каждый запрос - своя транзакция)")
+    write_batch_delay: float = Field(default=0.002, ge=0, description="Сколько секунд очередь групповой записи ждет пополнения пачки после первого запроса")
+    bot_api_timeout: PositiveFloat = Field(default=10.0, description="Таймаут одного запроса бота к API, в секундах")
+    bot_api_retries: NonNegativeInt = Field(default=3, description="Сколько раз бот повторяет запрос к API при сетевой ошибке или ответе 5xx")
+    bot_api_retry_backoff: float = Field(default=0.5, ge=0, description="Задержка перед первым повтором запроса бота к API, в секундах (каждый следующий повтор ждет вдвое дольше)")
+    bot_api_pool_size: PositiveInt = Field(default=20, description="Максимальное количество одновременных соединений бота с API")
+    bot_page_size: int = Field(default=10, ge=1, le=50, description="Сколько ссылок бот показывает на одной странице /all")
+    bot_page_cache_ttl: PositiveFloat = Field(default=30.0, description="Сколько секунд бот хранит загруженные страницы /all")
     model_config = SettingsConfigDict(case_sensitive=False, env_file=".env")
 
     @field_validator("db_name")
@@ -30,4 +68,18 @@ class ApplicationSettings(BaseSettings):
 
         return value
 
+    @property
+    def sqlite_pragmas(self) -> Dict[str, Union[str, int]]:
+        """
+        Профиль PRAGMA, который применяется к каждому подключению к базе
+        """
+        return {
+            "journal_mode": self.db_journal_mode,
+            "synchronous": self.db_synchronous,
+            "cache_size": self.db_cache_size,
+            "mmap_size": self.db_mmap_size,
+            "busy_timeout": self.db_busy_timeout,
+            "temp_store": self.db_temp_store,
+        }
+
 app_settings = ApplicationSettings() # ty:ignore[missing-argument]
\ No newline at end of file
@@ -9,6 +9,7 @@ from app.api.deps.url_service_dependency import (
 from app.api.views import app
 from app.data.repository.repository import Repository
 from app.services.url_service import URLService
+from app.settings import app_settings
 
 
 @pytest.fixture
@@ -24,7 +25,9 @@ def mock_url_service(mock_repository: Repository):
 
 
 @pytest.fixture
-def test_api_client(mock_repository: Repository, mock_url_service: URLService):
+def test_api_client(mock_repository: Repository, mock_url_service: URLService, monkeypatch: pytest.MonkeyPatch):
+    # Быстрый путь редиректов работает с общим сервисом процесса, а не с подмененным через dependency_overrides
+    monkeypatch.setattr(app_settings, "fast_redirect", False)
     app.dependency_overrides[provide_database_name] = lambda: ":memory:"
     app.dependency_overrides[provide_repository] = lambda: mock_repository
     app.dependency_overrides[provide_url_service] = lambda: mock_url_service
@@ -1,3 +1,5 @@
+import json
+
 from fastapi.testclient import TestClient
 
 def test_endpoint_create_url_pair(test_api_client: TestClient):
@@ -41,4 +43,70 @@ def test_endpoint_get_all_pairs(test_api_client: TestClient):
 
     resp = test_api_client.get("/all")
     assert resp.status_code == 200
-    assert len(resp.json()) == 2
\ No newline at end of file
+    assert len(resp.json()) == 2
+
+
+def test_endpoint_create_url_pairs_batch(test_api_client: TestClient):
+    single = test_api_client.post("/shorten", json={"url": "https://google.com"}).json()["short_code"]
+
+    resp = test_api_client.post(
+        "/shorten/batch",
+        json={"urls": ["https://ya.ru", "ya.ru", "https://google.com", "https://ya.ru"]},
+    )
+    assert resp.status_code == 200
+    items = resp.json()
+    assert [item["url"] for item in items] == ["https://ya.ru", "ya.ru", "https://google.com", "https://ya.ru"]
+    assert items[1]["error"] is not None and items[1]["short_code"] is None
+    assert items[2]["short_code"] == single
+    assert items[0]["short_code"] == items[3]["short_code"]
+
+    redirect = test_api_client.get(f"/{items[0]['short_code']}", follow_redirects=False)
+    assert redirect.headers["location"] == "https://ya.ru/"
+
+def test_endpoint_get_all_pairs_paginated(test_api_client: TestClient):
+    urls = [f"https://example.com/{i}" for i in range(5)]
+    test_api_client.post("/shorten/batch", json={"urls": urls})
+
+    seen = []
+    cursor = 0
+    while True:
+        resp = test_api_client.get("/all", params={"limit": 2, "after": cursor})
+        assert resp.status_code == 200
+        seen.extend(pair["original_url"] for pair in resp.json())
+        if "X-Next-Cursor" not in resp.headers:
+            break
+        cursor = int(resp.headers["X-Next-Cursor"])
+
+    assert sorted(seen) == urls  # Пары отдаются по ключу кода, а не в порядке добавления
+
+def test_endpoint_get_all_pairs_ndjson(test_api_client: TestClient):
+    test_api_client.post("/shorten/batch", json={"urls": ["https://google.com", "https://ya.ru"]})
+
+    resp = test_api_client.get("/all", params={"format": "ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(line["original_url"] for line in lines) == ["https://google.com/", "https://ya.ru/"]
+
+def test_endpoint_get_url_stats(test_api_client: TestClient):
+    short_code = test_api_client.post("/shorten", json={"url": "https://google.com"}).json()["short_code"]
+
+    resp = test_api_client.get(f"/stats/{short_code}")
+    assert resp.status_code == 200
+    assert resp.json()["short_code"] == short_code
+    assert resp.json()["clicks"] == 0
+
+    assert test_api_client.get("/stats/NON_EXISTING").status_code == 404
+
+def test_endpoint_redirect_caching(test_api_client: TestClient):
+    short_code = test_api_client.post("/shorten", json={"url": "https://google.com"}).json()["short_code"]
+
+    resp = test_api_client.get(f"/{short_code}", follow_redirects=False)
+    assert resp.headers["cache-control"] == "no-cache"
+    etag = resp.headers["etag"]
+
+    assert test_api_client.get(f"/{short_code}", headers={"If-None-Match": f'"other", W/{etag}'}, follow_redirects=False).status_code == 304
+    assert test_api_client.get(f"/{short_code}", headers={"If-None-Match": '"other"'}, follow_redirects=False).status_code == 303
+    head = test_api_client.head(f"/{short_code}", follow_redirects=False)
+    assert head.status_code == 303 and head.headers["location"] == "https://google.com/"
+    assert test_api_client.head("/INCORRECT", follow_redirects=False).status_code == 404
@@ -0,0 +1,45 @@
+import pytest
+
+from app.data.db.models import URLPairModel
+from app.data.repository.bloom_filter import BloomFilter
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import URLNotFoundError
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    codes = [f"code{i}" for i in range(1000)]
+    bloom_filter.rebuild(codes, total=len(codes))
+
+    assert all(code in bloom_filter for code in codes)
+    false_positives = sum(f"missing{i}" in bloom_filter for i in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_filter_contains_everything_until_built():
+    bloom_filter = BloomFilter(capacity=10)
+    assert "anything" in bloom_filter
+
+
+def test_bloom_filter_respects_memory_budget():
+    bloom_filter = BloomFilter(capacity=10_000_000, error_rate=0.001, max_bytes=1024)
+    assert bloom_filter.stats()["bytes"] <= 1024
+
+
+def test_repository_rejects_unknown_codes_without_query(mock_repository: Repository):
+    mock_repository.bloom_filter = BloomFilter(capacity=100)
+    pair = URLPairModel(original_url="https://google.com", shortened_url_code="tfg1")  # ty:ignore[invalid-argument-type]
+    mock_repository.insert_new_url_pair(pair)
+    mock_repository.rebuild_bloom_filter()
+
+    connection, mock_repository.connection = mock_repository.connection, None
+    with pytest.raises(URLNotFoundError):
+        mock_repository.get_original_url_from_shortened("NON_EXISTING")
+    mock_repository.connection = connection
+
+    new_pair = URLPairModel(original_url="https://ya.ru", shortened_url_code="tfg2")  # ty:ignore[invalid-argument-type]
+    mock_repository.insert_new_url_pair(new_pair)
+    assert mock_repository.get_original_url_from_shortened("tfg2") == "https://ya.ru/"
+
+    mock_repository.delete_url_pair("tfg2")
+    assert mock_repository.bloom_filter.stats()["removed"] == 1
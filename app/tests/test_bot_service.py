@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.bot.services import BotService
+
+
+def run_with_server(handler, scenario):
+    async def run():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        async with TestServer(app) as server:
+            service = BotService(str(server.make_url("")).rstrip("/"), timeout=1.0, retries=2, backoff=0.01)
+            try:
+                return await scenario(service)
+            finally:
+                await service.close()
+
+    return asyncio.run(run())
+
+
+def test_short_links_are_retried_after_server_error():
+    calls = 0
+
+    async def handler(request: web.Request) -> web.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return web.Response(status=503)
+        body = await request.json()
+        assert body == {"urls": ["https://example.com"]}
+        return web.json_response([{"url": "https://example.com", "short_code": "abc"}])
+
+    results = run_with_server(handler, lambda service: service.call_api_for_short_links(["https://example.com"]))
+    assert [result.short_code for result in results] == ["abc"]
+    assert calls == 2
+
+
+def test_gives_up_after_retries():
+    calls = 0
+
+    async def handler(request: web.Request) -> web.Response:
+        nonlocal calls
+        calls += 1
+        return web.Response(status=500)
+
+    assert run_with_server(handler, lambda service: service.call_api_for_links_page()) is None
+    assert calls == 3
+
+
+def test_concurrent_calls_share_session():
+    async def handler(request: web.Request) -> web.Response:
+        await asyncio.sleep(0.01)
+        return web.json_response([{"url": url, "short_code": request.path} for url in (await request.json())["urls"]])
+
+    async def scenario(service: BotService):
+        session = service.session
+        results = await asyncio.gather(*(service.call_api_for_short_links([f"https://example.com/{i}"]) for i in range(5)))
+        return results, service.session is session
+
+    results, same_session = run_with_server(handler, scenario)
+    assert same_session
+    assert [result[0].short_code for result in results] == ["/shorten/batch"] * 5
+
+
+
+def test_links_pages_are_fetched_by_cursor_and_cached():
+    requests = []
+    rows = [(f"https://example.com/{i}", f"c{i}") for i in range(5)]
+
+    async def handler(request: web.Request) -> web.Response:
+        limit, after = int(request.query["limit"]), int(request.query["after"])
+        requests.append(after)
+        page = rows[after : after + limit]
+        headers = {"X-Next-Cursor": str(after + limit)} if len(page) == limit else None
+        return web.json_response([{"original_url": url, "short_code": code} for url, code in page], headers=headers)
+
+    async def scenario(service: BotService):
+        service.page_size = 2
+        first = await service.call_api_for_links_page()
+        second = await service.call_api_for_links_page(first.next_cursor)
+        third = await service.call_api_for_links_page(second.next_cursor)
+        again = await service.call_api_for_links_page(first.next_cursor)
+        return [first, second, third, again], service.previous_cursor(third.after), service.previous_cursor(99)
+
+    pages, previous, unknown_previous = run_with_server(handler, scenario)
+    assert [page.pairs for page in pages[:3]] == [rows[0:2], rows[2:4], rows[4:5]]
+    assert [page.next_cursor for page in pages[:3]] == [2, 4, None]
+    assert pages[3] is pages[1]
+    assert requests == [0, 2, 4]
+    assert (previous, unknown_previous) == (2, 0)
+
+
+def test_short_links_are_sent_in_one_request():
+    requests = []
+
+    async def handler(request: web.Request) -> web.Response:
+        body = await request.json()
+        requests.append((request.path, body))
+        return web.json_response([{"url": url, "short_code": f"c{i}"} for i, url in enumerate(body["urls"])])
+
+    urls = [f"https://example.com/{i}" for i in range(30)]
+    results = run_with_server(handler, lambda service: service.call_api_for_short_links(urls))
+    assert requests == [("/shorten/batch", {"urls": urls})]
+    assert [result.short_code for result in results] == [f"c{i}" for i in range(30)]
@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("aiogram")
+from aiogram.types import MessageEntity
+
+from app.bot.utils import DISPLAY_URL_MAX_LENGTH, extract_urls, format_links_page, links_page_keyboard, split_message
+
+
+def utf16_entity(text: str, part: str, entity_type: str, **kwargs) -> MessageEntity:
+    start = text.index(part)
+    utf16_length = lambda value: len(value.encode("utf-16-le")) // 2
+    return MessageEntity(type=entity_type, offset=utf16_length(text[:start]), length=utf16_length(part), **kwargs)
+
+
+def test_extract_urls_from_entities():
+    text = "Ссылки: 👍 example.com/a, https://b.org/x?y=1 и вот эта, и снова example.com/a"
+    entities = [
+        utf16_entity(text, "Ссылки", "bold"),
+        utf16_entity(text, "example.com/a", "url"),
+        utf16_entity(text, "https://b.org/x?y=1", "url"),
+        utf16_entity(text, "вот эта", "text_link", url="https://hidden.io/"),
+        MessageEntity(type="url", offset=len(text.encode("utf-16-le")) // 2 - 13, length=13),
+    ]
+    assert extract_urls(text, entities) == ["http://example.com/a", "https://b.org/x?y=1", "https://hidden.io/"]
+
+
+def test_extract_urls_from_plain_text():
+    text = "first https://a.com/1\nsecond http://b.com/2, no url here"
+    assert extract_urls(text) == ["https://a.com/1", "http://b.com/2"]
+    assert extract_urls("nothing") == []
+    assert extract_urls(None) == []
+
+
+def test_split_message():
+    assert split_message(["a" * 3, "b" * 3, "c" * 3], limit=7) == ["aaa\nbbb", "ccc"]
+    assert split_message(["a", "b" * 10, "c"], limit=4) == ["a", "bbbb", "bbbb", "bb\nc"]
+    assert split_message([]) == []
+
+
+def test_links_page():
+    long_url = "https://example.com/" + "a" * DISPLAY_URL_MAX_LENGTH
+    text = format_links_page([("https://example.com/", "abc"), (long_url, "def")], "http://localhost")
+    first, second = text.split("\n")
+    assert first == "Оригинал: https://example.com/ -> http://localhost/abc"
+    assert second == f"Оригинал: {long_url[: DISPLAY_URL_MAX_LENGTH - 1]}… -> http://localhost/def"
+
+    keyboard = links_page_keyboard(0, 20)
+    assert [button.callback_data for button in keyboard.inline_keyboard[0]] == ["all:0", "all:20"]
+    assert links_page_keyboard(None, None) is None
@@ -0,0 +1,98 @@
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from app.data.repository.repository import Repository
+from app.services.bulk_transfer import export_pairs, import_pairs
+from app.services.url_service import URLService
+
+
+def make_service(path: Path) -> URLService:
+    repository = Repository(str(path))
+    repository.__enter__()
+    repository.initialize_database()
+    return URLService(repository)
+
+
+@pytest.fixture
+def source(tmp_path: Path):
+    service = make_service(tmp_path / "source.sqlite3")
+    service.create_url_pairs([f"https://example.com/{i}" for i in range(25)])
+    yield service
+    service.repository.__exit__(None, None, None)
+
+
+@pytest.mark.parametrize("output_format", ["ndjson", "csv"])
+def test_export_and_import_round_trip(source: URLService, tmp_path: Path, output_format):
+    output = io.StringIO()
+    assert export_pairs(source.repository, output, output_format, batch_size=7) == 25
+    dump = tmp_path / f"links.{output_format}"
+    dump.write_text(output.getvalue() + ("not a url,,\n" if output_format == "csv" else '{"url": "nope"}\n'))
+
+    target = make_service(tmp_path / "target.sqlite3")
+    progress = import_pairs(target, str(dump), output_format, chunk_size=4, checkpoint_path=str(tmp_path / "ckpt"))
+    assert (progress.imported, progress.failed) == (25, 1)
+    assert not (tmp_path / "ckpt").exists()
+    # Коды генерируются так же, как при сокращении через API
+    assert sorted(pair.shortened_url_code for pair in target.get_all_url_pairs_from_db()) == sorted(
+        pair.shortened_url_code for pair in source.get_all_url_pairs_from_db()
+    )
+
+
+def test_import_keeps_codes_from_file(tmp_path: Path):
+    dump = tmp_path / "links.ndjson"
+    dump.write_text(json.dumps({"short_code": "keep1", "original_url": "https://example.com/a"}) + "\n")
+    target = make_service(tmp_path / "target.sqlite3")
+    import_pairs(target, str(dump), keep_codes=True)
+    assert target.get_original_url_from_short("keep1") == "https://example.com/a"
+
+
+
+def test_import_rejects_invalid_rows_individually(tmp_path: Path):
+    future = datetime.now() + timedelta(days=1)
+    rows = [
+        {"short_code": "bad-code!", "original_url": "https://example.com/bad"},
+        {"short_code": "x" * 21, "original_url": "https://example.com/long"},
+        {"short_code": "past1", "original_url": "https://example.com/past", "expires_at": "2000-01-01T00:00:00"},
+        {"short_code": "naive1", "original_url": "https://example.com/naive", "expires_at": future.isoformat()},
+        {"short_code": "good1", "original_url": "https://example.com/good"},
+    ]
+    dump = tmp_path / "links.ndjson"
+    dump.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    target = make_service(tmp_path / "target.sqlite3")
+
+    progress = import_pairs(target, str(dump), keep_codes=True)
+
+    assert (progress.imported, progress.failed) == (2, 3)
+    assert target.get_original_url_from_short("good1") == "https://example.com/good"
+    # Время без часового пояса считается UTC, как и в запросах к API
+    expires_at = target.repository.get_original_url_and_expiry("naive1")[1]
+    assert expires_at == pytest.approx(future.replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_interrupted_import_resumes_from_checkpoint(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    dump = tmp_path / "links.ndjson"
+    dump.write_text("".join(json.dumps(f"https://example.com/{i}") + "\n" for i in range(10)))
+    checkpoint = str(tmp_path / "ckpt")
+    target = make_service(tmp_path / "target.sqlite3")
+
+    create_url_pairs, calls = target.create_url_pairs, []
+
+    def failing_create(urls, expires_at=None):
+        calls.append(urls)
+        if len(calls) == 3:
+            raise RuntimeError("crash")
+        return create_url_pairs(urls, expires_at)
+
+    monkeypatch.setattr(target, "create_url_pairs", failing_create)
+    with pytest.raises(RuntimeError):
+        import_pairs(target, str(dump), chunk_size=3, checkpoint_path=checkpoint)
+    assert json.loads(Path(checkpoint).read_text())["imported"] == 6
+
+    progress = import_pairs(target, str(dump), chunk_size=3, checkpoint_path=checkpoint)
+    assert calls[3][0] == "https://example.com/6"
+    assert (progress.imported, progress.failed) == (10, 0)
+    assert len(target.get_all_url_pairs_from_db()) == 10
@@ -0,0 +1,42 @@
+import time
+from typing import Optional, Tuple
+
+from app.data.repository.repository import Repository
+from app.services.cache import LRUCache
+from app.services.url_service import URLService
+
+
+def test_cache_evicts_least_recently_used():
+    cache: LRUCache[str, str] = LRUCache(max_size=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" становится самым давно использованным
+
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_expires_entries():
+    cache: LRUCache[str, str] = LRUCache(max_size=2, ttl=60)
+    cache.set("a", "1", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_service_reads_through_cache(mock_repository: Repository):
+    cache: LRUCache[str, Tuple[str, Optional[float]]] = LRUCache(max_size=10, ttl=60)
+    service = URLService(mock_repository, cache=cache)
+    short_url = service.create_url_pair("https://google.com")
+
+    assert service.get_original_url_from_short(short_url) == "https://google.com/"
+    assert service.get_original_url_from_short(short_url) == "https://google.com/"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    service.delete_url_pair_from_shorten_url(short_url)
+    assert cache.get(short_url) is None
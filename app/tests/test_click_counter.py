@@ -0,0 +1,42 @@
+import pytest
+
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import URLNotFoundError
+from app.services.click_counter import ClickCounter
+from app.services.url_service import URLService
+
+
+def test_clicks_are_aggregated_and_flushed(mock_repository: Repository):
+    click_counter = ClickCounter()
+    service = URLService(mock_repository, click_counter=click_counter)
+    short_url = service.create_url_pair("https://google.com")
+
+    for _ in range(3):
+        service.get_original_url_from_short(short_url)
+
+    assert mock_repository.get_click_stats(short_url) == (0, None)  # Редиректы ничего не пишут в базу
+    assert service.get_url_stats(short_url)[0] == 3
+
+    assert click_counter.flush(mock_repository) == 1
+    clicks, last_access_at = mock_repository.get_click_stats(short_url)
+    assert clicks == 3
+    assert last_access_at is not None
+    assert click_counter.pending(short_url) == (0, None)
+    assert service.get_url_stats(short_url)[0] == 3
+
+
+def test_failed_flush_keeps_clicks(mock_repository: Repository):
+    click_counter = ClickCounter()
+    click_counter.record("tfg1", timestamp=10.0)
+    connection, mock_repository.connection = mock_repository.connection, None
+
+    with pytest.raises(Exception):
+        click_counter.flush(mock_repository)
+
+    mock_repository.connection = connection
+    assert click_counter.pending("tfg1") == (1, 10.0)
+
+
+def test_stats_for_unknown_code(mock_url_service: URLService):
+    with pytest.raises(URLNotFoundError):
+        mock_url_service.get_url_stats("NON_EXISTING")
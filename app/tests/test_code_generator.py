@@ -0,0 +1,77 @@
+from base62 import decode
+from fastapi.testclient import TestClient
+
+from app.api.deps.url_service_dependency import provide_url_service
+from app.api.views import app
+from app.data.db.models import URLPairModel
+from app.data.repository.repository import Repository
+from app.services.code_generator import CounterCodeGenerator, HashCodeGenerator
+from app.services.url_service import URLService
+
+
+def _occupy(repository: Repository, code: str, original_url: str = "https://occupied.com/"):
+    repository.insert_new_url_pair(URLPairModel(original_url=original_url, shortened_url_code=code))  # ty:ignore[invalid-argument-type]
+
+
+def test_hash_generator_resalts_deterministically(mock_repository: Repository):
+    generator = HashCodeGenerator(length=6)
+
+    first = generator.generate("https://google.com", mock_repository)
+    resalted = generator.generate("https://google.com", mock_repository, attempt=1)
+
+    assert len(first) <= 6
+    assert resalted != first
+    assert generator.generate("https://google.com", mock_repository, attempt=1) == resalted
+
+
+def test_hash_collision_is_resolved_by_resalting(mock_url_service: URLService, mock_repository: Repository):
+    colliding_code = mock_url_service._create_short_url("https://google.com")
+    _occupy(mock_repository, colliding_code)
+
+    short_url = mock_url_service.create_url_pair("https://google.com")
+
+    assert short_url == mock_url_service._create_short_url("https://google.com", attempt=1)
+    assert mock_url_service.get_original_url_from_short(short_url) == "https://google.com/"
+    assert mock_url_service.get_original_url_from_short(colliding_code) == "https://occupied.com/"
+    assert mock_url_service.create_url_pair("https://google.com") == short_url
+
+
+def test_batch_collisions_are_retried(mock_url_service: URLService, mock_repository: Repository):
+    _occupy(mock_repository, mock_url_service._create_short_url("https://example.com/1"))
+
+    codes = mock_url_service.create_url_pairs(["https://example.com/0", "https://example.com/1"])
+
+    assert None not in codes
+    assert mock_url_service.get_original_url_from_short(codes[1]) == "https://example.com/1"
+
+
+def test_counter_generator_hands_out_disjoint_blocks(mock_repository: Repository):
+    first, second = CounterCodeGenerator(block_size=10), CounterCodeGenerator(block_size=10)
+
+    first_codes = [first.generate("https://example.com", mock_repository) for _ in range(5)]
+    second_codes = [second.generate("https://example.com", mock_repository) for _ in range(5)]
+    first_codes += [first.generate("https://example.com", mock_repository) for _ in range(10)]
+
+    assert [decode(code) for code in first_codes] == [*range(1, 11), *range(21, 26)]
+    assert [decode(code) for code in second_codes] == list(range(11, 16))
+
+
+def test_counter_codes_skip_reserved_and_taken(mock_repository: Repository):
+    mock_repository.connection.execute(  # ty:ignore[possibly-missing-attribute]
+        "UPDATE code_sequence SET next_id = ?", (decode("all"),)
+    )
+    mock_repository.connection.commit()  # ty:ignore[possibly-missing-attribute]
+    service = URLService(mock_repository, code_generator=CounterCodeGenerator(block_size=5))
+    _occupy(mock_repository, "alm")  # Следующий номер после "all" и "alm" - "aln"
+
+    assert service.create_url_pair("https://google.com") == "aln"
+
+
+def test_exhausted_counter_codes_return_503(test_api_client: TestClient, mock_repository: Repository):
+    mock_repository.connection.execute("UPDATE code_sequence SET next_id = 62")  # ty:ignore[possibly-missing-attribute]
+    mock_repository.connection.commit()  # ty:ignore[possibly-missing-attribute]
+    service = URLService(mock_repository, code_generator=CounterCodeGenerator(length=1, block_size=5))
+    app.dependency_overrides[provide_url_service] = lambda: service  # Номер 62 - первый двухсимвольный код
+
+    assert test_api_client.post("/shorten", json={"url": "https://google.com"}).status_code == 503
+    assert test_api_client.post("/shorten/batch", json={"urls": ["https://google.com"]}).status_code == 503
@@ -0,0 +1,111 @@
+import asyncio
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import pytest
+
+from app.api.deps.url_service_dependency import provide_cache_coherence_watcher
+from app.data.db.pool import ConnectionPool
+from app.data.repository.bloom_filter import BloomFilter
+from app.data.repository.repository import Repository
+from app.data.repository.sharded_repository import ShardedRepository, shard_names
+from app.exc.db_exceptions import URLNotFoundError
+from app.services.cache import LRUCache
+from app.services.coherence import CacheCoherenceWatcher
+from app.services.url_service import URLService
+from app.settings import app_settings
+
+
+@pytest.fixture(params=[1, 2], ids=["one_file", "two_shards"])
+def workers(
+    request: pytest.FixtureRequest, tmp_path: Path
+) -> Iterator[Tuple[URLService, URLService, CacheCoherenceWatcher, CacheCoherenceWatcher]]:
+    """
+    Два "воркера" с общей базой (одним файлом или двумя шардами), но своими пулами, кэшами, фильтрами Блума
+    и наблюдателями. Фоновую проверку изменений тесты вызывают явно
+    """
+    names = shard_names(str(tmp_path / "workers.sqlite3"), request.param)
+    for name in names:
+        with Repository(name) as repo:
+            repo.initialize_database()
+
+    services: List[URLService] = []
+    watchers: List[CacheCoherenceWatcher] = []
+    for _ in range(2):
+        cache: LRUCache[str, Tuple[str, Optional[float]]] = LRUCache(max_size=100, ttl=300)
+        bloom_filter = BloomFilter(capacity=1000)
+        watcher = CacheCoherenceWatcher([Repository(name) for name in names], cache=cache, bloom_filter=bloom_filter)
+        watcher.start()
+        shards = [Repository(name, ConnectionPool(name), bloom_filter) for name in names]
+        repository = shards[0] if len(shards) == 1 else ShardedRepository(shards)
+        with repository.copy() as repo:
+            repo.rebuild_bloom_filter()
+        services.append(URLService(repository, cache=cache, coherence=watcher))
+        watchers.append(watcher)
+
+    yield services[0], services[1], watchers[0], watchers[1]
+
+    for service, watcher in zip(services, watchers):
+        watcher.close()
+        shards = service.repository.shards if isinstance(service.repository, ShardedRepository) else [service.repository]
+        for shard in shards:
+            assert shard.pool is not None
+            shard.pool.close()
+
+
+def test_delete_in_other_worker_invalidates_cache(workers: Tuple[URLService, URLService, CacheCoherenceWatcher, CacheCoherenceWatcher]):
+    first, second, first_watcher, _ = workers
+    with first._connection_scope():
+        short_url = first.create_url_pair("https://google.com")
+        assert first.get_original_url_from_short(short_url) == "https://google.com/"
+    assert first.cache is not None and first.cache.get(short_url) is not None
+
+    with second._connection_scope():
+        second.delete_url_pair_from_shorten_url(short_url)
+    first_watcher.sync()
+
+    with first._connection_scope(), pytest.raises(URLNotFoundError):
+        first.get_original_url_from_short(short_url)
+
+
+def test_insert_in_other_worker_is_added_to_bloom_filter(workers: Tuple[URLService, URLService, CacheCoherenceWatcher, CacheCoherenceWatcher]):
+    first, second, _, _ = workers
+
+    async def scenario() -> Tuple[str, str]:
+        short_url = await first.acreate_url_pair("https://google.com")
+        other_url = await first.acreate_url_pair("https://ya.ru")
+        # Фильтр второго воркера был построен до вставки, а фоновая проверка еще не запускалась:
+        # промах фильтра сам применяет журнал изменений, а не отвечает 404
+        found = await second.aget_original_url_from_short(short_url)
+        with second._connection_scope():
+            return found, second.get_original_url_from_short(other_url)
+
+    assert asyncio.run(scenario()) == ("https://google.com/", "https://ya.ru/")
+
+    with pytest.raises(URLNotFoundError):
+        asyncio.run(second.aget_original_url_from_short("missing"))
+
+
+def test_pruned_change_log_resets_local_state(workers: Tuple[URLService, URLService, CacheCoherenceWatcher, CacheCoherenceWatcher]):
+    first, second, first_watcher, _ = workers
+    assert first.cache is not None
+    first.cache.set("stale", ("https://example.com", None))
+
+    with second._connection_scope():
+        second.create_url_pair("https://google.com")
+        assert second.repository.prune_changes(float("inf")) == 1
+
+    first_watcher.sync()
+
+    assert first.cache.get("stale") is None
+    assert first.repository.bloom_filter is not None
+    assert first.repository.bloom_filter.needs_rebuild
+
+
+def test_watcher_is_created_only_for_several_workers(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(app_settings, "db_shards", 1)
+    for workers, expected in ((1, False), (2, True)):
+        monkeypatch.setattr(app_settings, "workers", workers)
+        provide_cache_coherence_watcher.cache_clear()
+        assert (provide_cache_coherence_watcher() is not None) == expected
+    provide_cache_coherence_watcher.cache_clear()
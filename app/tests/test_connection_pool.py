@@ -0,0 +1,99 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from app.data.db.models import URLPairModel
+from app.data.db.pool import ConnectionPool
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import ConnectionPoolExhaustedError
+from app.services.url_service import URLService
+
+
+def test_pool_reuses_connections(tmp_path: Path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite3"), max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert pool.stats()["created"] == 1
+    assert pool.stats()["checked_out"] == 0
+    pool.close()
+
+
+def test_pool_is_bounded(tmp_path: Path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite3"), max_size=1, timeout=0.01)
+
+    with pool.connection():
+        with pytest.raises(ConnectionPoolExhaustedError):
+            pool.acquire()
+    pool.close()
+
+
+def test_pool_replaces_broken_connections(tmp_path: Path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite3"), max_size=1)
+
+    connection = pool.acquire()
+    connection.close()
+    pool.release(connection)
+
+    with pool.connection() as fresh:
+        assert fresh is not connection
+        assert fresh.execute("SELECT 1").fetchone() == (1,)
+    pool.close()
+
+
+def test_repository_borrows_connection_from_pool(tmp_path: Path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite3"), max_size=1)
+    pair = URLPairModel(original_url="https://google.com", shortened_url_code="tfg1")  # ty:ignore[invalid-argument-type]
+
+    with Repository(pool.conn_str, pool) as repo:
+        repo.initialize_database()
+        repo.insert_new_url_pair(pair)
+        assert pool.stats()["checked_out"] == 1
+
+    assert pool.stats()["checked_out"] == 0
+    with Repository(pool.conn_str, pool) as repo:
+        assert repo.get_original_url_from_shortened("tfg1") == "https://google.com/"
+    pool.close()
+
+
+def test_pool_applies_pragmas(tmp_path: Path):
+    pool = ConnectionPool(
+        str(tmp_path / "pool.sqlite3"),
+        max_size=1,
+        pragmas={"journal_mode": "wal", "synchronous": "normal", "busy_timeout": 1234},
+    )
+
+    with pool.connection() as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert connection.execute("PRAGMA synchronous").fetchone() == (1,)
+        assert connection.execute("PRAGMA busy_timeout").fetchone() == (1234,)
+    pool.close()
+
+
+def test_pragmas_reject_injection(tmp_path: Path):
+    with pytest.raises(ValueError):
+        with Repository(str(tmp_path / "pool.sqlite3"), pragmas={"journal_mode": "wal; DROP TABLE urls"}):
+            pass
+
+
+def test_service_borrows_connection_per_call(tmp_path: Path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite3"), max_size=2, timeout=1)
+    with Repository(pool.conn_str, pool) as repo:
+        repo.initialize_database()
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service = URLService(Repository(pool.conn_str, pool), executor=executor)
+            codes = await asyncio.gather(*(service.acreate_url_pair(f"https://example.com/{i}") for i in range(20)))
+            urls = await asyncio.gather(*(service.aget_original_url_from_short(code) for code in codes))
+        return urls
+
+    assert asyncio.run(scenario()) == [f"https://example.com/{i}" for i in range(20)]
+    assert pool.stats()["checked_out"] == 0
+    pool.close()
@@ -0,0 +1,112 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.redirect_policy import build_redirect
+from app.data.db.models import URLPairModel
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import URLExpiredError
+from app.services.cache import LRUCache
+from app.services.url_service import URLService
+from app.settings import app_settings
+
+
+def _expired_pair(code: str = "tfg1") -> URLPairModel:
+    return URLPairModel(
+        original_url="https://google.com",  # ty:ignore[invalid-argument-type]
+        shortened_url_code=code,
+        expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+    )
+
+
+def test_repository_rejects_expired_links(mock_repository: Repository):
+    mock_repository.insert_new_url_pair(_expired_pair())
+
+    with pytest.raises(URLExpiredError):
+        mock_repository.get_original_url_from_shortened("tfg1")
+
+
+def test_repository_sweeps_expired_links_in_batches(mock_repository: Repository):
+    for i in range(5):
+        pair = _expired_pair(f"exp{i}")
+        pair.original_url = f"https://example.com/{i}"  # ty:ignore[invalid-assignment]
+        mock_repository.insert_new_url_pair(pair)
+    mock_repository.insert_new_url_pair(URLPairModel(original_url="https://ya.ru", shortened_url_code="live"))  # ty:ignore[invalid-argument-type]
+
+    assert len(mock_repository.delete_expired_pairs(limit=3)) == 3
+    assert len(mock_repository.delete_expired_pairs(limit=3)) == 2
+    assert mock_repository.delete_expired_pairs(limit=3) == []
+    assert mock_repository.get_original_url_from_shortened("live") == "https://ya.ru/"
+
+
+def test_reshortening_renews_expired_link(mock_repository: Repository):
+    mock_repository.insert_new_url_pair(_expired_pair())
+
+    assert mock_repository.insert_new_url_pair(URLPairModel(original_url="https://google.com", shortened_url_code="tfg1")) == "tfg1"  # ty:ignore[invalid-argument-type]
+    assert mock_repository.get_original_url_from_shortened("tfg1") == "https://google.com/"
+
+
+def test_reshortening_without_expiry_makes_link_permanent(mock_repository: Repository):
+    soon = datetime.now(timezone.utc) + timedelta(seconds=1)
+    campaign = URLPairModel(original_url="https://google.com", shortened_url_code="tfg1", expires_at=soon)  # ty:ignore[invalid-argument-type]
+    mock_repository.insert_new_url_pair(campaign)
+    mock_repository.insert_new_url_pairs([URLPairModel(original_url="https://ya.ru", shortened_url_code="tfg2", expires_at=soon)])  # ty:ignore[invalid-argument-type]
+
+    permanent = URLPairModel(original_url="https://google.com", shortened_url_code="other1")  # ty:ignore[invalid-argument-type]
+    assert mock_repository.insert_new_url_pair(permanent) == "tfg1"
+    assert mock_repository.get_original_url_and_expiry("tfg1")[1] is None
+    assert mock_repository.insert_new_url_pairs([URLPairModel(original_url="https://ya.ru", shortened_url_code="other2")]) == {"https://ya.ru/": "tfg2"}  # ty:ignore[invalid-argument-type]
+    assert mock_repository.get_original_url_and_expiry("tfg2")[1] is None
+
+
+def test_reshortening_with_expiry_keeps_later_expiry(mock_repository: Repository):
+    now = datetime.now(timezone.utc)
+    mock_repository.insert_new_url_pair(URLPairModel(original_url="https://google.com", shortened_url_code="tfg1"))  # ty:ignore[invalid-argument-type]
+    expiring = URLPairModel(original_url="https://google.com", shortened_url_code="other1", expires_at=now + timedelta(hours=1))  # ty:ignore[invalid-argument-type]
+    assert mock_repository.insert_new_url_pair(expiring) == "tfg1"
+    assert mock_repository.get_original_url_and_expiry("tfg1")[1] is None  # Бессрочная ссылка живет дольше запрошенной
+
+    mock_repository.insert_new_url_pair(URLPairModel(original_url="https://ya.ru", shortened_url_code="tfg2", expires_at=now + timedelta(hours=2)))  # ty:ignore[invalid-argument-type]
+    for hours in (1, 3):
+        pair = URLPairModel(original_url="https://ya.ru", shortened_url_code="other2", expires_at=now + timedelta(hours=hours))  # ty:ignore[invalid-argument-type]
+        assert mock_repository.insert_new_url_pair(pair) == "tfg2"
+    assert mock_repository.get_original_url_and_expiry("tfg2")[1] == pytest.approx((now + timedelta(hours=3)).timestamp())
+
+
+def test_cache_does_not_outlive_link(mock_repository: Repository):
+    cache: LRUCache[str, Tuple[str, Optional[float]]] = LRUCache(max_size=10, ttl=60)
+    service = URLService(mock_repository, cache=cache)
+    short_url = service.create_url_pair("https://google.com", datetime.now(timezone.utc) + timedelta(milliseconds=50))
+
+    assert service.get_original_url_from_short(short_url) == "https://google.com/"
+    assert cache.get(short_url) is not None
+
+    mock_repository.connection.execute("UPDATE urls SET expires_at = 0")  # ty:ignore[possibly-missing-attribute]
+    time.sleep(0.06)
+    with pytest.raises(URLExpiredError):
+        service.get_original_url_from_short(short_url)
+
+
+def test_endpoint_returns_gone_for_expired_links(test_api_client: TestClient, mock_repository: Repository):
+    mock_repository.insert_new_url_pair(_expired_pair())
+
+    resp = test_api_client.get("/tfg1", follow_redirects=False)
+    assert resp.status_code == 410
+
+    past = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    assert test_api_client.post("/shorten", json={"url": "https://ya.ru", "expires_at": past}).status_code == 422
+
+    future = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    assert test_api_client.post("/shorten", json={"url": "https://ya.ru", "expires_at": future}).status_code == 201
+
+
+def test_redirect_is_not_cached_past_link_expiry(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(app_settings, "redirect_cache_max_age", 86400)
+    now = time.time()
+    _, headers = build_redirect("https://google.com/", now + 60.5, None, now)
+    assert dict(headers)["cache-control"] == "public, max-age=60"
+    _, headers = build_redirect("https://google.com/", now + 0.5, None, now)
+    assert dict(headers)["cache-control"] == "no-cache"
@@ -0,0 +1,59 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps.url_service_dependency import provide_connection_pool
+from app.api.views import app
+from app.settings import app_settings
+
+
+@pytest.fixture
+def live_client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    monkeypatch.setattr(app_settings, "db_name", str(tmp_path / "fast.sqlite3"))
+    provide_connection_pool.cache_clear()
+    with TestClient(app) as client:
+        yield client
+    provide_connection_pool.cache_clear()
+
+
+def test_fast_path_serves_redirect(live_client: TestClient):
+    short_code = live_client.post("/shorten", json={"url": "https://google.com/путь"}).json()["short_code"]
+
+    resp = live_client.get(f"/{short_code}", follow_redirects=False)
+    assert resp.status_code == 303
+    assert resp.headers["location"] == "https://google.com/%D0%BF%D1%83%D1%82%D1%8C"
+    assert resp.content == b""
+    assert live_client.get(f"/stats/{short_code}").json()["clicks"] == 1
+    assert 'route="/{code}",status="303"' in live_client.get("/metrics").text
+
+
+def test_fast_path_falls_through_to_routes(live_client: TestClient):
+    assert live_client.get("/all").status_code == 200
+    assert live_client.get("/metrics").status_code == 200
+
+    resp = live_client.get("/abc123")
+    assert resp.status_code == 404
+    assert resp.json() == {"detail": "Не найдено оригинальной ссылки для данного сокращения!"}
+    assert live_client.get("/not-a-code").status_code == 404
+
+
+def test_fast_path_applies_redirect_policy(live_client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(app_settings, "redirect_status", 308)
+    monkeypatch.setattr(app_settings, "redirect_cache_max_age", 3600)
+    short_code = live_client.post("/shorten", json={"url": "https://google.com"}).json()["short_code"]
+
+    resp = live_client.get(f"/{short_code}", follow_redirects=False)
+    assert resp.status_code == 308
+    assert resp.headers["cache-control"] == "public, max-age=3600"
+    assert "expires" in resp.headers
+
+    not_modified = live_client.get(f"/{short_code}", headers={"If-None-Match": resp.headers["etag"]}, follow_redirects=False)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == resp.headers["etag"]
+
+    head = live_client.head(f"/{short_code}", follow_redirects=False)
+    assert head.status_code == 308
+    assert head.headers["location"] == "https://google.com/"
+    assert live_client.get(f"/stats/{short_code}").json()["clicks"] == 2  # HEAD не считается переходом
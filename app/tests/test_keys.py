@@ -0,0 +1,33 @@
+import pytest
+
+from app.data.db.keys import code_to_key, key_to_code, url_hash
+from app.data.repository.repository import Repository
+from app.services.code_generator import CounterCodeGenerator
+from app.services.url_service import URLService
+
+
+@pytest.mark.parametrize("code", ["0", "a", "0a", "00a", "zzzzzzzzzz", "0000000000", "tfg1"])
+def test_code_key_round_trip(code: str):
+    key = code_to_key(code)
+
+    assert key is not None and key < 2**63
+    assert key_to_code(key) == code
+
+
+def test_invalid_codes_have_no_key():
+    assert code_to_key("") is None
+    assert code_to_key("NON_EXISTING") is None
+    assert code_to_key("a" * 11) is None
+    assert code_to_key("0a") != code_to_key("a")
+
+
+def test_original_urls_are_deduplicated_by_hash(mock_repository: Repository):
+    service = URLService(mock_repository, code_generator=CounterCodeGenerator())
+
+    first = service.create_url_pair("https://google.com")
+
+    assert service.create_url_pair("https://google.com") == first
+    assert service.create_url_pairs(["https://google.com", "https://ya.ru"])[0] == first
+    assert mock_repository.connection.execute(  # ty:ignore[possibly-missing-attribute]
+        "SELECT COUNT(*) FROM urls WHERE url_hash = ?", (url_hash("https://google.com/"),)
+    ).fetchone() == (1,)
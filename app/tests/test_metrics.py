@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+
+from app.metrics import Histogram, MetricsRegistry, request_phases, timed_phase
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    cumulative, total_sum, count = histogram.snapshot()
+    assert cumulative == [1, 2, 3]
+    assert count == 3
+    assert total_sum == 5.55
+
+
+def test_timed_phase_accumulates_request_phases():
+    phases = {}
+    token = request_phases.set(phases)
+    with timed_phase("db"):
+        pass
+    with timed_phase("db"):
+        pass
+    request_phases.reset(token)
+
+    assert set(phases) == {"db"}
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.observe_request("GET", "/{code}", 303, 0.002)
+
+    text = registry.render({"redirect_cache": {"hits": 3}})
+    assert 'http_request_duration_seconds_count{method="GET",route="/{code}",status="303"} 1' in text
+    assert "redirect_cache_hits 3" in text
+
+
+def test_server_timing_and_metrics_endpoint(test_api_client: TestClient):
+    short_code = test_api_client.post("/shorten", json={"url": "https://google.com"}).json()["short_code"]
+    resp = test_api_client.get(f"/{short_code}", follow_redirects=False)
+
+    assert "db;dur=" in resp.headers["server-timing"]
+    assert "app;dur=" in resp.headers["server-timing"]
+
+    metrics = test_api_client.get("/metrics")
+    assert metrics.status_code == 200
+    assert 'route="/{code}",status="303"' in metrics.text
+    assert 'phase_duration_seconds_count{phase="hash"}' in metrics.text
+    assert "db_pool_max_size" in metrics.text
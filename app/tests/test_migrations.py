@@ -0,0 +1,77 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps.url_service_dependency import provide_connection_pool
+from app.api.views import app
+from app.data.db.keys import code_to_key
+from app.data.db.migrations import MIGRATIONS, apply_migrations, get_schema_version
+from app.settings import app_settings
+
+
+def test_migrations_on_fresh_database():
+    connection = sqlite3.connect(":memory:")
+
+    assert apply_migrations(connection) == len(MIGRATIONS)
+    assert get_schema_version(connection) == len(MIGRATIONS)
+    assert apply_migrations(connection) == len(MIGRATIONS)  # Повторный запуск ничего не делает
+
+
+def test_migrations_upgrade_legacy_database():
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        """
+        CREATE TABLE urls
+        (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_url TEXT UNIQUE,
+            shortened_url VARCHAR(5) UNIQUE
+        );
+        """
+    )
+    connection.execute("INSERT INTO urls (original_url, shortened_url) VALUES ('https://google.com/', 'tfg1')")
+    connection.commit()
+
+    apply_migrations(connection)
+
+    assert connection.execute("SELECT original_url FROM urls WHERE id = ?", (code_to_key("tfg1"),)).fetchone() == ("https://google.com/",)
+
+
+
+def test_migrations_refuse_codes_without_integer_keys():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE urls (id INTEGER PRIMARY KEY AUTOINCREMENT, original_url TEXT UNIQUE, shortened_url VARCHAR(5) UNIQUE)")
+    connection.executemany(
+        "INSERT INTO urls (original_url, shortened_url) VALUES (?, ?)",
+        [("https://google.com/", "tfg1"), ("https://ya.ru/", "ya-ru")],
+    )
+    connection.commit()
+
+    with pytest.raises(ValueError, match="'ya-ru'"):
+        apply_migrations(connection)
+    # Миграция откатилась целиком: ссылки остались под своими кодами
+    assert connection.execute("SELECT shortened_url FROM urls ORDER BY id").fetchall() == [("tfg1",), ("ya-ru",)]
+
+    connection.execute("DELETE FROM urls WHERE shortened_url = 'ya-ru'")
+    connection.commit()
+    assert apply_migrations(connection) == len(MIGRATIONS)
+    assert connection.execute("SELECT original_url FROM urls WHERE id = ?", (code_to_key("tfg1"),)).fetchone() == ("https://google.com/",)
+
+@pytest.fixture
+def database_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    db_name = str(tmp_path / "lifespan.sqlite3")
+    monkeypatch.setattr(app_settings, "db_name", db_name)
+    provide_connection_pool.cache_clear()
+    yield db_name
+    provide_connection_pool.cache_clear()
+
+
+def test_lifespan_initializes_schema_once(database_file: str):
+    with TestClient(app) as client:
+        resp = client.post("/shorten", json={"url": "https://google.com"})
+        assert resp.status_code == 201
+
+    connection = sqlite3.connect(database_file)
+    assert get_schema_version(connection) == len(MIGRATIONS)
@@ -29,4 +29,18 @@ def test_repository_get_all_pairs(mock_repository: Repository):
      mock_repository.insert_new_url_pair(pair_2)
 
      pairs = mock_repository.get_all_pairs()
-     assert len(pairs) == 2
\ No newline at end of file
+     assert len(pairs) == 2
+
+
+def test_repository_insert_urlpairs_in_bulk(mock_repository: Repository):
+    pair: URLPairModel = URLPairModel(original_url="https://google.com", shortened_url_code="tfg1")  # ty:ignore[invalid-argument-type]
+    mock_repository.insert_new_url_pair(pair)
+
+    pairs = [
+        URLPairModel(original_url="https://google.com", shortened_url_code="other"),  # ty:ignore[invalid-argument-type]
+        URLPairModel(original_url="https://ya.ru", shortened_url_code="tfg2"),  # ty:ignore[invalid-argument-type]
+        URLPairModel(original_url="https://collision.com", shortened_url_code="tfg2"),  # ty:ignore[invalid-argument-type]
+    ]
+    codes = mock_repository.insert_new_url_pairs(pairs)
+
+    assert codes == {"https://google.com/": "tfg1", "https://ya.ru/": "tfg2"}
@@ -0,0 +1,196 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from app.data.db.keys import code_to_key, shard_for_code
+from app.data.db.models import URLPairModel
+from app.data.repository.bloom_filter import BloomFilter
+from app.data.repository.repository import Repository
+from app.data.repository.sharded_repository import ShardedRepository, reshard, shard_names
+from app.exc.db_exceptions import ShortCodeCollisionError, URLNotFoundError
+from app.services.url_service import URLService
+
+
+def make_pairs(count: int):
+    return [
+        URLPairModel(original_url=f"https://example.com/{i}", shortened_url_code=f"c{i}")  # ty:ignore[invalid-argument-type]
+        for i in range(count)
+    ]
+
+
+def shard_keys(db_name: str, shards: int):
+    keys = []
+    for name in shard_names(db_name, shards):
+        with sqlite3.connect(name) as connection:
+            keys.append({key for (key,) in connection.execute("SELECT id FROM urls")})
+    return keys
+
+
+@pytest.fixture
+def db_name(tmp_path: Path) -> str:
+    return str(tmp_path / "links.sqlite3")
+
+
+@pytest.fixture
+def sharded_repository(db_name: str):
+    bloom_filter = BloomFilter(capacity=1000)
+    repository = ShardedRepository([Repository(name, bloom_filter=bloom_filter) for name in shard_names(db_name, 3)])
+    repository.initialize_database()
+    return repository
+
+
+@pytest.fixture
+def indexed_repository(db_name: str):
+    bloom_filter = BloomFilter(capacity=1000)
+    repository = ShardedRepository(
+        [Repository(name, bloom_filter=bloom_filter) for name in shard_names(db_name, 3)], url_index=True
+    )
+    repository.initialize_database()
+    return repository
+
+
+def test_shard_names():
+    assert shard_names("data/links.sqlite3", 3) == [
+        "data/links.sqlite3",
+        "data/links.shard1.sqlite3",
+        "data/links.shard2.sqlite3",
+    ]
+
+
+def test_pairs_are_stored_in_their_shards(sharded_repository: ShardedRepository, db_name: str):
+    pairs = make_pairs(30)
+    codes = sharded_repository.insert_new_url_pairs(pairs[:20])
+    for pair in pairs[20:]:
+        assert sharded_repository.insert_new_url_pair(pair) is None
+    assert len(codes) == 20
+
+    keys = shard_keys(db_name, 3)
+    assert all(keys)
+    for pair in pairs:
+        assert code_to_key(pair.shortened_url_code) in keys[shard_for_code(pair.shortened_url_code, 3)]
+        assert sharded_repository.get_original_url_from_shortened(pair.shortened_url_code) == str(pair.original_url)
+
+    sharded_repository.delete_url_pair("c1")
+    with pytest.raises(URLNotFoundError):
+        sharded_repository.get_original_url_from_shortened("c1")
+
+
+def test_existing_url_is_found_in_another_shard(indexed_repository: ShardedRepository):
+    pair = make_pairs(1)[0]
+    indexed_repository.insert_new_url_pair(pair)
+    other_code = next(f"x{i}" for i in range(10) if shard_for_code(f"x{i}", 3) != shard_for_code("c0", 3))
+    again = URLPairModel(original_url=pair.original_url, shortened_url_code=other_code)
+
+    assert indexed_repository.insert_new_url_pair(again) == "c0"
+    assert indexed_repository.insert_new_url_pairs([again]) == {"https://example.com/0": "c0"}
+    assert len(indexed_repository.get_all_pairs()) == 1
+
+
+@pytest.mark.parametrize("url_index, max_shards", [(False, 1), (True, 2)])
+def test_insert_touches_few_shards(db_name: str, monkeypatch: pytest.MonkeyPatch, url_index: bool, max_shards: int):
+    repository = ShardedRepository([Repository(name) for name in shard_names(db_name, 8)], url_index=url_index)
+    repository.initialize_database()
+    opened = []
+    shard = ShardedRepository._shard
+
+    def tracking_shard(self: ShardedRepository, index: int):
+        opened.append(index)
+        return shard(self, index)
+
+    monkeypatch.setattr(ShardedRepository, "_shard", tracking_shard)
+    for pair in make_pairs(20) * 2:
+        opened.clear()
+        repository.insert_new_url_pair(pair)
+        assert len(set(opened)) <= max_shards
+        assert shard_for_code(pair.shortened_url_code, 8) in opened
+
+
+def test_hash_codes_are_deduplicated_in_their_shard(sharded_repository: ShardedRepository, db_name: str):
+    service = URLService(sharded_repository)
+    codes = [service.create_url_pair(f"https://example.com/{i}") for i in range(20)]
+
+    assert [service.create_url_pair(f"https://example.com/{i}") for i in range(20)] == codes
+    assert service.create_url_pairs([f"https://example.com/{i}" for i in range(20)]) == codes
+    assert len(sharded_repository.get_all_pairs()) == 20
+    for name in shard_names(db_name, 3):
+        with sqlite3.connect(name) as connection:
+            assert connection.execute("SELECT COUNT(*) FROM url_index").fetchone()[0] == 0
+
+
+def test_collision_releases_url_claim(indexed_repository: ShardedRepository):
+    indexed_repository.insert_new_url_pair(make_pairs(1)[0])
+    other = URLPairModel(original_url="https://example.com/other", shortened_url_code="c0")  # ty:ignore[invalid-argument-type]
+
+    with pytest.raises(ShortCodeCollisionError):
+        indexed_repository.insert_new_url_pair(other)
+    assert indexed_repository.insert_new_url_pairs([other]) == {}
+
+    # Закрепление снято, поэтому URL получает новый код, а не занятый чужим
+    retried = other.model_copy(update={"shortened_url_code": "c1"})
+    assert indexed_repository.insert_new_url_pair(retried) is None
+    assert indexed_repository.get_original_url_from_shortened("c1") == "https://example.com/other"
+
+
+def test_deleted_pairs_leave_no_url_index_entries(indexed_repository: ShardedRepository, db_name: str):
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    pairs = make_pairs(10)
+    indexed_repository.insert_new_url_pairs([pair.model_copy(update={"expires_at": expired}) for pair in pairs[:5]])
+    indexed_repository.insert_new_url_pairs(pairs[5:])
+
+    indexed_repository.delete_url_pair("c5")
+    assert sorted(indexed_repository.delete_expired_pairs()) == [f"c{i}" for i in range(5)]
+
+    indexed = set()
+    for name in shard_names(db_name, 3):
+        with sqlite3.connect(name) as connection:
+            indexed.update(url for (url,) in connection.execute("SELECT original_url FROM url_index"))
+    assert indexed == {f"https://example.com/{i}" for i in range(6, 10)}
+
+    # Удаленный URL сокращается заново под новым кодом
+    assert indexed_repository.insert_new_url_pair(pairs[5].model_copy(update={"shortened_url_code": "x1"})) is None
+    assert indexed_repository.get_original_url_from_shortened("x1") == "https://example.com/5"
+
+
+def test_url_index_is_built_for_existing_shards(db_name: str):
+    names = shard_names(db_name, 3)
+    unindexed = ShardedRepository([Repository(name) for name in names])
+    unindexed.initialize_database()
+    unindexed.insert_new_url_pairs(make_pairs(30))
+
+    repository = ShardedRepository([Repository(name) for name in names], url_index=True)
+    repository.initialize_database()
+
+    again = [pair.model_copy(update={"shortened_url_code": f"x{i}"}) for i, pair in enumerate(make_pairs(30))]
+    assert repository.insert_new_url_pairs(again) == {f"https://example.com/{i}": f"c{i}" for i in range(30)}
+    assert len(repository.get_all_pairs()) == 30
+
+
+def test_pages_are_merged_across_shards(sharded_repository: ShardedRepository):
+    sharded_repository.insert_new_url_pairs(make_pairs(50))
+    rows = list(sharded_repository.iter_pairs(batch_size=7))
+    assert [row[0] for row in rows] == sorted(code_to_key(f"c{i}") for i in range(50))
+
+    service = URLService(sharded_repository)
+    assert sorted(code for _, _, code in service.iter_url_pairs()) == sorted(f"c{i}" for i in range(50))
+
+
+def test_reshard_moves_pairs_to_new_shards(sharded_repository: ShardedRepository, db_name: str):
+    sharded_repository.insert_new_url_pairs(make_pairs(100))
+    all_keys = set().union(*shard_keys(db_name, 3))
+
+    for to_shards in (5, 2):
+        reshard(db_name, 3 if to_shards == 5 else 5, to_shards, batch_size=7)
+        keys = shard_keys(db_name, to_shards)
+        assert set().union(*keys) == all_keys
+        for index, shard in enumerate(keys):
+            assert all(key % to_shards == index for key in shard)
+
+    assert reshard(db_name, 2, 2, url_index=True) == 0
+    assert not any(shard_keys(db_name, 5)[2:])
+
+    # Индекс URL перестроен под новое количество шардов: повторное сокращение находит старые коды
+    repository = ShardedRepository([Repository(name) for name in shard_names(db_name, 2)], url_index=True)
+    again = [pair.model_copy(update={"shortened_url_code": f"x{i}"}) for i, pair in enumerate(make_pairs(100))]
+    assert repository.insert_new_url_pairs(again) == {f"https://example.com/{i}": f"c{i}" for i in range(100)}
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.data.repository.repository import Repository
+from app.services.single_flight import SingleFlight
+from app.services.url_service import URLService
+
+
+def test_concurrent_calls_share_one_execution():
+    single_flight: SingleFlight[str, int] = SingleFlight()
+    calls = 0
+
+    async def work() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def scenario():
+        same = await asyncio.gather(*(single_flight.do("a", work) for _ in range(10)))
+        other = await single_flight.do("b", work)
+        return same, other
+
+    same, other = asyncio.run(scenario())
+    assert same == [1] * 10
+    assert other == 2
+    assert single_flight.stats() == {"in_flight": 0, "shared": 9}
+
+
+def test_errors_and_cancellation():
+    single_flight: SingleFlight[str, int] = SingleFlight()
+
+    async def fail() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError()
+
+    async def slow() -> int:
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def scenario():
+        results = await asyncio.gather(*(single_flight.do("a", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+        leader = asyncio.ensure_future(single_flight.do("b", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do("b", slow))
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == 42
+
+
+def test_service_coalesces_concurrent_shortens(mock_repository: Repository, monkeypatch: pytest.MonkeyPatch):
+    service = URLService(mock_repository, single_flight=SingleFlight())
+    inserts = 0
+    insert = mock_repository.insert_new_url_pair
+
+    def counting_insert(pair):
+        nonlocal inserts
+        inserts += 1
+        return insert(pair)
+
+    monkeypatch.setattr(mock_repository, "insert_new_url_pair", counting_insert)
+
+    async def scenario():
+        return await asyncio.gather(*(service.acreate_url_pair("https://google.com/") for _ in range(20)))
+
+    codes = asyncio.run(scenario())
+    assert len(set(codes)) == 1
+    assert inserts == 1
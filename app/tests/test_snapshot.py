@@ -0,0 +1,104 @@
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps.url_service_dependency import provide_shared_url_service
+from app.api.views import app
+from app.data.db.keys import code_to_key
+from app.data.db.models import URLPairModel
+from app.data.db.snapshot import Snapshot, write_snapshot
+from app.data.repository.repository import Repository
+from app.data.repository.snapshot_repository import SnapshotRepository, export_snapshot
+from app.exc.db_exceptions import ReadOnlyRepositoryError, URLExpiredError, URLNotFoundError
+from app.services.url_service import URLService
+from app.settings import app_settings
+
+
+def make_rows(count: int):
+    return sorted((code_to_key(f"c{i}"), f"https://example.com/{i}/путь", None) for i in range(count))
+
+
+def test_snapshot_lookups_and_pages(tmp_path: Path):
+    path = str(tmp_path / "redirects.snapshot")
+    rows = make_rows(100)
+    assert write_snapshot(rows, path) == 100
+
+    snapshot = Snapshot(path)
+    assert len(snapshot) == 100
+    assert snapshot.find(code_to_key("c42")) == ("https://example.com/42/путь", None)
+    assert snapshot.find(code_to_key("nope")) is None
+    assert [row[0] for row in snapshot.page(rows[9][0], 5)] == [row[0] for row in rows[10:15]]
+    assert snapshot.page(rows[-1][0], 5) == []
+
+
+def test_snapshot_rejects_bad_input(tmp_path: Path):
+    path = tmp_path / "redirects.snapshot"
+    with pytest.raises(ValueError):
+        write_snapshot([(2, "https://a.com", None), (1, "https://b.com", None)], str(path))
+    assert list(tmp_path.iterdir()) == []
+
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_export_skips_expired_links(tmp_path: Path):
+    path = str(tmp_path / "redirects.snapshot")
+    repository = Repository(str(tmp_path / "links.sqlite3"))
+    with repository:
+        repository.initialize_database()
+        repository.insert_new_url_pairs(
+            [URLPairModel(original_url=f"https://example.com/{i}", shortened_url_code=f"c{i}") for i in range(30)]  # ty:ignore[invalid-argument-type]
+        )
+        repository.connection.execute("UPDATE urls SET expires_at = ? WHERE id = ?", (time.time() - 1, code_to_key("c3")))  # ty:ignore[possibly-missing-attribute]
+        repository.connection.commit()  # ty:ignore[possibly-missing-attribute]
+    assert export_snapshot(repository, path, batch_size=7) == 29
+
+    snapshot_repository = SnapshotRepository(path)
+    assert snapshot_repository.get_original_url_from_shortened("c1") == "https://example.com/1"
+    with pytest.raises(URLNotFoundError):
+        snapshot_repository.get_original_url_from_shortened("c3")
+    assert len(list(snapshot_repository.iter_pairs(batch_size=4))) == 29
+
+
+def test_snapshot_repository_hot_swaps_and_is_read_only(tmp_path: Path):
+    path = str(tmp_path / "redirects.snapshot")
+    write_snapshot(make_rows(3), path)
+    repository = SnapshotRepository(path, check_interval=0)
+    service = URLService(repository)
+    assert service.get_original_url_from_short("c1") == "https://example.com/1/путь"
+
+    write_snapshot([(code_to_key("c1"), "https://example.com/new", time.time() - 1)], path)
+    os.utime(path, ns=(0, time.time_ns() + 10**9))  # Гарантирует новую подпись файла даже при грубых отметках времени
+    with pytest.raises(URLExpiredError):
+        service.get_original_url_from_short("c1")
+    with pytest.raises(URLNotFoundError):
+        service.get_original_url_from_short("c2")
+    with pytest.raises(ReadOnlyRepositoryError):
+        service.create_url_pair("https://example.com/other")
+
+
+@pytest.fixture
+def replica_client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    path = str(tmp_path / "redirects.snapshot")
+    write_snapshot(make_rows(5), path)
+    monkeypatch.setattr(app_settings, "snapshot_path", path)
+    provide_shared_url_service.cache_clear()
+    with TestClient(app) as client:
+        yield client
+
+
+def test_replica_serves_redirects_only(replica_client: TestClient):
+    resp = replica_client.get("/c1", follow_redirects=False)
+    assert resp.status_code == 303
+    assert resp.headers["location"] == "https://example.com/1/%D0%BF%D1%83%D1%82%D1%8C"
+    assert replica_client.get("/zzz").status_code == 404
+    assert len(replica_client.get("/all").json()) == 5
+
+    assert replica_client.post("/shorten", json={"url": "https://google.com"}).status_code == 405
+    assert replica_client.delete("/delete-pair/c1").status_code == 405
+    assert replica_client.get("/stats/c1").status_code == 405
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import nullcontext as does_not_raise
 import pytest
 from app.services.url_service import URLService
@@ -64,4 +65,17 @@ def test_service_give_all_pairs(mock_url_service: URLService):
     mock_url_service.create_url_pair("https://ya.ru")
 
     pairs = mock_url_service.get_all_url_pairs_from_db()
-    assert len(pairs) == 2
\ No newline at end of file
+    assert len(pairs) == 2
+
+
+def test_service_async_methods(mock_url_service: URLService):
+    async def scenario():
+        short_url = await mock_url_service.acreate_url_pair("https://google.com")
+        assert await mock_url_service.aget_original_url_from_short(short_url) == "https://google.com/"
+        assert len(await mock_url_service.aget_all_url_pairs_from_db()) == 1
+
+        await mock_url_service.adelete_url_pair_from_shorten_url(short_url)
+        with pytest.raises(URLNotFoundError):
+            await mock_url_service.aget_original_url_from_short(short_url)
+
+    asyncio.run(scenario())
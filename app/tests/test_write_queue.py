@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.data.repository.repository import Repository
+from app.services.url_service import URLService
+from app.services.write_queue import GroupCommitWriter
+
+
+def test_concurrent_submits_are_written_in_batches():
+    batches = []
+
+    async def flush(items):
+        batches.append([url for url, _ in items])
+        return [f"code-{url}" for url, _ in items]
+
+    writer = GroupCommitWriter(flush, max_batch_size=4, max_delay=0.05)
+
+    async def scenario():
+        codes = await asyncio.gather(*(writer.submit(str(i)) for i in range(10)))
+        await writer.close()
+        return codes
+
+    codes = asyncio.run(scenario())
+    assert codes == [f"code-{i}" for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert writer.stats() == {"queued": 0, "batches": 3, "items": 10}
+
+
+def test_flush_error_is_raised_for_every_caller():
+    async def flush(items):
+        raise ValueError()
+
+    writer = GroupCommitWriter(flush, max_batch_size=10, max_delay=0.01)
+
+    async def scenario():
+        results = await asyncio.gather(*(writer.submit(str(i)) for i in range(3)), return_exceptions=True)
+        await writer.close()
+        return results
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(scenario()))
+
+
+
+def test_close_finishes_batch_being_written():
+    writing = asyncio.Event()
+
+    async def flush(items):
+        writing.set()
+        await asyncio.sleep(0.05)
+        return [f"code-{url}" for url, _ in items]
+
+    writer = GroupCommitWriter(flush, max_batch_size=2, max_delay=0.001)
+
+    async def scenario():
+        submits = [asyncio.ensure_future(writer.submit(str(i))) for i in range(5)]
+        await writing.wait()
+        await writer.close()  # Первая пачка еще пишется
+        return [submit.result() for submit in submits]
+
+    assert asyncio.run(scenario()) == [f"code-{i}" for i in range(5)]
+    assert writer.stats() == {"queued": 0, "batches": 3, "items": 5}
+
+def test_service_commits_shortens_in_one_transaction(mock_repository: Repository, monkeypatch: pytest.MonkeyPatch):
+    service = URLService(mock_repository)
+    service.write_queue = GroupCommitWriter(
+        lambda items: service.acreate_url_pairs([url for url, _ in items], [expiry for _, expiry in items]),
+        max_batch_size=100,
+        max_delay=0.05,
+    )
+    batch_inserts = 0
+    insert_batch = mock_repository.insert_new_url_pairs
+
+    def counting_insert_batch(pairs):
+        nonlocal batch_inserts
+        batch_inserts += 1
+        return insert_batch(pairs)
+
+    monkeypatch.setattr(mock_repository, "insert_new_url_pairs", counting_insert_batch)
+    urls = [f"https://example.com/{i}" for i in range(20)]
+
+    async def scenario():
+        codes = await asyncio.gather(*(service.acreate_url_pair(url) for url in urls))
+        await service.write_queue.close()
+        return codes
+
+    codes = asyncio.run(scenario())
+    assert batch_inserts == 1
+    assert [service.get_original_url_from_short(code) for code in codes] == urls
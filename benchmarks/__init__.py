@@ -0,0 +1,3 @@
+"""
+Бенчмарки сократителя ссылок. Запускаются отдельно от тестов, например: ``uv run python -m benchmarks.bench_pragmas``
+"""
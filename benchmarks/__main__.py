@@ -0,0 +1,16 @@
+"""
+Запускает все бенчмарки с параметрами по умолчанию: ``uv run python -m benchmarks``
+"""
+
+import sys
+
+from loguru import logger
+
+from . import bench_api, bench_pragmas, bench_repository, bench_service, bench_shards, bench_storage
+
+logger.remove()
+logger.add(sys.stderr, level="WARNING")
+
+for benchmark in (bench_service, bench_repository, bench_storage, bench_pragmas, bench_shards, bench_api):
+    sys.argv = [benchmark.__name__]
+    benchmark.main()
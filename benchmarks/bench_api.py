@@ -0,0 +1,134 @@
+"""
+Нагрузочный тест API внутри процесса: конкурентные клиенты шлют запросы в FastAPI-приложение через ASGI,
+без сети, поверх временной базы. Считает p50/p95/p99 и запросы в секунду для каждого сценария.
+Сценарии редиректа выполняются дважды: через маршрут FastAPI и через быстрый путь `FastRedirectMiddleware`,
+сокращение - отдельными транзакциями и через очередь групповой записи.
+
+Запуск: ``uv run python -m benchmarks.bench_api --requests 5000 --concurrency 50``
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from app.api import views
+from app.api.deps import url_service_dependency as deps
+from app.settings import app_settings
+
+from .common import latency_summary, report, temp_database
+
+type Scenario = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, float]:
+    """
+    Выполняет `requests` запросов сценария `scenario`, держа одновременно не больше `concurrency` запросов в полете
+    """
+    latencies: List[float] = []
+    next_request = iter(range(requests))
+
+    async def worker():
+        for index in next_request:
+            started = time.perf_counter()
+            response = await scenario(client, index)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                raise RuntimeError(f"Server error {response.status_code}: {response.text}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def run(requests: int, concurrency: int) -> List[Dict[str, object]]:
+    with temp_database() as db_name:
+        app_settings.db_name = db_name
+        for provider in (
+            deps.provide_connection_pool,
+            deps.provide_connection_pools,
+            deps.provide_db_executor,
+            deps.provide_url_cache,
+            deps.provide_bloom_filter,
+            deps.provide_cache_coherence_watcher,
+            deps.provide_shared_url_service,
+            deps.provide_write_queue,
+        ):
+            provider.cache_clear()
+
+        async with views.app.router.lifespan_context(views.app):
+            transport = httpx.ASGITransport(app=views.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                codes: List[str] = []
+
+                async def shorten(client: httpx.AsyncClient, index: int) -> httpx.Response:
+                    response = await client.post("/shorten", json={"url": f"https://example.com/{index}"})
+                    codes.append(response.json()["short_code"])
+                    return response
+
+                async def shorten_batched(client: httpx.AsyncClient, index: int) -> httpx.Response:
+                    return await client.post("/shorten", json={"url": f"https://example.com/batched/{index}"})
+
+                async def shorten_same(client: httpx.AsyncClient, index: int) -> httpx.Response:
+                    return await client.post("/shorten", json={"url": f"https://example.com/popular/{index // 100}"})
+
+                async def redirect(client: httpx.AsyncClient, index: int) -> httpx.Response:
+                    return await client.get(f"/{random.choice(codes)}")
+
+                async def hot_redirect(client: httpx.AsyncClient, index: int) -> httpx.Response:
+                    return await client.get(f"/{codes[index % 10]}")
+
+                async def missing(client: httpx.AsyncClient, index: int) -> httpx.Response:
+                    return await client.get(f"/miss{index}")
+
+                results = [
+                    {"scenario": "POST /shorten", **await run_scenario(client, shorten, requests, concurrency)},
+                    {
+                        "scenario": "POST /shorten popular",
+                        **await run_scenario(client, shorten_same, requests, concurrency),
+                    },
+                ]
+                # Очередь создается лениво, поэтому ее можно включить на работающем приложении; закроет ее lifespan
+                app_settings.write_batch_size = max(app_settings.write_batch_size, concurrency)
+                deps.provide_write_queue.cache_clear()
+                deps.provide_shared_url_service.cache_clear()
+                results.append(
+                    {
+                        "scenario": "POST /shorten, group commit",
+                        **await run_scenario(client, shorten_batched, requests, concurrency),
+                    }
+                )
+                for fast_redirect, suffix in ((False, ""), (True, ", fast path")):
+                    app_settings.fast_redirect = fast_redirect
+                    for name, scenario in (
+                        ("GET /{code} uniform", redirect),
+                        ("GET /{code} hot", hot_redirect),
+                        ("GET /{code} missing", missing),
+                    ):
+                        results.append(
+                            {"scenario": name + suffix, **await run_scenario(client, scenario, requests, concurrency)}
+                        )
+                return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="Количество запросов в каждом сценарии")
+    parser.add_argument("--concurrency", type=int, default=50, help="Количество одновременных клиентов")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency))
+    report(
+        "api",
+        f"In-process API load test, {args.requests} requests, concurrency {args.concurrency}",
+        vars(args),
+        results,
+        key="scenario",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Сравнивает пропускную способность смешанной нагрузки (чтения + записи) на настройках SQLite по умолчанию
+и на профиле PRAGMA из `ApplicationSettings`.
+
+Запуск: ``uv run python -m benchmarks.bench_pragmas --rows 10000 --readers 4 --duration 5``
+"""
+
+import argparse
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from app.data.db.models import URLPairModel
+from app.data.db.pragmas import PragmaValue
+from app.data.repository.repository import Repository
+from app.settings import app_settings
+
+from .common import make_code, report, seed_database, temp_database
+
+
+def run_mixed_workload(
+    rows: int, readers: int, duration: float, pragmas: Optional[Dict[str, PragmaValue]]
+) -> Dict[str, float]:
+    """
+    Запускает `readers` потоков, читающих случайные коды, и один поток, вставляющий новые пары,
+    на `duration` секунд. Каждый поток работает со своим подключением
+
+    Returns:
+        Dict[str, float]: Количество чтений и записей в секунду
+    """
+    with temp_database() as db_name:
+        seed_database(db_name, rows, pragmas)
+        stop = threading.Event()
+        counters = {"reads": 0, "writes": 0}
+        lock = threading.Lock()
+
+        def reader():
+            done = 0
+            randint = random.Random().randrange
+            with Repository(db_name, pragmas=pragmas) as repo:
+                while not stop.is_set():
+                    repo.get_original_url_from_shortened(make_code(randint(rows)))
+                    done += 1
+            with lock:
+                counters["reads"] += done
+
+        def writer():
+            done = 0
+            with Repository(db_name, pragmas=pragmas) as repo:
+                while not stop.is_set():
+                    index = rows + done
+                    repo.insert_new_url_pair(
+                        URLPairModel(original_url=f"https://example.com/{index}", shortened_url_code=make_code(index))  # ty:ignore[invalid-argument-type]
+                    )
+                    done += 1
+            with lock:
+                counters["writes"] += done
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    return {"reads/s": counters["reads"] / elapsed, "writes/s": counters["writes"] / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Сколько пар URL в базе перед замером")
+    parser.add_argument("--readers", type=int, default=4, help="Количество читающих потоков")
+    parser.add_argument("--duration", type=float, default=5.0, help="Длительность замера, в секундах")
+    args = parser.parse_args()
+
+    results = []
+    for profile, pragmas in (("sqlite defaults", None), ("settings profile", app_settings.sqlite_pragmas)):
+        result = run_mixed_workload(args.rows, args.readers, args.duration, pragmas)
+        results.append({"profile": profile, **result})
+
+    report(
+        "pragmas",
+        f"Mixed read/write workload: {args.rows} rows, {args.readers} readers + 1 writer",
+        vars(args),
+        results,
+        key="profile",
+    )
+
+
+if __name__ == "__main__":
+    main()
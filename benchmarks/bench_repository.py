@@ -0,0 +1,63 @@
+"""
+Бенчмарки `Repository` на базах разного размера: вставка, поиск существующего и несуществующего кода, страница выдачи.
+
+Запуск: ``uv run python -m benchmarks.bench_repository --rows 10000 1000000 10000000 --repeat 10000``
+"""
+
+import argparse
+import random
+from itertools import count
+
+from app.data.db.keys import code_to_key
+from app.data.db.models import URLPairModel
+from app.data.repository.repository import Repository
+from app.exc.db_exceptions import URLNotFoundError
+from app.settings import app_settings
+
+from .common import make_code, measure, report, seed_database, temp_database
+
+
+def _lookup_missing(repo: Repository, code: str):
+    try:
+        repo.get_original_url_from_shortened(code)
+    except URLNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000], help="Размеры базы для замеров")
+    parser.add_argument("--repeat", type=int, default=10000, help="Сколько раз выполнить каждую операцию")
+    args = parser.parse_args()
+
+    pragmas = app_settings.sqlite_pragmas
+    results = []
+    for rows in args.rows:
+        with temp_database() as db_name:
+            print(f"Seeding {rows} rows...")
+            seed_database(db_name, rows, pragmas)
+            rng = random.Random(42)
+            new_rows = count(rows)
+
+            with Repository(db_name, pragmas=pragmas) as repo:
+                operations = {
+                    "insert": lambda: repo.insert_new_url_pair(
+                        URLPairModel.model_construct(
+                            original_url=f"https://example.com/{(index := next(new_rows))}",
+                            shortened_url_code=make_code(index),
+                        )
+                    ),
+                    "lookup hit": lambda: repo.get_original_url_from_shortened(make_code(rng.randrange(rows))),
+                    "lookup miss": lambda: _lookup_missing(repo, f"miss{rng.randrange(rows)}"),
+                    "page of 100": lambda: repo.get_pairs_page(code_to_key(make_code(rng.randrange(rows))), 100),
+                }
+                for operation, func in operations.items():
+                    results.append({"rows": rows, "operation": operation, **measure(func, args.repeat)})
+
+    for row in results:
+        row["case"] = f"{row['rows']}:{row['operation']}"
+    report("repository", f"Repository benchmarks, {args.repeat} iterations", vars(args), results, key="case")
+
+
+if __name__ == "__main__":
+    main()
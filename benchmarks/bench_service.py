@@ -0,0 +1,47 @@
+"""
+Микро-бенчмарки бизнес-логики `URLService`. Базу затрагивает только генератор на счетчике - раз на блок номеров.
+
+Запуск: ``uv run python -m benchmarks.bench_service --repeat 100000``
+"""
+
+import argparse
+from itertools import count
+
+from app.data.repository.repository import Repository
+from app.services.code_generator import CounterCodeGenerator
+from app.services.url_service import URLService
+
+from .common import measure, report, temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100000, help="Сколько раз выполнить каждую операцию")
+    args = parser.parse_args()
+
+    service = URLService(repository=None)  # ty:ignore[invalid-argument-type]
+    urls = (f"https://example.com/some/long/path?query={i}" for i in count())
+
+    results = [
+        {"operation": "_create_short_url", **measure(lambda: service._create_short_url(next(urls)), args.repeat)},
+        {
+            "operation": "_initialize_url_pair_model",
+            **measure(lambda: service._initialize_url_pair_model(next(urls)), args.repeat),
+        },
+    ]
+
+    with temp_database() as db_name, Repository(db_name) as repository:
+        repository.initialize_database()
+        counter_service = URLService(repository, code_generator=CounterCodeGenerator())
+        results.append(
+            {
+                "operation": "_create_short_url (counter)",
+                **measure(lambda: counter_service._create_short_url(next(urls)), args.repeat),
+            }
+        )
+
+    report("service", f"URLService micro-benchmarks, {args.repeat} iterations", vars(args), results, key="operation")
+
+
+if __name__ == "__main__":
+    main()
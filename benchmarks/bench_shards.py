@@ -0,0 +1,112 @@
+"""
+Пропускная способность вставок в зависимости от количества шардов базы: `writers` процессов (как воркеры API)
+одновременно сокращают новые URL через `ShardedRepository`, по одной транзакции на URL, в течение `duration` секунд.
+С одним шардом все писатели ждут одну блокировку на запись, с несколькими - пишут в разные файлы параллельно,
+поэтому выигрыш виден, когда ядер не меньше, чем писателей, а синхронизация с диском заметно дорогая.
+С `--code-generator counter` уже сокращенные URL ищутся через индекс URL, и новый URL пишется в два шарда.
+
+Запуск: ``uv run python -m benchmarks.bench_shards --shards 1 2 4 8 --writers 8 --duration 5 --synchronous full``
+"""
+
+import argparse
+import multiprocessing
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.data.db.models import URLPairModel
+from app.data.db.pragmas import PragmaValue
+from app.data.repository.repository import Repository
+from app.data.repository.sharded_repository import ShardedRepository, shard_names
+from app.settings import app_settings
+
+from .common import make_code, report, temp_database
+
+
+def _writer(
+    names: List[str],
+    pragmas: Dict[str, PragmaValue],
+    url_index: bool,
+    number: int,
+    writers: int,
+    duration: float,
+    start,
+    done,
+):
+    index = number
+    with ShardedRepository([Repository(name, pragmas=pragmas) for name in names], url_index) as repository:
+        done.put(0)  # Процесс запущен и подключен: замер начинается, когда готовы все писатели
+        start.wait()
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            repository.insert_new_url_pair(
+                URLPairModel.model_construct(original_url=f"https://example.com/{index}", shortened_url_code=make_code(index))
+            )
+            index += writers
+    done.put((index - number) // writers)
+
+
+def run_writers(shards: int, writers: int, duration: float, synchronous: str, url_index: bool = False) -> Dict[str, float]:
+    """
+    Запускает `writers` процессов, вставляющих новые пары в базу из `shards` шардов, на `duration` секунд
+
+    Returns:
+        Dict[str, float]: Количество вставок в секунду, среднее время вставки и доля самого большого шарда
+    """
+    pragmas = {**app_settings.sqlite_pragmas, "synchronous": synchronous}
+    with temp_database() as db_name:
+        names = shard_names(db_name, shards)
+        ShardedRepository([Repository(name, pragmas=pragmas) for name in names], url_index).initialize_database()
+
+        start, done = multiprocessing.Event(), multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_writer, args=(names, pragmas, url_index, number, writers, duration, start, done))
+            for number in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            done.get()
+        start.set()
+        total = sum(done.get() for _ in processes)
+        for process in processes:
+            process.join()
+
+        sizes = [Path(name).stat().st_size for name in names]
+        return {
+            "inserts/s": total / duration,
+            "ms/insert per writer": duration * writers / total * 1000 if total else 0.0,
+            "largest shard %": max(sizes) / sum(sizes) * 100,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="Количества шардов для сравнения")
+    parser.add_argument("--writers", type=int, default=8, help="Количество пишущих процессов")
+    parser.add_argument("--duration", type=float, default=5.0, help="Длительность замера для каждого количества шардов, в секундах")
+    parser.add_argument(
+        "--synchronous", choices=["off", "normal", "full", "extra"], default="full", help="PRAGMA synchronous для замера"
+    )
+    parser.add_argument(
+        "--code-generator", choices=["hash", "counter"], default="hash", help="Генератор кодов, под который работает репозиторий"
+    )
+    args = parser.parse_args()
+
+    results = []
+    for shards in args.shards:
+        print(f"Writing to {shards} shard(s) with {args.writers} writers...")
+        url_index = args.code_generator == "counter"
+        results.append({"shards": shards, **run_writers(shards, args.writers, args.duration, args.synchronous, url_index)})
+
+    report(
+        "shards",
+        f"Write throughput by shard count, {args.writers} writers, synchronous={args.synchronous}, {args.code_generator} codes",
+        vars(args),
+        results,
+        key="shards",
+    )
+
+
+if __name__ == "__main__":
+    main()
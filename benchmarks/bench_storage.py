@@ -0,0 +1,137 @@
+"""
+Сравнивает формат хранения до перехода на целочисленные ключи (код в VARCHAR с UNIQUE-индексом и UNIQUE-индекс
+по полному исходному URL) и текущий (код как INTEGER PRIMARY KEY и неуникальный индекс по 64-битному хэшу URL):
+размер файла базы и индексов и скорость поиска по коду и по исходному URL.
+
+Запуск: ``uv run python -m benchmarks.bench_storage --rows 10000000 --repeat 100000``
+"""
+
+import argparse
+import random
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from app.data.db.keys import code_to_key, url_hash
+from app.data.db.migrations import apply_migrations
+from app.data.db.pragmas import apply_pragmas
+from app.settings import app_settings
+
+from .common import make_code, measure, report, temp_database
+
+LEGACY_SCHEMA = """
+CREATE TABLE urls
+(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_url TEXT UNIQUE,
+    shortened_url VARCHAR(10) UNIQUE,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    last_access_at REAL,
+    expires_at REAL
+);
+"""
+
+
+def make_url(index: int) -> str:
+    return f"https://example.com/some/long/path/{index}?utm_source=benchmark"
+
+
+def _rows(rows: int) -> Iterator[Tuple[str, str]]:
+    return ((make_url(i), make_code(i)) for i in range(rows))
+
+
+def seed_legacy(connection: sqlite3.Connection, rows: int):
+    connection.execute(LEGACY_SCHEMA)
+    connection.executemany("INSERT INTO urls (original_url, shortened_url) VALUES (?, ?)", _rows(rows))
+    connection.commit()
+
+
+def seed_integer_keys(connection: sqlite3.Connection, rows: int):
+    apply_migrations(connection)
+    connection.executemany(
+        "INSERT INTO urls (id, original_url, url_hash) VALUES (?, ?, ?)",
+        ((code_to_key(code), url, url_hash(url)) for url, code in _rows(rows)),
+    )
+    connection.commit()
+
+
+def _by_code_legacy(index: int) -> Tuple[Any, ...]:
+    return (make_code(index),)
+
+
+def _by_url_legacy(index: int) -> Tuple[Any, ...]:
+    return (make_url(index),)
+
+
+def _by_code_integer(index: int) -> Tuple[Any, ...]:
+    return (code_to_key(make_code(index)),)
+
+
+def _by_url_integer(index: int) -> Tuple[Any, ...]:
+    url = make_url(index)
+    return (url_hash(url), url)
+
+
+type Layout = Tuple[str, Callable[[sqlite3.Connection, int], None], Dict[str, Tuple[str, Callable[[int], Tuple[Any, ...]]]]]
+
+LAYOUTS: List[Layout] = [
+    (
+        "legacy text",
+        seed_legacy,
+        {
+            "lookup by code": ("SELECT original_url FROM urls WHERE shortened_url = ?", _by_code_legacy),
+            "lookup by url": ("SELECT shortened_url FROM urls WHERE original_url = ?", _by_url_legacy),
+        },
+    ),
+    (
+        "integer keys",
+        seed_integer_keys,
+        {
+            "lookup by code": ("SELECT original_url FROM urls WHERE id = ?", _by_code_integer),
+            "lookup by url": ("SELECT id FROM urls WHERE url_hash = ? AND original_url = ?", _by_url_integer),
+        },
+    ),
+]
+
+
+def storage_sizes(connection: sqlite3.Connection, db_name: str) -> Dict[str, float]:
+    """
+    Размер файла базы и суммарный размер таблицы `urls` с ее индексами, в МиБ
+    """
+    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    tables = {name for (name,) in connection.execute("SELECT name FROM sqlite_schema WHERE tbl_name = 'urls'")}
+    pages = dict(connection.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    index_bytes = sum(size for name, size in pages.items() if name in tables and name != "urls")
+    return {
+        "file MiB": Path(db_name).stat().st_size / 2**20,
+        "table MiB": pages.get("urls", 0) / 2**20,
+        "indexes MiB": index_bytes / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Количество строк в таблице")
+    parser.add_argument("--repeat", type=int, default=100000, help="Сколько раз выполнить каждый поиск")
+    args = parser.parse_args()
+
+    results = []
+    for layout, seed, lookups in LAYOUTS:
+        with temp_database() as db_name:
+            connection = sqlite3.connect(db_name)
+            apply_pragmas(connection, app_settings.sqlite_pragmas)
+            print(f"Seeding {args.rows} rows ({layout})...")
+            seed(connection, args.rows)
+            sizes = storage_sizes(connection, db_name)
+
+            rng = random.Random(42)
+            for operation, (query, params) in lookups.items():
+                lookup = lambda: connection.execute(query, params(rng.randrange(args.rows))).fetchone()
+                results.append({"case": f"{layout}:{operation}", **sizes, **measure(lookup, args.repeat)})
+            connection.close()
+
+    report("storage", f"Storage layouts, {args.rows} rows, {args.repeat} lookups", vars(args), results, key="case")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Общие утилиты для бенчмарков: временная база, наполнение тестовыми данными, вывод результатов
+"""
+
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from app.data.db.models import URLPairModel
+from app.data.db.pragmas import PragmaValue
+from app.data.repository.repository import Repository
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+@contextmanager
+def temp_database() -> Iterator[str]:
+    """
+    Создает временный файл базы и удаляет его вместе с файлами журнала после бенчмарка
+    """
+    with tempfile.TemporaryDirectory(prefix="url-shortener-bench-") as directory:
+        yield str(Path(directory) / "bench.sqlite3")
+
+
+def make_code(index: int) -> str:
+    """
+    Детерминированный уникальный код для строки с номером `index`
+    """
+    return f"b{index:09d}"[-10:]
+
+
+def seed_database(db_name: str, rows: int, pragmas: Optional[Dict[str, PragmaValue]] = None, batch_size: int = 10000):
+    """
+    Создает схему и наполняет базу `rows` парами URL пачками по `batch_size`
+    """
+    with Repository(db_name, pragmas=pragmas) as repo:
+        repo.initialize_database()
+        for start in range(0, rows, batch_size):
+            repo.insert_new_url_pairs(
+                [
+                    # Данные заведомо корректны, поэтому валидацию pydantic пропускаем ради скорости наполнения
+                    URLPairModel.model_construct(original_url=f"https://example.com/{i}", shortened_url_code=make_code(i))
+                    for i in range(start, min(start + batch_size, rows))
+                ]
+            )
+
+
+def print_table(title: str, rows: List[Dict[str, object]]):
+    """
+    Печатает результаты бенчмарка в виде простой таблицы
+    """
+    print(f"\n{title}")
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = {column: max(len(column), *(len(_format(row[column])) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(_format(row[column]).ljust(widths[column]) for column in columns))
+
+
+def _format(value: object) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def latency_summary(latencies: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """
+    Считает перцентили задержек (в миллисекундах) и пропускную способность
+
+    Args:
+        latencies (Sequence[float]): Задержки отдельных операций в секундах
+        elapsed (float): Общее время замера в секундах
+    """
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else list(latencies) * 99
+    return {
+        "ops": len(latencies),
+        "ops/s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50 ms": quantiles[49] * 1000,
+        "p95 ms": quantiles[94] * 1000,
+        "p99 ms": quantiles[98] * 1000,
+    }
+
+
+def measure(operation, repeat: int) -> Dict[str, float]:
+    """
+    Выполняет `operation` `repeat` раз и возвращает перцентили задержек и пропускную способность
+    """
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        operation_started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - operation_started)
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(benchmark: str, params: Dict[str, Any], results: List[Dict[str, Any]]) -> Path:
+    """
+    Сохраняет результаты бенчмарка в `benchmarks/results` вместе с ревизией git, чтобы сравнивать коммиты
+
+    Returns:
+        Path: Путь к сохраненному файлу
+    """
+    RESULTS_DIR.mkdir(exist_ok=True)
+    revision = _git_revision()
+    created_at = datetime.now(timezone.utc)
+    path = RESULTS_DIR / f"{benchmark}-{created_at:%Y%m%dT%H%M%S}-{revision}.json"
+    path.write_text(
+        json.dumps(
+            {
+                "benchmark": benchmark,
+                "revision": revision,
+                "created_at": created_at.isoformat(),
+                "params": params,
+                "results": results,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
+    return path
+
+
+def load_previous_results(benchmark: str, exclude: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает последние сохраненные результаты бенчмарка (кроме файла `exclude`)
+    """
+    paths = sorted(path for path in RESULTS_DIR.glob(f"{benchmark}-*.json") if path != exclude)
+    return json.loads(paths[-1].read_text()) if paths else None
+
+
+def report(benchmark: str, title: str, params: Dict[str, Any], results: List[Dict[str, Any]], key: str):
+    """
+    Печатает результаты, сохраняет их и печатает сравнение с предыдущим запуском того же бенчмарка
+
+    Args:
+        benchmark (str): Название бенчмарка (префикс файла с результатами)
+        title (str): Заголовок таблицы
+        params (Dict[str, Any]): Параметры запуска
+        results (List[Dict[str, Any]]): Строки результатов
+        key (str): Колонка, по которой сопоставляются строки текущего и предыдущего запуска
+    """
+    print_table(title, results)
+    path = save_results(benchmark, params, results)
+    previous = load_previous_results(benchmark, exclude=path)
+    print(f"Saved to {path}")
+    if previous is None or previous["params"] != params:
+        return
+
+    previous_rows = {row[key]: row for row in previous["results"]}
+    comparison = []
+    for row in results:
+        old = previous_rows.get(row[key])
+        if old is None:
+            continue
+        comparison.append(
+            {
+                key: row[key],
+                **{
+                    f"{column} Δ%": (row[column] - old[column]) / old[column] * 100
+                    for column in row
+                    if isinstance(row[column], float) and old.get(column)
+                },
+            }
+        )
+    print_table(f"Compared to {previous['revision']} ({previous['created_at']})", comparison)
@@ -0,0 +1,102 @@
+"""
+Выгрузка ссылок из базы в NDJSON/CSV и загрузка больших файлов со ссылками в базу, без API.
+
+Запуск:
+``uv run cli.py export --format csv --output links.csv``
+``uv run cli.py import links.csv --chunk-size 5000``
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.api.deps.url_service_dependency import provide_code_generator
+from app.data.repository.repository import Repository
+from app.data.repository.sharded_repository import ShardedRepository, shard_names
+from app.services.bulk_transfer import BulkFormat, export_pairs, import_pairs
+from app.services.url_service import URLService
+from app.settings import app_settings
+
+
+def _open_repository() -> Repository:
+    names = shard_names(app_settings.db_name, app_settings.db_shards)
+    return ShardedRepository(
+        [Repository(name, pragmas=app_settings.sqlite_pragmas) for name in names],
+        url_index=app_settings.code_generator == "counter",
+    )
+
+
+def _guess_format(path: str, explicit: Optional[str]) -> BulkFormat:
+    if explicit == "csv" or (explicit is None and Path(path).suffix.lower() == ".csv"):
+        return "csv"
+    return "ndjson"
+
+
+def run_export(args: argparse.Namespace):
+    output_format = _guess_format(args.output, args.format)
+    output = sys.stdout if args.output == "-" else open(args.output, "a" if args.after else "w", newline="", encoding="utf-8")
+    try:
+        with _open_repository() as repository:
+            exported = export_pairs(
+                repository,
+                output,
+                output_format,
+                after_id=args.after,
+                batch_size=args.batch_size,
+                include_expired=args.include_expired,
+            )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    logger.info(f"Exported {exported} links to {args.output}")
+
+
+def run_import(args: argparse.Namespace):
+    checkpoint = None if args.no_checkpoint else args.checkpoint or f"{args.input}.checkpoint"
+    with _open_repository() as repository:
+        repository.initialize_database()
+        service = URLService(repository, code_generator=provide_code_generator())
+        import_pairs(
+            service,
+            args.input,
+            _guess_format(args.input, args.format),
+            chunk_size=args.chunk_size,
+            checkpoint_path=checkpoint,
+            keep_codes=args.keep_codes,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Выгрузить ссылки из базы")
+    export_parser.add_argument("--output", default="-", help="Файл выгрузки (по умолчанию - stdout)")
+    export_parser.add_argument("--format", choices=["ndjson", "csv"], help="Формат (по умолчанию - по расширению файла, иначе ndjson)")
+    export_parser.add_argument("--after", type=int, default=0, help="Продолжить выгрузку после ключа из отчета о прогрессе (дописывает файл)")
+    export_parser.add_argument("--batch-size", type=int, default=5000, help="Сколько строк читать из базы за один запрос")
+    export_parser.add_argument("--include-expired", action="store_true", help="Выгружать и истекшие, но еще не удаленные ссылки")
+    export_parser.set_defaults(handler=run_export)
+
+    import_parser = commands.add_parser("import", help="Загрузить ссылки из файла в базу")
+    import_parser.add_argument("input", help="Файл NDJSON или CSV")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"], help="Формат (по умолчанию - по расширению файла, иначе ndjson)")
+    import_parser.add_argument("--chunk-size", type=int, default=1000, help="Сколько строк сохранять одной транзакцией")
+    import_parser.add_argument("--checkpoint", help="Файл контрольной точки (по умолчанию - <файл>.checkpoint)")
+    import_parser.add_argument("--no-checkpoint", action="store_true", help="Не сохранять контрольные точки")
+    import_parser.add_argument("--keep-codes", action="store_true", help="Сохранять коды из файла (short_code) вместо генерации новых")
+    import_parser.set_defaults(handler=run_import)
+
+    args = parser.parse_args()
+    if getattr(args, "chunk_size", 1) < 1 or getattr(args, "batch_size", 1) < 1:
+        parser.error("Размер пачки должен быть положительным")
+    if args.command == "import" and not Path(args.input).is_file():
+        parser.error(f"Файл {args.input} не найден")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
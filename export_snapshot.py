@@ -0,0 +1,33 @@
+"""
+Выгружает действующие ссылки из базы в снимок редиректов для реплик только для чтения (настройка `snapshot_path`).
+Снимок подменяется атомарно, запущенные реплики подхватывают его сами. API останавливать не нужно.
+
+Запуск: ``uv run export_snapshot.py --output data/redirects.snapshot``
+"""
+
+import argparse
+
+from loguru import logger
+
+from app.data.repository.repository import Repository
+from app.data.repository.sharded_repository import ShardedRepository, shard_names
+from app.data.repository.snapshot_repository import export_snapshot
+from app.settings import app_settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=app_settings.snapshot_path, help="Файл снимка (по умолчанию - snapshot_path)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Сколько строк читать из базы за один запрос")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("Укажите файл снимка: --output или настройка snapshot_path")
+
+    names = shard_names(app_settings.db_name, app_settings.db_shards)
+    repository = ShardedRepository([Repository(name, pragmas=app_settings.sqlite_pragmas) for name in names])
+    exported = export_snapshot(repository, args.output, args.batch_size)
+    logger.info(f"Exported {exported} redirects to snapshot {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import uvicorn
 from loguru import logger
-from app.api.views import app
 from app.settings import app_settings
 
 if __name__ == "__main__":
-    logger.info(f"Starting up API on host {app_settings.host}, port {app_settings.port}")
-    uvicorn.run(app=app, port=app_settings.port, host=str(app_settings.host))
\ No newline at end of file
+    logger.info(f"Starting up API on host {app_settings.host}, port {app_settings.port} with {app_settings.workers} worker(s)")
+    # Приложение передается строкой импорта: каждый воркер импортирует его сам и поднимает свои пулы и кэши в lifespan
+    uvicorn.run("app.api.views:app", port=app_settings.port, host=str(app_settings.host), workers=app_settings.workers)
@@ -0,0 +1,37 @@
+"""
+Перераспределяет ссылки между шардами базы после изменения настройки `db_shards`. API на время переноса нужно остановить.
+После смены `code_generator` запускается с тем же количеством шардов, чтобы перестроить индекс URL.
+
+Запуск: ``uv run reshard.py --from-shards 2 --to-shards 4``
+"""
+
+import argparse
+
+from loguru import logger
+
+from app.data.repository.sharded_repository import reshard, shard_names
+from app.settings import app_settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-shards", type=int, required=True, help="Текущее количество шардов")
+    parser.add_argument("--to-shards", type=int, default=app_settings.db_shards, help="Новое количество шардов (по умолчанию - db_shards)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Сколько строк переносить одной транзакцией")
+    args = parser.parse_args()
+    if args.from_shards < 1 or args.to_shards < 1:
+        parser.error("Количество шардов должно быть положительным")
+
+    moved = reshard(
+        app_settings.db_name,
+        args.from_shards,
+        args.to_shards,
+        args.batch_size,
+        app_settings.sqlite_pragmas,
+        url_index=app_settings.code_generator == "counter",
+    )
+    logger.info(f"Moved {moved} pairs, shards in use: {', '.join(shard_names(app_settings.db_name, args.to_shards))}")
+
+
+if __name__ == "__main__":
+    main()